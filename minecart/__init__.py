@@ -22,7 +22,47 @@ The most important classes in `minecart` are:
                characters. `Lettering` subclasses `str` to allow storing
                font, size, placement, etc.
 
+On Python 3.7 and later, importing `minecart` itself is cheap: the classes
+above (and `pdfminer`, which they depend on) are only imported the first
+time they are used. The submodules can also be imported directly, e.g.
+`import minecart.geometry`, without loading `pdfminer` at all.
+
 """
 
-from .content import Page, Shape, Image, Lettering
-from .miner import Document
+import importlib
+import sys
+
+__version__ = '0.3.0'
+
+__all__ = ['Document', 'Page', 'Shape', 'Image', 'Lettering']
+
+# The module defining each of the names in `__all__`
+_LAZY_NAMES = {
+    'Document': 'miner',
+    'Page': 'content',
+    'Shape': 'content',
+    'Image': 'content',
+    'Lettering': 'content',
+}
+
+
+def __getattr__(name):
+    "Import the names in `__all__` on first use (PEP 562)."
+    try:
+        module_name = _LAZY_NAMES[name]
+    except KeyError:
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module('.' + module_name, __name__),
+                    name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+
+
+if sys.version_info < (3, 7):  # No module-level __getattr__
+    from .content import Page, Shape, Image, Lettering
+    from .miner import Document
@@ -0,0 +1,122 @@
+u"""
+This module provides an asyncio interface to `Document`.
+
+Extracting a page takes long enough (and is CPU-bound enough) that doing it
+on the event loop would stall every other task. The coroutines here run the
+extraction in an executor instead (the loop's default thread pool, unless
+another `concurrent.futures.Executor` is given), so the loop stays
+responsive while pages are interpreted, and many documents can be processed
+concurrently.
+
+Documents can extract pages from several threads at once, so concurrent
+`aget_page` calls run in parallel in the executor. An `AsyncPageIterator`
+extracts its pages one at a time, ahead of the consumer. Extraction can't
+be interrupted halfway through a page: when a task waiting for a page is
+cancelled, it waits for the page being extracted to be finished (and
+discards it), so cancellation always takes effect between pages.
+
+"""
+
+import asyncio
+
+# Marks the end of the pages
+_END = object()
+
+
+async def run_in_executor(executor, func, *args):
+    """
+    Call `func(*args)` in `executor` and return the result.
+
+    If the calling task is cancelled, this only returns once the call has
+    finished, since it can't be interrupted.
+
+    """
+    future = asyncio.get_event_loop().run_in_executor(executor, func, *args)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        await asyncio.wait([future])
+        raise
+
+
+async def get_page(document, num, executor=None):
+    "Extract a page of `document` in `executor`. See `Document.get_page`."
+    return await run_in_executor(executor, document.get_page, num)
+
+
+class AsyncPageIterator(object):
+
+    """
+    Asynchronously iterates over the pages of a `Document`.
+
+    `document` -- the `Document` to extract the pages from
+    `executor` -- the `concurrent.futures.Executor` to extract pages in, or
+                  None to use the event loop's default executor
+    `prefetch` -- the maximum number of extracted pages waiting to be
+                  consumed. Pages are extracted ahead of the consumer until
+                  this many are waiting, which bounds the memory used when
+                  the consumer is slower than the extraction.
+
+    Use it with `async for`. Exceptions raised while extracting a page are
+    raised when that page would have been returned. `aclose` (or leaving an
+    `async with` block) stops the extraction after the current page.
+
+    """
+
+    def __init__(self, document, executor=None, prefetch=1):
+        if prefetch < 1:
+            raise ValueError("prefetch must be at least 1")
+        self.document = document
+        self.executor = executor
+        self.prefetch = prefetch
+        self.pages = document.iter_pages()
+        self.queue = None
+        self.task = None
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=self.prefetch)
+            self.task = asyncio.ensure_future(self._produce())
+        page, error = await self.queue.get()
+        if page is _END:
+            self.closed = True
+            if error is not None:
+                raise error
+            raise StopAsyncIteration
+        return page
+
+    async def _produce(self):
+        "Extract the pages into `self.queue`."
+        try:
+            while True:
+                page = await run_in_executor(
+                    self.executor, next, self.pages, _END)
+                await self.queue.put((page, None))
+                if page is _END:
+                    return
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:  #pylint: disable=W0703
+            await self.queue.put((_END, exc))
+
+    async def aclose(self):
+        "Stop extracting pages, after the one in progress (if any)."
+        self.closed = True
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
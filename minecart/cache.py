@@ -0,0 +1,332 @@
+u"""
+This module contains the caches used while extracting pages.
+
+`PageCache` is an on-disk cache of extracted pages, and `ObjectCache` is a
+bounded in-memory cache of the PDF objects parsed from a document.
+
+Page cache
+----------
+
+Interpreting a page's content stream is by far the most expensive part of
+extracting it, so a `Document` can be given a `PageCache` to store every
+page it extracts (in the format from `minecart.serialize`) and to load it
+from there the next time the same page of the same file is requested.
+
+Entries are keyed by a digest of the PDF file's bytes, the page index, the
+minecart version and the extraction options, so that editing the file or
+upgrading minecart never returns stale pages. Each entry is stored in its own
+file, written to a temporary file first and then renamed into place, so
+that concurrent readers never see a partial entry and concurrent writers of
+the same entry simply replace each other's (identical) data. The access
+time of an entry is recorded in its modification time, and once the total
+size of the cache exceeds its limit, the least recently used entries are
+removed.
+
+Object cache
+------------
+
+By default, pdfminer keeps every object it parses for the life of the
+document, including the (decoded) data of content streams and images, so
+memory grows with every page processed. An `ObjectCache` replaces that
+storage with a least-recently-used cache bounded by object count and/or
+estimated size. The objects that every page needs (the page tree, fonts and
+graphics states) are pinned, so that they are never evicted, and the
+`Document` releases the streams in the cache after extracting each page, so
+that content stream data doesn't outlive the page it belongs to. Evicted
+objects are simply parsed again if they are needed later.
+
+"""
+
+import collections
+import hashlib
+import os
+import sys
+import tempfile
+
+import pdfminer.pdftypes
+import pdfminer.psparser
+
+SUFFIX = '.page'
+
+
+def file_digest(fileobj, chunk_size=1 << 16):
+    """
+    Return the hex SHA-256 digest of the contents of a binary file object.
+
+    The file's position is restored afterwards.
+
+    """
+    position = fileobj.tell()
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    try:
+        for chunk in iter(lambda: fileobj.read(chunk_size), b''):
+            digest.update(chunk)
+    finally:
+        fileobj.seek(position)
+    return digest.hexdigest()
+
+
+class PageCache(object):
+
+    """
+    A size-limited, least-recently-used cache of pages in a directory.
+
+    `directory` -- the directory where the entries are stored. It is
+                   created if it doesn't exist, and can be shared by
+                   several processes.
+    `max_size` -- the maximum total size of the entries, in bytes. Set to
+                  None for an unbounded cache.
+
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    @staticmethod
+    def make_key(digest, page_num, options=()):
+        """
+        Return the cache key for a page.
+
+        `digest` -- the digest of the PDF file (see `file_digest`)
+        `page_num` -- the 0-based index of the page
+        `options` -- a sequence of (name, value) pairs with the extraction
+                     options that affect the page's contents
+
+        """
+        from . import __version__, serialize
+        key = repr((digest, page_num, __version__, serialize.FORMAT_VERSION,
+                    tuple(sorted(options))))
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        "Return the path to the file for the given key."
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        "Return the data stored under `key`, or None if there is none."
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as entry:
+                data = entry.read()
+        except (IOError, OSError):
+            return None
+        try:
+            os.utime(path, None)  # Mark as recently used
+        except OSError:
+            pass  # Evicted in the meantime
+        return data
+
+    def put(self, key, data):
+        "Store `data` under `key`, and evict old entries if needed."
+        handle, temp_path = tempfile.mkstemp(
+            suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as entry:
+                entry.write(data)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def discard(self, key):
+        "Remove the entry for `key`, if any."
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def iter_entries(self):
+        "Iterate over (mtime, size, path) tuples for the cache entries."
+        for name in os.listdir(self.directory):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by another process
+            yield stat.st_mtime, stat.st_size, path
+
+    def size(self):
+        "Return the total size of the entries in the cache, in bytes."
+        return sum(size for _, size, _ in self.iter_entries())
+
+    def evict(self):
+        "Remove the least recently used entries until under `max_size`."
+        if self.max_size is None:
+            return
+        entries = sorted(self.iter_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already removed by another process
+            total -= size
+
+    def clear(self):
+        "Remove all the entries in the cache."
+        for _, _, path in list(self.iter_entries()):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+# Objects of these /Types are never evicted from an `ObjectCache`
+PINNED_TYPES = ('Catalog', 'Pages', 'Page', 'Font', 'FontDescriptor',
+                'ExtGState')
+
+
+def object_size(obj):
+    """
+    Estimate the memory used by a parsed PDF object, in bytes.
+
+    Streams count the length of their raw and decoded data, and other
+    objects their shallow size.
+
+    """
+    if isinstance(obj, pdfminer.pdftypes.PDFStream):
+        return sum(len(data) for data in (obj.rawdata, obj.data)
+                   if data is not None)
+    return sys.getsizeof(obj)
+
+
+def _type_name(obj):
+    "Return the name of the /Type of a dictionary or stream, or None."
+    if isinstance(obj, pdfminer.pdftypes.PDFStream):
+        obj = obj.attrs
+    if not isinstance(obj, dict):
+        return None
+    kind = obj.get('Type')
+    if isinstance(kind, pdfminer.psparser.PSLiteral):
+        return pdfminer.psparser.literal_name(kind)
+    return None
+
+
+class ObjectCache(object):
+
+    """
+    A least-recently-used cache of PDF objects, keyed by object id.
+
+    `max_objects` -- the maximum number of unpinned objects to keep, or None
+    `max_bytes` -- the maximum total estimated size (see `object_size`) of
+                   the unpinned objects to keep, or None
+    `pinned_types` -- the /Type names of the dictionaries and streams to
+                      pin when they are added
+
+    Implements the parts of the dict interface that pdfminer uses for its
+    object cache. Pinned objects are never evicted, and don't count towards
+    the limits. The size of an object is measured again whenever it is
+    accessed, since pdfminer decodes streams in place.
+
+    """
+
+    def __init__(self, max_objects=1000, max_bytes=64 * 1024 * 1024,
+                 pinned_types=PINNED_TYPES):
+        self.max_objects = max_objects
+        self.max_bytes = max_bytes
+        self.pinned_types = frozenset(pinned_types)
+        self.pinned = {}
+        self._objects = collections.OrderedDict()  # objid -> (obj, size)
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.pinned) + len(self._objects)
+
+    def __contains__(self, objid):
+        return objid in self.pinned or objid in self._objects
+
+    def __getitem__(self, objid):
+        try:
+            return self.pinned[objid]
+        except KeyError:
+            pass
+        obj, size = self._objects.pop(objid)
+        self._add(objid, obj, size)
+        return obj
+
+    def get(self, objid, default=None):
+        "Return the object for `objid`, or `default` if not cached."
+        try:
+            return self[objid]
+        except KeyError:
+            return default
+
+    def __setitem__(self, objid, obj):
+        self.discard(objid)
+        if _type_name(obj) in self.pinned_types:
+            self.pinned[objid] = obj
+        else:
+            self._add(objid, obj)
+
+    def __delitem__(self, objid):
+        if objid in self.pinned:
+            del self.pinned[objid]
+        else:
+            self.total_bytes -= self._objects.pop(objid)[1]
+
+    def discard(self, objid):
+        "Remove `objid` from the cache, if present."
+        try:
+            del self[objid]
+        except KeyError:
+            pass
+
+    def pin(self, objid):
+        "Keep the object for `objid`, if cached, from being evicted."
+        if objid in self._objects:
+            obj, size = self._objects.pop(objid)
+            self.total_bytes -= size
+            self.pinned[objid] = obj
+
+    def unpin(self, objid):
+        "Allow the object for `objid`, if pinned, to be evicted."
+        if objid in self.pinned:
+            self._add(objid, self.pinned.pop(objid))
+
+    def _add(self, objid, obj, old_size=0):
+        "Add an unpinned object as the most recently used one, and evict."
+        size = object_size(obj)
+        self._objects[objid] = (obj, size)
+        self.total_bytes += size - old_size
+        self.evict()
+
+    def evict(self):
+        "Evict the least recently used objects until within the limits."
+        while self._objects and (
+                (self.max_objects is not None
+                 and len(self._objects) > self.max_objects)
+                or (self.max_bytes is not None
+                    and self.total_bytes > self.max_bytes)):
+            _, (_, size) = self._objects.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+
+    def release_streams(self):
+        """
+        Evict all the unpinned streams, with their data.
+
+        Called by `Document` once a page is extracted.
+
+        """
+        for objid, (obj, _) in list(self._objects.items()):
+            if isinstance(obj, pdfminer.pdftypes.PDFStream):
+                del self[objid]
+
+    def clear(self):
+        "Remove all the objects, including the pinned ones."
+        self.pinned.clear()
+        self._objects.clear()
+        self.total_bytes = 0
@@ -23,10 +23,14 @@ import pdfminer.utils
 import io
 import itertools
 import sys
+import weakref
 
 import six
 
 from pdfminer.psparser import LIT
+
+from . import streams
+
 JPEG_FILTERS = (LIT('DCTDecode'), LIT('DCT'), LIT('JPXDecode'))
 
 
@@ -37,9 +41,15 @@ class GraphicsObject(object):
 
     `z_index` -- the object's height in the stack. (Earliest drawn objects
                  have lower z_indices).
+    `clip_bbox` -- the bounding box of the clipping path in effect when the
+                   object was drawn, or None if it was not clipped. Only
+                   the parts of the object inside the clipping path are
+                   visible.
 
     """
 
+    clip_bbox = None
+
     def __init__(self, z_index=0):
         self.z_index = z_index
 
@@ -52,6 +62,24 @@ class GraphicsObject(object):
         """
         raise NotImplementedError
 
+    def get_visible_bbox(self):
+        """
+        Return the part of the bounding box inside the clipping box.
+
+        Returns None if the object is clipped away entirely.
+
+        """
+        bbox = self.get_bbox()
+        if self.clip_bbox is None:
+            return bbox
+        left = max(bbox[0], self.clip_bbox[0])
+        bottom = max(bbox[1], self.clip_bbox[1])
+        right = min(bbox[2], self.clip_bbox[2])
+        top = min(bbox[3], self.clip_bbox[3])
+        if left > right or bottom > top:
+            return None
+        return (left, bottom, right, top)
+
     def check_inside_bbox(self, bbox):
         "Check whether the given shape fits inside the given bounding box."
         left, bottom, right, top = self.get_bbox()
@@ -252,146 +280,319 @@ class Image(GraphicsObject):
     def get_bbox(self):
         return self.bbox
 
-    def as_pil(self):
+    def as_pil(self, apply_mask=True):
         """
         Return the image data in a `PIL.Image` object.
 
+        If `apply_mask` is True and the image has a soft mask (/SMask), a
+        stencil mask or a color key mask (/Mask), the mask is decoded and
+        composited in as an alpha channel, so that an 'RGBA' (or 'LA') image
+        is returned.
+
         Requires `pillow` to be installed.
 
         """
-        import PIL.Image
-        try:
-            image_data = self.obj.get_data()
-        except pdfminer.pdftypes.PDFNotImplementedError:
-            filters = self.obj.get_filters()
-            if len(filters) == 1 and filters[0] in JPEG_FILTERS:
-                # FIXME: ColorSpace in JPEG2000 should be overridden by the
-                # ColorSpace in the Image dictionary
-                image_data = io.BytesIO(self.obj.rawdata)
-                return PIL.Image.open(image_data)
-            raise  # We either can't handle the predictor or the filter
-
-        lti = pdfminer.layout.LTImage("", self.obj, self.get_bbox())
-        # The PDF spec allows non-JPEG images to have 1, 2, 4, 8 or 16 bits
-        if isinstance(lti.colorspace, list):
-            colorspace = str(lti.colorspace[0])[1:]  # strip leading /
+        image = stream_to_pil(self.obj)
+        if not apply_mask:
+            return image
+        alpha = self.get_alpha(image)
+        if alpha is None:
+            return image
+        if image.mode in ('1', 'L'):
+            image = image.convert('LA')
+        elif image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        if alpha.size != image.size:
+            alpha = alpha.resize(image.size)
+        image.putalpha(alpha)
+        return image
+
+    def as_array(self, apply_mask=True):
+        """
+        Return the image data as a NumPy array.
+
+        The array has shape (height, width) for single-channel images and
+        (height, width, channels) otherwise. See `as_pil` for the meaning of
+        `apply_mask`. Requires `pillow` and `numpy` to be installed.
+
+        """
+        import numpy
+        return numpy.asarray(self.as_pil(apply_mask))
+
+    def get_alpha(self, image=None):
+        """
+        Return the image mask as a `PIL.Image` in mode 'L', or None.
+
+        A value of 255 marks a fully opaque sample. The mask can have a
+        different size than the image itself. `image` is the decoded image,
+        which is only needed for color key masking, and which will be
+        decoded if not given. Soft and stencil masks are cached, so images
+        sharing a mask only decode it once.
+
+        """
+        smask = pdfminer.pdftypes.resolve1(self.obj.get('SMask'))
+        if isinstance(smask, pdfminer.pdftypes.PDFStream):
+            return decode_mask(smask)
+        mask = pdfminer.pdftypes.resolve1(self.obj.get('Mask'))
+        if isinstance(mask, pdfminer.pdftypes.PDFStream):
+            return decode_mask(mask)
+        if isinstance(mask, list):
+            if image is None:
+                image = stream_to_pil(self.obj)
+            return color_key_alpha(image, self.obj, mask)
+        return None
+
+
+# Decoded soft and stencil masks, keyed by their PDFStream. Masks are often
+# shared by many images (e.g., a logo drawn once per page), so it pays to
+# decode them only once. Entries go away with the document's streams.
+_MASK_CACHE = weakref.WeakKeyDictionary()
+
+
+def decode_mask(stream):
+    """
+    Decode a soft mask or stencil mask stream into a mode 'L' `PIL.Image`.
+
+    Stencil masks (/ImageMask true) are converted so that painted samples
+    are opaque (255) and masked samples transparent (0).
+
+    """
+    try:
+        return _MASK_CACHE[stream]
+    except KeyError:
+        pass
+    import PIL.ImageOps
+    mask = stream_to_pil(stream, default_colorspace='DeviceGray')
+    if mask.mode != 'L':
+        mask = mask.convert('L')
+    if stream.get_any(('IM', 'ImageMask')):
+        # A sample value of 1 marks the area as masked (unless inverted by
+        # the Decode array, which stream_to_pil has already applied)
+        mask = PIL.ImageOps.invert(mask)
+    _MASK_CACHE[stream] = mask
+    return mask
+
+
+def color_key_alpha(image, stream, ranges):
+    """
+    Compute the alpha channel for a color key mask.
+
+    `image` is the decoded `PIL.Image`, `stream` is the image's PDFStream and
+    `ranges` the (min, max) pairs for each color component. Samples with
+    all their components inside the ranges are fully transparent.
+
+    """
+    import PIL.ImageChops
+    bits = stream.get_any(('BPC', 'BitsPerComponent'), 8)
+    if image.mode == 'P':
+        scale = 1
+    else:
+        scale = 255 / ((1 << bits) - 1)
+    bands = image.split()
+    if len(bands) * 2 != len(ranges):
+        return None
+    inside = None
+    for band, low, high in zip(bands, ranges[::2], ranges[1::2]):
+        low, high = low * scale - .5, high * scale + .5
+        band_inside = band.point(
+            lambda value, low=low, high=high:
+            255 if low <= value <= high else 0, 'L')
+        if inside is None:
+            inside = band_inside
         else:
-            colorspace = str(lti.colorspace)[1:]  # strip leading /
-        if colorspace in ('DeviceRGB', 'CalRGB', 'RGB'):
-            mode = "RGB"
-            samples = 3
-            if lti.bits == 8:
-                rawmode = "RGB"
-            elif lti.bits == 16:
-                rawmode = "RGB;16B"
-            # elif lti.bits in (1, 2, 4):
-            #     # We have to upcast our data to 8 bits from either 1, 2, or 4
-            #     # bits:
-            #     #  4-bit:
-            #     #    RRRR GGGG BBBB -> RRRR 0000 GGGG 0000 BBBB 0000
-            #     #  2-bit:
-            #     #    RR GG BB -> RR 000000 GG 000000 BB 000000
-            #     #  1-bit:
-            #     #    RGB -> R 0000000 G 0000000 B 000000
-            #     out = []
-            #     if lti.bits == 4:
-            #         masks = ((240, 0),
-            #                  (15, 4))
-            #     elif lti.bits == 2:
-            #         masks = ((192, 0),
-            #                  (48, 2),
-            #                  (12, 4),
-            #                  (3, 6))
-            #     else:
-            #         masks = ((128, 0),
-            #                  (64, 1),
-            #                  (32, 2),
-            #                  (16, 3),
-            #                  (8, 4),
-            #                  (4, 5),
-            #                  (2, 6),
-            #                  (1, 7))
-            #     sample_ix = 0
-            #     col = 0
-            #     if array.array('H', 0).itemsize != 1:
-            #         out = [None] * lti.size[1]
-            #     else:
-            #         out = array.array('B', 0) * (lti.size[0] * lti.size[1])
-            #     for byte in map(ord, image_data):
-            #         for mask, shift in masks:
-            #             if col < lti.size[1]:
-            #                 out[sample_ix] = (byte & mask) << shift
-            #                 sample_ix += 1
-            #                 col += 1
-            #             else:
-            #                 # PDF image data must be 0-padded to be byte-aligned by row,
-            #                 col = 0
-            #                 break
-            #     raw_mode = 8
-            #     if isinstance(out, array.array)
-            #         image_data = out.tostring()
-            #     else:
-            #         image_data = b"".join(map(chr, out))
-            #     del out
-            else:
-                raise pdfminer.pdftypes.PDFNotImplementedError(
-                    "RGB images with %d-bit samples are not supported" % lti.bits)
-        elif colorspace in ('CalGray', 'DeviceGray'):
-            mode = 'L'
-            samples = 1
-            if lti.bits == 1:
-                mode = rawmode = "1"
-            elif lti.bits == 2:
-                rawmode = "L;2"
-            elif lti.bits == 4:
-                rawmode = "L;4"
-            elif lti.bits == 8:
-                rawmode = "L"
-            elif lti.bits == 16:
-                rawmode = "L;16"
-        elif colorspace in ('DeviceCMYK', 'CMYK'):
-            if lti.bits != 8:
-                raise pdfminer.pdftypes.PDFNotImplementedError(
-                    "PIL only supports 8-bit CMYK")
-            # TODO: Upcast the 1/2/4 bit image to 8 bits.
-            # Can PIL handle 16-bit CMYK?
-            mode = "CMYK"
-            rawmode = "CMYK"
-            samples = 4
+            inside = PIL.ImageChops.multiply(inside, band_inside)
+    return PIL.ImageChops.invert(inside)
+
+
+def _resolve_colorspace(colorspace):
+    "Return `(name, params)` for an image's /ColorSpace entry."
+    colorspace = pdfminer.pdftypes.resolve1(colorspace)
+    if isinstance(colorspace, list):
+        params = [pdfminer.pdftypes.resolve1(param)
+                  for param in colorspace[1:]]
+        colorspace = pdfminer.pdftypes.resolve1(colorspace[0])
+    else:
+        params = []
+    name = getattr(colorspace, 'name', colorspace)
+    if name == 'ICCBased':
+        # Use the device space with the same number of components
+        ncomps = params[0]['N']
+        name = {1: 'DeviceGray', 3: 'DeviceRGB', 4: 'DeviceCMYK'}[ncomps]
+        params = []
+    return name, params
+
+
+def stream_to_pil(stream, default_colorspace=None):
+    """
+    Decode an image XObject (without its masks) into a `PIL.Image`.
+
+    `default_colorspace` is used if the stream has no /ColorSpace entry, as
+    is the case for masks.
+
+    """
+    import PIL.Image
+    filters = stream.get_filters()
+    if filters and filters[-1] in JPEG_FILTERS:
+        # The JPEG filters are passed through by decode_data
+        image_data = streams.decode_data(stream)
+        # FIXME: ColorSpace in JPEG2000 should be overridden by the
+        # ColorSpace in the Image dictionary
+        return PIL.Image.open(io.BytesIO(image_data))
+    # decode_data raises PDFNotImplementedError if we can't handle the
+    # predictor or the filter
+    image_data = streams.decode_data(stream)
+
+    width = stream.get_any(('W', 'Width'))
+    height = stream.get_any(('H', 'Height'))
+    bits = stream.get_any(('BPC', 'BitsPerComponent'), 1)
+    if stream.get_any(('IM', 'ImageMask')):
+        colorspace, params = 'ImageMask', []
+        bits = 1
+    else:
+        colorspace, params = _resolve_colorspace(
+            stream.get_any(('CS', 'ColorSpace'), default_colorspace))
+    palette = None
+    if colorspace == 'Indexed':
+        base, _, lookup = params
+        base, _ = _resolve_colorspace(base)
+        if isinstance(lookup, pdfminer.pdftypes.PDFStream):
+            lookup = streams.decode_data(lookup)
+        if isinstance(lookup, six.text_type):
+            lookup = lookup.encode('latin-1')
+        if base in ('DeviceGray', 'CalGray'):
+            palette = b"".join(bytes((val, val, val)) for val in lookup)
+        elif base in ('DeviceRGB', 'CalRGB'):
+            palette = bytes(lookup)
         else:
             raise pdfminer.pdftypes.PDFNotImplementedError(
-                "Colorspace %r is not supported" % colorspace)
-        # The PDF spec requires each row of data to be 0-padded to be at a
-        # byte boundary. stride is the distance in bytes between consecutive
-        # rows of image data.
-        stride = (lti.srcsize[0] * lti.bits * samples + 7) // 8
-        image = PIL.Image.open(io.BytesIO(image_data))
-
-        return image
-        # TODO: implement Decode array
-        # TODO: implement image mask
+                "Indexed images with base %r are not supported" % base)
+        mode = 'P'
+        samples = 1
+        if bits == 8:
+            rawmode = "P"
+        elif bits in (1, 2, 4):
+            rawmode = "P;%d" % bits
+        else:
+            raise pdfminer.pdftypes.PDFNotImplementedError(
+                "Indexed images with %d-bit samples are not supported"
+                % bits)
+    elif colorspace in ('DeviceRGB', 'CalRGB', 'RGB'):
+        mode = "RGB"
+        samples = 3
+        if bits == 8:
+            rawmode = "RGB"
+        elif bits == 16:
+            rawmode = "RGB;16B"
+        # elif bits in (1, 2, 4):
+        #     # We have to upcast our data to 8 bits from either 1, 2, or 4
+        #     # bits:
+        #     #  4-bit:
+        #     #    RRRR GGGG BBBB -> RRRR 0000 GGGG 0000 BBBB 0000
+        #     #  2-bit:
+        #     #    RR GG BB -> RR 000000 GG 000000 BB 000000
+        #     #  1-bit:
+        #     #    RGB -> R 0000000 G 0000000 B 000000
+        else:
+            raise pdfminer.pdftypes.PDFNotImplementedError(
+                "RGB images with %d-bit samples are not supported" % bits)
+    elif colorspace in ('CalGray', 'DeviceGray', 'G', 'ImageMask'):
+        mode = 'L'
+        samples = 1
+        if bits == 1:
+            mode = rawmode = "1"
+        elif bits == 2:
+            rawmode = "L;2"
+        elif bits == 4:
+            rawmode = "L;4"
+        elif bits == 8:
+            rawmode = "L"
+        elif bits == 16:
+            rawmode = "L;16B"
+        else:
+            raise pdfminer.pdftypes.PDFNotImplementedError(
+                "Gray images with %d-bit samples are not supported" % bits)
+    elif colorspace in ('DeviceCMYK', 'CMYK'):
+        if bits != 8:
+            raise pdfminer.pdftypes.PDFNotImplementedError(
+                "PIL only supports 8-bit CMYK")
+        # TODO: Upcast the 1/2/4 bit image to 8 bits.
+        # Can PIL handle 16-bit CMYK?
+        mode = "CMYK"
+        rawmode = "CMYK"
+        samples = 4
+    else:
+        raise pdfminer.pdftypes.PDFNotImplementedError(
+            "Colorspace %r is not supported" % colorspace)
+    # The PDF spec requires each row of data to be 0-padded to be at a
+    # byte boundary. stride is the distance in bytes between consecutive
+    # rows of image data.
+    stride = (width * bits * samples + 7) // 8
+    image = PIL.Image.frombytes(mode, (width, height), image_data, 'raw',
+                                rawmode, stride, 1)
+    if palette is not None:
+        image.putpalette(palette)
+    decode = stream.get_any(('D', 'Decode'))
+    if samples == 1 and palette is None and decode:
+        decode = [pdfminer.pdftypes.resolve1(val) for val in decode]
+        if decode[0] > decode[1]:
+            import PIL.ImageOps
+            image = PIL.ImageOps.invert(image.convert('L'))
+            if mode == '1':
+                image = image.convert('1')
+    return image
+    # TODO: implement Decode arrays other than [1 0]
 
 
 class Lettering(six.text_type, GraphicsObject):
 
     """
     A text string on a page, including its typographic information.
+
+    `char_bboxes` -- optionally, an `array.array('f')` with the bounding box
+                     of each character in the string, stored as consecutive
+                     (left, bottom, right, top) values. When present,
+                     indexing or slicing the lettering returns a new
+                     `Lettering` with the exact bounding box of the selected
+                     characters.
+
     """
 
-    def __new__(cls, data, font, bbox, horizontal=True):
+    def __new__(cls, data, font, bbox, horizontal=True, char_bboxes=None):
         loc_str = six.text_type.__new__(cls, data)
         x1, y1, x2, y2 = bbox  #pylint: disable=C0103
         loc_str.bbox = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
         loc_str.horizontal = horizontal
         loc_str.font = font
+        loc_str.char_bboxes = char_bboxes
         return loc_str
 
-    def __init__(self, data, font, bbox, horizontal):
+    def __init__(self, data, font, bbox, horizontal=True, char_bboxes=None):
         super(Lettering, self).__init__()
 
     def get_bbox(self):
         return self.bbox
 
+    def __getitem__(self, key):
+        text = six.text_type.__getitem__(self, key)
+        if self.char_bboxes is None:
+            return text
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return text
+        else:
+            start = key + len(self) if key < 0 else key
+            stop = start + 1
+        boxes = self.char_bboxes[4 * start:4 * stop]
+        if not boxes:
+            return text
+        bbox = (min(boxes[0::4]), min(boxes[1::4]),
+                max(boxes[2::4]), max(boxes[3::4]))
+        sub = Lettering(text, self.font, bbox, self.horizontal, boxes)
+        sub.z_index = self.z_index
+        sub.clip_bbox = self.clip_bbox
+        return sub
+
     def __repr__(self):
         return "<%s: %s %r>" % (self.__class__.__name__, self, self.bbox)
 
@@ -446,10 +647,7 @@ class Page(object):
 
     def __init__(self, m_page):
         self.m_page = m_page
-        self.images = GraphicsCollection()
-        self.letterings = GraphicsCollection()
-        self.shapes = GraphicsCollection()
-        self.next_z_index = itertools.count(0)
+        self._init_contents()
         unit = pdfminer.pdftypes.resolve1(m_page.attrs.get('UserUnit', 1))
         self.width = (m_page.mediabox[2] - m_page.mediabox[0]) * unit
         self.height = (m_page.mediabox[3] - m_page.mediabox[1]) * unit
@@ -472,6 +670,63 @@ class Page(object):
         except KeyError:
             self.art_box = self.crop_box
 
+    def _init_contents(self):
+        "Set up the (empty) collections of graphics objects."
+        self.images = GraphicsCollection()
+        self.letterings = GraphicsCollection()
+        self.shapes = GraphicsCollection()
+        self.next_z_index = itertools.count(0)
+        self._text_buffers = {}
+
+    @classmethod
+    def detached(cls, width, height, crop_box=None, bleed_box=None,
+                 trim_box=None, art_box=None):
+        """
+        Create an empty page that is not backed by a pdfminer page.
+
+        The boxes default to the crop box, which defaults to the media box
+        `(0, 0, width, height)`. `page.m_page` is set to None.
+
+        """
+        page = cls.__new__(cls)
+        page.m_page = None
+        page._init_contents()  #pylint: disable=W0212
+        page.width = width
+        page.height = height
+        page.crop_box = tuple(crop_box or (0, 0, width, height))
+        page.bleed_box = tuple(bleed_box or page.crop_box)
+        page.trim_box = tuple(trim_box or page.crop_box)
+        page.art_box = tuple(art_box or page.crop_box)
+        return page
+
+    def copy(self, m_page=None):
+        """
+        Return a shallow copy of the page.
+
+        The copy has its own collections, but they hold the same graphics
+        objects as this page. If `m_page` is given, the copy is attached to
+        it and takes its boxes from it; otherwise, the boxes are copied.
+
+        """
+        if m_page is None:
+            page = self.detached(self.width, self.height, self.crop_box,
+                                 self.bleed_box, self.trim_box, self.art_box)
+        else:
+            page = self.__class__(m_page)
+        page.images.extend(self.images)
+        page.letterings.extend(self.letterings)
+        page.shapes.extend(self.shapes)
+        page.next_z_index = itertools.count(max(
+            [obj.z_index + 1 for obj in itertools.chain(
+                self.images, self.letterings, self.shapes)] or [0]))
+        return page
+
+    def __reduce__(self):
+        # Pages are pickled through their detached, compact serialization
+        # (see `minecart.serialize`)
+        from . import serialize
+        return (serialize.loads, (serialize.dumps(self),))
+
     def adjust_box(self, box):
         "Translate and rotate the given box to device coordinates."
         mb_left, mb_bot = self.m_page.mediabox[:2]
@@ -502,3 +757,128 @@ class Page(object):
         "Add the given lettering to the page."
         self.letterings.append(lettering)
         lettering.z_index = next(self.next_z_index)
+        self._text_buffers.clear()
+
+    def iter_lines(self, **params):
+        """
+        Iterate over the lines of text on the page as `TextLine` objects.
+
+        Lines are assembled by clustering the page's letterings by baseline
+        and by the gaps between them. The keyword arguments are passed on to
+        `minecart.text.group_lines`.
+
+        """
+        from . import text
+        return iter(text.group_lines(self.letterings, **params))
+
+    def iter_words(self, **params):
+        """
+        Iterate over the words on the page as `Word` objects.
+
+        Words are found by splitting the lines from `iter_lines` (which
+        receives `params`) on whitespace, so a word can be made up of parts
+        of several letterings.
+
+        """
+        for line in self.iter_lines(**params):
+            for word in line.words:
+                yield word
+
+    def get_text(self, order='reading', **params):
+        """
+        Return the text on the page as a string, with one line per row.
+
+        `order` -- 'reading' to detect columns and blocks and return the text
+                   in reading order (see `minecart.text.reading_order`), or
+                   'lines' to return the lines from top to bottom, as
+                   returned by `iter_lines`.
+
+        Other keyword arguments are passed on to `iter_lines`. Vertical
+        lines of text are placed after the horizontal ones.
+
+        """
+        from . import text
+        lines = list(self.iter_lines(**params))
+        if order == 'reading':
+            horizontal = [line for line in lines if line.horizontal]
+            lines = text.reading_order(horizontal) + [
+                line for line in lines if not line.horizontal]
+        elif order != 'lines':
+            raise ValueError("Unknown text order: %r" % order)
+        return u'\n'.join(lines)
+
+    def get_text_buffer(self, **params):
+        """
+        Return a `minecart.text.TextBuffer` with the lines on the page.
+
+        The lines come from `iter_lines`, which receives `params`. The
+        buffer is cached, so repeated searches on a page only assemble its
+        lines once.
+
+        """
+        from . import text
+        key = tuple(sorted(params.items()))
+        try:
+            return self._text_buffers[key]
+        except KeyError:
+            pass
+        buf = self._text_buffers[key] = text.TextBuffer(
+            list(self.iter_lines(**params)))
+        return buf
+
+    def search(self, pattern, flags=0, **params):
+        """
+        Find all the matches for a regular expression in the page text.
+
+        `pattern` -- a string or compiled regular expression
+        `flags` -- `re` flags to use if `pattern` is a string
+
+        The pattern is matched against the page's lines (in the order
+        returned by `iter_lines`, which receives `params`), joined by
+        newlines. Returns a list of `minecart.text.TextMatch` objects, which
+        are strings with the matched text, the letterings it comes from
+        (`.letterings`), their combined bounding box (`.get_bbox()`) and the
+        original match object (`.match`).
+
+        """
+        return self.get_text_buffer(**params).search(pattern, flags)
+
+    def find_tables(self, **params):
+        """
+        Find the ruled tables on the page.
+
+        Tables are detected from the horizontal and vertical lines (and thin
+        filled rectangles) among the page's shapes, and the page's
+        letterings are assigned to their cells. Returns a list of
+        `minecart.tables.Table` objects; the keyword arguments are passed on
+        to `minecart.tables.find_tables`.
+
+        """
+        from . import tables
+        return tables.find_tables(self.shapes, self.letterings, **params)
+
+    def rasterize(self, dpi=72, out=None, **params):
+        """
+        Render the page into a NumPy RGB image array, e.g. for thumbnails.
+
+        `dpi` is the resolution of the image. If given, `out` must be a
+        uint8 array with the right shape, which will be drawn over. Other
+        keyword arguments are passed on to `minecart.raster.rasterize`.
+        Requires `numpy` to be installed.
+
+        """
+        from . import raster
+        return raster.rasterize(self, dpi, out, **params)
+
+    def to_svg(self, fp, **params):
+        """
+        Write the page to the text file object `fp` as an SVG document.
+
+        The SVG is written incrementally, so this works in constant memory
+        for any page size. The keyword arguments are passed on to
+        `minecart.svg.write_svg` (e.g., `image_href` to control how images
+        are referenced).
+
+        """
+        from . import svg
+        svg.write_svg(self, fp, **params)
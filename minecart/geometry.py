@@ -0,0 +1,283 @@
+u"""
+This module provides geometric computations on `Shape` paths.
+
+The paths of `Shape` objects can contain Bézier curves, so most computations
+start by flattening the path into polylines, stored as NumPy arrays of
+points. The number of line segments used for each curve is computed from the
+curve's control points (using Wang's formula), so that the polyline is never
+further than `tolerance` units from the true curve.
+
+Filled areas follow the PDF rules: every subpath is implicitly closed, and
+the interior is determined by the nonzero winding number rule, or by the
+even-odd rule if `shape.evenodd` is set.
+
+Requires `numpy` to be installed.
+
+"""
+
+from __future__ import division
+
+import math
+
+import numpy
+
+DEFAULT_TOLERANCE = .1
+
+# Points are tested against all the edges of a shape at once; this bounds
+# the size of the (points x edges) arrays built for this
+_MAX_BLOCK = 1 << 20
+
+
+class Subpath(object):
+
+    """
+    A flattened subpath.
+
+    `points` -- an (n, 2) array with the vertices of the polyline
+    `closed` -- whether the subpath was closed with the `h` operator
+
+    """
+
+    def __init__(self, points, closed):
+        self.points = points
+        self.closed = closed
+
+    def __repr__(self):
+        return "<%s: %d points%s>" % (self.__class__.__name__,
+                                      len(self.points),
+                                      ", closed" if self.closed else "")
+
+
+def _get_path(shape):
+    "Return the path of a `Shape`, or the argument if it is a path."
+    return getattr(shape, 'path', shape)
+
+
+def curve_segments(point_0, point_1, point_2, point_3, tolerance):
+    """
+    Return the number of line segments needed to approximate a cubic Bézier
+    curve within `tolerance`.
+
+    """
+    # Wang's formula bounds the distance between the curve and the
+    # polyline through n equally spaced parameter values
+    dd_x = max(abs(point_0[0] - 2 * point_1[0] + point_2[0]),
+               abs(point_1[0] - 2 * point_2[0] + point_3[0]))
+    dd_y = max(abs(point_0[1] - 2 * point_1[1] + point_2[1]),
+               abs(point_1[1] - 2 * point_2[1] + point_3[1]))
+    dist = math.hypot(dd_x, dd_y)
+    if dist == 0:
+        return 1
+    return max(1, int(math.ceil(math.sqrt(.75 * dist / tolerance))))
+
+
+def flatten_curve(point_0, point_1, point_2, point_3, tolerance):
+    """
+    Return an (n, 2) array with points on a cubic Bézier curve.
+
+    The first point (`point_0`) is not included, so that the result can be
+    appended to a polyline ending at it.
+
+    """
+    count = curve_segments(point_0, point_1, point_2, point_3, tolerance)
+    t = numpy.arange(1, count + 1, dtype=float)[:, None] / count
+    mt = 1 - t
+    control = numpy.array((point_0, point_1, point_2, point_3), dtype=float)
+    return (mt ** 3 * control[0] + 3 * mt ** 2 * t * control[1]
+            + 3 * mt * t ** 2 * control[2] + t ** 3 * control[3])
+
+
+def flatten(shape, tolerance=DEFAULT_TOLERANCE):
+    """
+    Flatten a `Shape` (or a path) into a list of `Subpath`s.
+
+    Curves are replaced by polylines which are at most `tolerance` units
+    away from them. Subpaths consisting of a lone moveto are dropped.
+
+    """
+    subpaths = []
+    points = None
+    chunks = []
+
+    def finish(closed):
+        "Add the current subpath to `subpaths`."
+        if chunks and sum(len(chunk) for chunk in chunks) > 1:
+            subpaths.append(Subpath(numpy.vstack(chunks), closed))
+
+    for segment in _get_path(shape):
+        kind = segment[0]
+        if kind == 'm':
+            finish(False)
+            points = segment[1:3]
+            chunks = [numpy.array([points], dtype=float)]
+        elif not chunks:
+            continue  # A path must start with a moveto
+        elif kind == 'l':
+            points = segment[1:3]
+            chunks.append(numpy.array([points], dtype=float))
+        elif kind == 'h':
+            finish(True)
+            # A new subpath starts at the same point
+            points = chunks[0][0]
+            chunks = [numpy.array([points], dtype=float)]
+        else:
+            if kind == 'c':
+                control = (points, segment[1:3], segment[3:5], segment[5:7])
+            elif kind == 'v':
+                control = (points, points, segment[1:3], segment[3:5])
+            elif kind == 'y':
+                control = (points, segment[1:3], segment[3:5], segment[3:5])
+            else:
+                raise ValueError("Unknown path segment: %r" % (segment,))
+            chunks.append(flatten_curve(*(control + (tolerance,))))
+            points = control[3]
+    finish(False)
+    return subpaths
+
+
+def _signed_area(points):
+    "Return the signed area of a closed polygon (positive if ccw)."
+    x, y = points[:, 0], points[:, 1]
+    return .5 * (numpy.dot(x, numpy.roll(y, -1))
+                 - numpy.dot(y, numpy.roll(x, -1)))
+
+
+def _edges(subpaths):
+    "Return the (start, end) arrays of all the edges of closed subpaths."
+    starts = [subpath.points for subpath in subpaths]
+    ends = [numpy.roll(subpath.points, -1, axis=0) for subpath in subpaths]
+    if not starts:
+        empty = numpy.zeros((0, 2))
+        return empty, empty
+    return numpy.vstack(starts), numpy.vstack(ends)
+
+
+def _winding_numbers(starts, ends, points):
+    """
+    Return the winding number of each of `points` with respect to the
+    closed polygon(s) with the given edges.
+
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    result = numpy.zeros(len(points), dtype=int)
+    if not len(starts):
+        return result
+    block = max(1, _MAX_BLOCK // len(starts))
+    x0, y0 = starts[:, 0], starts[:, 1]
+    x1, y1 = ends[:, 0], ends[:, 1]
+    for first in range(0, len(points), block):
+        px = points[first:first + block, 0:1]
+        py = points[first:first + block, 1:2]
+        # Positive if the point is to the left of the edge
+        side = (x1 - x0) * (py - y0) - (px - x0) * (y1 - y0)
+        upward = (y0 <= py) & (y1 > py) & (side > 0)
+        downward = (y0 > py) & (y1 <= py) & (side < 0)
+        result[first:first + block] = (upward.sum(axis=1)
+                                       - downward.sum(axis=1))
+    return result
+
+
+def _is_filled(winding, evenodd):
+    "Apply the fill rule to an array of winding numbers."
+    if evenodd:
+        return winding % 2 != 0
+    return winding != 0
+
+
+def area(shape, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the area of the region filled by `shape`.
+
+    The fill rule of the shape is honored, so that holes (e.g., in the
+    letter 'O') are subtracted. Each subpath is assumed not to cross the
+    others, though subpaths can be nested inside each other to any depth.
+
+    """
+    subpaths = flatten(shape, tolerance)
+    evenodd = getattr(shape, 'evenodd', False)
+    total = 0.
+    for i, subpath in enumerate(subpaths):
+        signed = _signed_area(subpath.points)
+        if not signed:
+            continue
+        others = subpaths[:i] + subpaths[i + 1:]
+        # The winding number just outside this subpath, due to the others,
+        # and just inside it (which adds its own orientation)
+        outside = _winding_numbers(*(_edges(others)
+                                     + (_sample_point(subpath),)))
+        inside = outside + (1 if signed > 0 else -1)
+        gained = (_is_filled(inside, evenodd).astype(int)
+                  - _is_filled(outside, evenodd).astype(int))
+        total += abs(signed) * gained[0]
+    return total
+
+
+def _sample_point(subpath):
+    "Return a point on the boundary of a subpath."
+    return (subpath.points[0] + subpath.points[1]) / 2
+
+
+def perimeter(shape, tolerance=DEFAULT_TOLERANCE):
+    """
+    Return the length of the path of `shape`, as it would be stroked.
+
+    Only subpaths closed with `h` include their closing segment.
+
+    """
+    total = 0.
+    for subpath in flatten(shape, tolerance):
+        points = subpath.points
+        if subpath.closed:
+            points = numpy.vstack((points, points[:1]))
+        total += numpy.hypot(*numpy.diff(points, axis=0).T).sum()
+    return total
+
+
+def contains(shape, points, tolerance=DEFAULT_TOLERANCE):
+    """
+    Check which of `points` are in the region filled by `shape`.
+
+    `points` is an (n, 2) array-like of (x, y) coordinates. Returns a boolean
+    array of length n. The test uses the shape's fill rule, and applies to
+    the fill region even if the shape is only stroked.
+
+    """
+    return _contains(flatten(shape, tolerance), points,
+                     getattr(shape, 'evenodd', False))
+
+
+def _contains(subpaths, points, evenodd):
+    "Apply the point-in-shape test to flattened subpaths."
+    starts, ends = _edges(subpaths)
+    return _is_filled(_winding_numbers(starts, ends, points), evenodd)
+
+
+def hit_test(shapes, points, tolerance=DEFAULT_TOLERANCE):
+    """
+    Test many points against many shapes.
+
+    Returns a boolean array with shape (len(shapes), len(points)), where
+    entry [i, j] tells whether point j is in the region filled by shape i.
+    Each shape is flattened once, and only the points inside its bounding
+    box are tested against its edges. Since page shapes are sorted by
+    `z_index`, the topmost shape containing each point can be found with
+    `len(shapes) - 1 - result[::-1].argmax(axis=0)` (for the points
+    where `result.any(axis=0)` is true).
+
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    result = numpy.zeros((len(shapes), len(points)), dtype=bool)
+    for i, shape in enumerate(shapes):
+        subpaths = flatten(shape, tolerance)
+        if not subpaths:
+            continue
+        vertices = numpy.vstack([subpath.points for subpath in subpaths])
+        (left, bottom), (right, top) = vertices.min(0), vertices.max(0)
+        candidates = numpy.flatnonzero(
+            (points[:, 0] >= left) & (points[:, 0] <= right)
+            & (points[:, 1] >= bottom) & (points[:, 1] <= top))
+        if len(candidates):
+            result[i, candidates] = _contains(
+                subpaths, points[candidates],
+                getattr(shape, 'evenodd', False))
+    return result
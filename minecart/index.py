@@ -0,0 +1,175 @@
+u"""
+This module contains a full-text index over the words in a document.
+
+Searching a large document by iterating over its pages means interpreting
+every content stream again for each search. A `TextIndex` is built in a
+single pass over the document and maps each token to the places it appears,
+so that later searches are simple dictionary lookups. The index only holds
+plain numbers and strings, so it can be saved to disk and loaded again
+without the original PDF.
+
+Tokens are the runs of word characters (letters, digits and underscores) in
+each line of text, lowercased. Every occurrence of a token records its page,
+its position in the page's token sequence, the index in `page.letterings` of
+the (first) lettering it comes from, and its bounding box. The positions are
+used to match multi-token queries (e.g., "ABC-1234" is the token "abc"
+followed by the token "1234") as phrases.
+
+"""
+
+import collections
+import json
+import re
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SearchHit = collections.namedtuple(
+    'SearchHit', ['page_num', 'lettering_index', 'bbox'])
+SearchHit.__doc__ = """
+A match for a search in a `TextIndex`.
+
+`page_num` -- the 0-based index of the page with the match
+`lettering_index` -- the index in `page.letterings` of the lettering where
+                     the match starts
+`bbox` -- the bounding box of the match, as (left, bottom, right, top)
+
+"""
+
+
+def tokenize(text):
+    "Return a list with the lowercased tokens in `text`."
+    return [token.lower() for token in TOKEN_RE.findall(text)]
+
+
+class TextIndex(object):
+
+    """
+    An inverted index from tokens to their positions in a document.
+
+    `postings` -- a dictionary mapping each token to a list of occurrences,
+                  each stored as a tuple
+                  `(page_num, position, lettering_index, bbox)`.
+    `page_count` -- the number of pages indexed
+
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, postings=None, page_count=0):
+        self.postings = postings if postings is not None else {}
+        self.page_count = page_count
+
+    def add_page(self, page, **params):
+        """
+        Index the text in a `Page` as the next page of the document.
+
+        The keyword arguments are passed on to `page.iter_lines`.
+
+        """
+        page_num = self.page_count
+        self.page_count += 1
+        lettering_ids = dict(
+            (id(lettering), index)
+            for index, lettering in enumerate(page.letterings))
+        position = 0
+        postings = self.postings
+        for line in page.iter_lines(**params):
+            for match in TOKEN_RE.finditer(line):
+                span = line.make_span(match.start(), match.end())
+                if span.bbox is None:
+                    continue
+                entry = (page_num, position,
+                         lettering_ids.get(id(span.letterings[0]), -1),
+                         tuple(span.bbox))
+                postings.setdefault(match.group().lower(), []).append(entry)
+                position += 1
+
+    @classmethod
+    def build(cls, pages, **params):
+        """
+        Build an index for an iterable of `Page` objects.
+
+        The keyword arguments are passed on to `page.iter_lines`.
+
+        """
+        index = cls()
+        for page in pages:
+            index.add_page(page, **params)
+        return index
+
+    def search(self, term):
+        """
+        Return a list of `SearchHit`s for `term`, in document order.
+
+        `term` is split into tokens the same way as the indexed text, and
+        matches wherever its tokens appear consecutively (ignoring case and
+        the punctuation and spaces between them). The bounding box of a
+        multi-token match covers all of its tokens, so it may span several
+        lines.
+
+        """
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+        first = self.postings.get(tokens[0], [])
+        if len(tokens) == 1:
+            return [SearchHit(page_num, lettering_index, bbox)
+                    for page_num, _, lettering_index, bbox in first]
+        following = []
+        for token in tokens[1:]:
+            entries = self.postings.get(token)
+            if not entries:
+                return []
+            following.append(dict(((entry[0], entry[1]), entry[3])
+                                  for entry in entries))
+        hits = []
+        for page_num, position, lettering_index, bbox in first:
+            bboxes = [bbox]
+            for offset, positions in enumerate(following, 1):
+                next_bbox = positions.get((page_num, position + offset))
+                if next_bbox is None:
+                    break
+                bboxes.append(next_bbox)
+            else:
+                hits.append(SearchHit(page_num, lettering_index, (
+                    min(box[0] for box in bboxes),
+                    min(box[1] for box in bboxes),
+                    max(box[2] for box in bboxes),
+                    max(box[3] for box in bboxes))))
+        return hits
+
+    def search_pages(self, term):
+        "Return a sorted list with the numbers of the pages matching `term`."
+        return sorted(set(hit.page_num for hit in self.search(term)))
+
+    def save(self, fp):
+        """
+        Write the index as JSON to the text file object `fp`.
+
+        Each token's occurrences are flattened into a single list of numbers
+        to keep the file compact.
+
+        """
+        postings = {}
+        for token, entries in self.postings.items():
+            flat = postings[token] = []
+            for page_num, position, lettering_index, bbox in entries:
+                flat.extend((page_num, position, lettering_index))
+                flat.extend(bbox)
+        json.dump({'version': self.FORMAT_VERSION,
+                   'page_count': self.page_count,
+                   'postings': postings}, fp, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, fp):
+        "Read an index written by `save` from the text file object `fp`."
+        data = json.load(fp)
+        if data.get('version') != cls.FORMAT_VERSION:
+            raise ValueError("Unsupported text index version: %r"
+                             % data.get('version'))
+        postings = {}
+        for token, flat in data['postings'].items():
+            postings[token] = [
+                (flat[i], flat[i + 1], flat[i + 2], tuple(flat[i + 3:i + 7]))
+                for i in range(0, len(flat), 7)]
+        return cls(postings, data['page_count'])
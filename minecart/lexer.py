@@ -0,0 +1,354 @@
+u"""
+This module tokenizes the content streams of pages and forms.
+
+pdfminer's content parser decodes the streams to text and runs them through
+a general PostScript lexer one token at a time, which dominates the time
+spent on pages with many graphics operators. `iter_operations` instead
+splits a whole buffer into operations with compiled regular expressions:
+
+* An operator preceded only by numeric operands (the vast majority of the
+  operations in a content stream, like `x y l` or `a b c d e f cm`) is
+  matched by a single regular expression, and its operands are converted in
+  bulk.
+* Other operands (names, strings, arrays and dictionaries) are read one
+  token at a time, with the same types as in pdfminer: names are
+  `PSLiteral`s, strings are `str` if they are ASCII (and `bytes`
+  otherwise), and dictionaries have `str` keys.
+* Inline images (`BI ... ID data EI`) are read with a direct scan for the
+  `EI` that ends the data, and returned as the operand of an `EI` operation,
+  as a `PDFStream`.
+
+`iter_chunked_operations` reads a content stream in chunks (as produced by
+`iter_stream_data`, which decompresses the streams incrementally), so that
+the stream is never held in memory whole.
+
+"""
+
+import binascii
+import re
+
+import pdfminer.pdftypes
+import pdfminer.psparser
+
+from . import streams
+
+_WHITESPACE = b'\x00\t\n\x0c\r '
+# Whitespace and comments (which must run to the end of the line, so that
+# backtracking can't split them)
+_SKIP = br'(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*(?=[\r\n]|\Z))*'
+_NUMBER = br'[+-]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)'
+_REGULAR = br'[^\x00\t\n\x0c\r ()<>\[\]{}/%]'
+_END_OF_TOKEN = br'(?=[\x00\t\n\x0c\r ()<>\[\]{}/%]|\Z)'
+
+# An operator preceded by numeric operands (operators start with a letter,
+# except for ' and ")
+_OPERATION = re.compile(
+    _SKIP + br'((?:' + _NUMBER + br'[\t\n\x0c\r ]+)*)([A-Za-z\'"]' +
+    _REGULAR + br'*)')
+
+# A single token: a number, a name, a delimiter or a keyword
+_TOKEN = re.compile(
+    _SKIP + br'(?:(' + _NUMBER + br')' + _END_OF_TOKEN + br'|/(' + _REGULAR +
+    br'*)|(<<|>>|[\[\]{}()<>])|(' + _REGULAR + br'+))')
+
+_HEX_STRING = re.compile(br'([0-9A-Fa-f\x00\t\n\x0c\r ]*)(>)?')
+_NAME_ESCAPE = re.compile(br'#([0-9A-Fa-f]{2})')
+_STRING_SPECIAL = re.compile(br'[()\\\r]')
+_STRING_ESCAPE = re.compile(br'([0-7]{1,3})|(\r\n?|\n)|(.)', re.DOTALL)
+_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b',
+            b'f': b'\f'}
+_END_OF_IMAGE = re.compile(
+    br'[\x00\t\n\x0c\r ]EI(?=[\x00\t\n\x0c\r ]|\Z)')
+_IMAGE_END = re.compile(_SKIP + br'EI' + _END_OF_TOKEN)
+# The data after an image that may be the start of its EI
+_IMAGE_END_PREFIX = re.compile(_SKIP + br'(?:EI?)?\Z')
+
+_CONSTANTS = {b'true': True, b'false': False, b'null': None}
+
+# The kinds of tokens read by `_read_token` and `_read_object`
+_OPERAND = 'operand'
+_KEYWORD = 'keyword'
+_DELIMITER = 'delimiter'
+_END = 'end'
+
+
+def join_streams(contents):
+    "Return the concatenated data of a list of content streams."
+    return b''.join(iter_stream_data(contents))
+
+
+def iter_stream_data(contents, buffer_size=None):
+    """
+    Iterate over the concatenated data of a list of content streams.
+
+    The data is yielded in chunks of at most `buffer_size` bytes (by
+    default, `streams.BUFFER_SIZE`) for the streams that can be decoded
+    incrementally (see `streams.iter_decoded`).
+
+    """
+    for index, stream in enumerate(contents):
+        stream = pdfminer.pdftypes.stream_value(stream)
+        if index:
+            # Operators and operands can't be split across streams
+            yield b'\n'
+        for chunk in streams.iter_decoded(stream, buffer_size):
+            yield chunk
+
+
+def iter_operations(data):
+    """
+    Iterate over (operator, operands) pairs in a content stream.
+
+    `data` -- the (decoded) bytes of the content stream
+
+    `operator` is the operator's bytes, e.g. b'cm' or b'T*', and `operands`
+    a list of the objects preceding it. Operands left at the end of the data
+    are ignored.
+
+    """
+    for operator, operands, _ in _scan(data, True):
+        yield operator, operands
+
+
+def iter_chunked_operations(chunks):
+    """
+    Iterate over (operator, operands) pairs in a content stream, in chunks.
+
+    `chunks` -- an iterable of consecutive pieces of the (decoded) bytes of
+                the content stream, which may split tokens anywhere
+
+    The operations are the same as those of `iter_operations` on the
+    concatenated chunks. Only the data after the last complete operation is
+    kept from one chunk to the next, so the memory used is bounded by the
+    size of the chunks (and of the largest operation) rather than by the
+    length of the stream.
+
+    """
+    pending = []
+    size = 0
+    # An operation that is still incomplete is scanned again only once the
+    # pending data doubles, so that long operations (e.g. inline images)
+    # are read in linear time
+    needed = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size < needed:
+            continue
+        data = b''.join(pending) if len(pending) > 1 else chunk
+        end = 0
+        for operator, operands, end in _scan(data, False):
+            yield operator, operands
+        tail = data[end:]
+        pending = [tail] if tail else []
+        size = len(tail)
+        needed = 2 * size
+    if pending:
+        for operator, operands, _ in _scan(b''.join(pending), True):
+            yield operator, operands
+
+
+def _scan(data, complete):
+    """
+    Iterate over (operator, operands, end) for the operations in `data`.
+
+    If the data isn't `complete`, the scan stops before any operation that
+    might continue past the end of the data.
+
+    """
+    operands = []
+    pos = 0
+    while True:
+        match = _OPERATION.match(data, pos)
+        if match is not None:
+            numbers, operator = match.groups()
+            pos = match.end()
+            if numbers:
+                operands.extend([float(number) if b'.' in number
+                                 else int(number)
+                                 for number in numbers.split()])
+        else:
+            kind, value, pos = _read_object(data, pos)
+            if kind is _END:
+                return
+            if kind is not _KEYWORD:
+                if kind is _OPERAND:
+                    operands.append(value)
+                continue  # Stray closing delimiters are ignored
+            operator = value
+        if operator in _CONSTANTS:
+            operands.append(_CONSTANTS[operator])
+            continue
+        if operator == b'BI':
+            image, pos = _read_inline_image(data, pos, complete)
+            if image is None:
+                return
+            operands.append(image)
+            operator = b'EI'
+        if pos >= len(data) and not complete:
+            return  # The operator may be cut short
+        yield operator, operands, pos
+        operands = []
+
+
+def _read_token(data, pos):
+    "Return (kind, value, end) for the token at `pos`."
+    match = _TOKEN.match(data, pos)
+    if match is None:
+        return _END, None, len(data)
+    number, name, delimiter, keyword = match.groups()
+    pos = match.end()
+    if number is not None:
+        return _OPERAND, float(number) if b'.' in number else int(number), pos
+    if name is not None:
+        if b'#' in name:
+            name = _NAME_ESCAPE.sub(
+                lambda esc: binascii.unhexlify(esc.group(1)), name)
+        return _OPERAND, pdfminer.psparser.LIT(name.decode('latin-1')), pos
+    if delimiter == b'(':
+        return (_OPERAND,) + _read_string(data, pos)
+    if delimiter == b'<':
+        string, pos = _read_hex_string(data, pos)
+        if string is None:
+            return _END, None, pos
+        return _OPERAND, string, pos
+    if delimiter is not None:
+        return _DELIMITER, delimiter, pos
+    return _KEYWORD, keyword, pos
+
+
+def _read_object(data, pos):
+    """
+    Return (kind, value, end) for the object at `pos`.
+
+    Arrays and dictionaries are read whole, as operands.
+
+    """
+    kind, value, pos = _read_token(data, pos)
+    if kind is not _DELIMITER or value in (b']', b'>>', b'}', b')', b'>'):
+        return kind, value, pos
+    items = []
+    closing = {b'[': b']', b'{': b'}', b'<<': b'>>'}[value]
+    while True:
+        kind, item, pos = _read_object(data, pos)
+        if kind is _END or (kind is _DELIMITER and item == closing):
+            break
+        if kind is _KEYWORD:
+            item = (_CONSTANTS[item] if item in _CONSTANTS else
+                    pdfminer.psparser.KWD(item.decode('latin-1')))
+        if kind is not _DELIMITER:
+            items.append(item)
+    if closing != b'>>':
+        return _OPERAND, items, pos
+    return _OPERAND, _make_dict(items), pos
+
+
+def _make_dict(items):
+    "Return the dictionary for a list of alternating keys and values."
+    return dict((pdfminer.psparser.literal_name(key), value)
+                for key, value in zip(items[::2], items[1::2])
+                if value is not None)
+
+
+def _text(raw):
+    "Return the bytes of a string as pdfminer does: `str` if ASCII."
+    try:
+        return raw.decode('ascii')
+    except UnicodeDecodeError:
+        return raw
+
+
+def _read_string(data, pos):
+    "Return (string, end) for the literal string after the '(' at `pos`."
+    parts = []
+    depth = 1
+    while True:
+        match = _STRING_SPECIAL.search(data, pos)
+        if match is None:  # Unterminated
+            parts.append(data[pos:])
+            pos = len(data)
+            break
+        start = match.start()
+        parts.append(data[pos:start])
+        char = data[start:start + 1]
+        pos = start + 1
+        if char == b'(':
+            depth += 1
+            parts.append(char)
+        elif char == b')':
+            depth -= 1
+            if not depth:
+                break
+            parts.append(char)
+        elif char == b'\r':  # Unescaped end-of-lines are read as \n
+            parts.append(b'\n')
+            if data[pos:pos + 1] == b'\n':
+                pos += 1
+        else:
+            escape = _STRING_ESCAPE.match(data, pos)
+            if escape is None:  # Backslash at the end of the data
+                break
+            octal, _, other = escape.groups()
+            pos = escape.end()
+            if octal is not None:
+                parts.append(bytearray([int(octal, 8) & 0xFF]))
+            elif other is not None:
+                parts.append(_ESCAPES.get(other, other))
+    return _text(b''.join(parts)), pos
+
+
+def _read_hex_string(data, pos):
+    """
+    Return (string, end) for the hex string after the '<' at `pos`.
+
+    The string is None if it runs to the end of the data.
+
+    """
+    match = _HEX_STRING.match(data, pos)
+    if match.group(2) is None:
+        if match.end() == len(data):
+            return None, len(data)
+        return u'', pos  # Malformed: skip the '<'
+    digits = b''.join(match.group(1).split()).replace(b'\x00', b'')
+    if len(digits) % 2:
+        digits += b'0'
+    return _text(binascii.unhexlify(digits)), match.end()
+
+
+def _read_inline_image(data, pos, complete=True):
+    """
+    Return (stream, end) for the inline image after the 'BI' at `pos`.
+
+    If the data isn't `complete`, the stream is None when the image may
+    continue past the end of the data.
+
+    """
+    items = []
+    while True:
+        kind, value, pos = _read_object(data, pos)
+        if kind is _END or (kind is _KEYWORD and value == b'ID'):
+            break
+        if kind is _KEYWORD:
+            value = _CONSTANTS.get(value, value)
+        items.append(value)
+    attrs = _make_dict(items)
+    if pos < len(data) and data[pos:pos + 1] in _WHITESPACE:
+        pos += 1  # The single whitespace after ID
+    length = attrs.get('L', attrs.get('Length'))
+    image_data = None
+    if not complete and (kind is _END or (
+            isinstance(length, int)
+            and _IMAGE_END_PREFIX.match(data, pos + length))):
+        return None, len(data)
+    if isinstance(length, int) and length >= 0:
+        end = _IMAGE_END.match(data, pos + length)
+        if end is not None:
+            image_data = data[pos:pos + length]
+            pos = end.end()
+    if image_data is None:
+        end = _END_OF_IMAGE.search(data, pos)
+        if end is None:
+            image_data, pos = data[pos:], len(data)
+        else:
+            image_data, pos = data[pos:end.start()], end.end()
+    return pdfminer.pdftypes.PDFStream(attrs, image_data), pos
@@ -2,18 +2,28 @@
 This module contains all the classes that interface with pfdminer directly.
 """
 
+import array
+import collections
+import hashlib
 import numbers
+import threading
+import weakref
 
 import pdfminer.layout
 import pdfminer.pdfdevice
 import pdfminer.pdfinterp
 import pdfminer.pdfparser
 import pdfminer.pdftypes
+import pdfminer.psparser
 import pdfminer.utils
 import pdfminer.pdfcolor
 
+import six
+from six.moves import queue
+
 from .content import Page, Shape, Image, Lettering
 from . import color
+from . import lexer
 
 class ColoredState(pdfminer.pdfinterp.PDFGraphicState):
 
@@ -25,6 +35,7 @@ class ColoredState(pdfminer.pdfinterp.PDFGraphicState):
         super(ColoredState, self).__init__()
         self.fill_color = color.NO_COLOR    # Is there a better way to advise
         self.stroke_color = color.NO_COLOR  # pylint that these are Colors?
+        self.clip = None  # bounding box of the clipping path, if any
 
     def copy(self):
         obj = self.__class__()
@@ -37,6 +48,7 @@ class ColoredState(pdfminer.pdfinterp.PDFGraphicState):
         obj.flatness = self.flatness
         obj.fill_color = self.fill_color
         obj.stroke_color = self.stroke_color
+        obj.clip = self.clip
         return obj
 
 
@@ -115,22 +127,109 @@ class ColoredInterpreter(pdfminer.pdfinterp.PDFPageInterpreter):
     # instances of the colorspaces, initialized according to the parameters
     # found in /Resources.
 
+    # The ColoredInterpreter also keeps track of the clipping path, though
+    # only through its bounding box, which is kept in the graphic state in
+    # the (unscaled) device coordinates. The bounding box is forwarded to
+    # the device whenever it changes, the same way the CTM is.
+
     def __init__(self, *args, **kwargs):
         super(ColoredInterpreter, self).__init__(*args, **kwargs)
         # This is here to allow for independent testing of init_state and
         # init_resources, as well as to avoid pylint warnings ;)
         self.csmap = {}
         self.graphicstate = None
+        # The graphic state to start from, for interpreters running forms
+        self.initial_graphicstate = None
+
+    def dup(self):
+        # pdfminer's version returns a plain PDFPageInterpreter
+        return self.__class__(self.rsrcmgr, self.device)
 
     def init_state(self, ctm):
         # Extends the parent method to install our custom graphic state
         super(ColoredInterpreter, self).init_state(ctm)
-        self.graphicstate = ColoredState()
+        if self.initial_graphicstate is None:
+            self.graphicstate = ColoredState()
+        else:
+            self.graphicstate = self.initial_graphicstate.copy()
+        self.update_clip()
+
+    def set_current_state(self, state):
+        # Extends the parent method to restore the device's clip on Q
+        super(ColoredInterpreter, self).set_current_state(state)
+        self.update_clip()
+
+    def update_clip(self):
+        "Pass the current clipping box on to the device, if it supports it."
+        set_clip = getattr(self.device, 'set_clip', None)
+        if set_clip is not None:
+            set_clip(self.graphicstate.clip)
+
+    def clip_path(self, path):
+        "Intersect the clipping box with the bounding box of `path`."
+        exes = []
+        whys = []
+        for segment in path:
+            coords = segment[1:]
+            for x, y in zip(coords[::2], coords[1::2]):  #pylint: disable=C0103
+                x, y = pdfminer.utils.apply_matrix_pt(self.ctm, (x, y))
+                exes.append(x)
+                whys.append(y)
+        if not exes:
+            return
+        # The control points of the curves are included, which can only
+        # make the box larger than the exact clipping region
+        bbox = (min(exes), min(whys), max(exes), max(whys))
+        self.graphicstate.clip = intersect_bboxes(self.graphicstate.clip,
+                                                  bbox)
+        self.update_clip()
+
+    # clip
+    def do_W(self):
+        # The clip should take effect after the next painting operator, but
+        # since that paints the same path, it's safe to apply it right away
+        self.clip_path(self.curpath)
+
+    # clip-even-odd
+    def do_W_a(self):
+        self.clip_path(self.curpath)
+
+    # invoke an XObject
+    def do_Do(self, xobjid):
+        # Extends the parent method so that forms start from the current
+        # graphic state, are clipped to their BBox, and reset the device's
+        # CTM and clip when they are done
+        xobj = pdfminer.pdftypes.resolve1(
+            self.xobjmap.get(pdfminer.psparser.literal_name(xobjid)))
+        if (not isinstance(xobj, pdfminer.pdftypes.PDFStream)
+                or xobj.get('Subtype') is not pdfminer.pdfinterp.LITERAL_FORM
+                or 'BBox' not in xobj):
+            return super(ColoredInterpreter, self).do_Do(xobjid)
+        matrix = pdfminer.pdftypes.list_value(
+            xobj.get('Matrix', pdfminer.utils.MATRIX_IDENTITY))
+        bbox = pdfminer.pdftypes.list_value(xobj['BBox'])
+        saved = self.get_current_state()
+        try:
+            self.do_cm(*matrix)
+            left, bottom, right, top = bbox
+            self.clip_path([('m', left, bottom), ('l', right, bottom),
+                            ('l', right, top), ('l', left, top)])
+            interpreter = self.dup()
+            interpreter.initial_graphicstate = self.graphicstate
+            # As in pdfminer, forms without resources use the page's
+            resources = (pdfminer.pdftypes.dict_value(xobj.get('Resources'))
+                         or self.resources.copy())
+            self.device.begin_figure(xobjid, bbox, matrix)
+            interpreter.render_contents(resources, [xobj], ctm=self.ctm)
+            self.device.end_figure(xobjid)
+        finally:
+            self.set_current_state(saved)
 
     def init_resources(self, resources):
         # Extends the parent method to install our custom color spaces
         if resources:
-            resources = pdfminer.pdftypes.dict_value(resources)
+            # Copied, so as not to modify the document's (cached) object
+            resources = dict(pdfminer.pdftypes.dict_value(resources))
             spaces = resources.pop('ColorSpace', {})
         else:
             spaces = {}
@@ -157,6 +256,31 @@ class ColoredInterpreter(pdfminer.pdfinterp.PDFPageInterpreter):
             else:
                 self.csmap[csname.replace('Default', 'Device')] = space
 
+    def execute(self, streams):
+        # Replaces the parent method, which decodes the streams whole and
+        # tokenizes them with pdfminer's much slower general-purpose lexer.
+        # The operators are dispatched the same way: the operands go on the
+        # argument stack, from which the `do_*` method pops as many
+        # arguments as it takes
+        for operator, operands in lexer.iter_chunked_operations(
+                lexer.iter_stream_data(streams)):
+            name, nargs = _operator_method(self.__class__, operator)
+            if name is None:
+                self.argstack.extend(operands)
+                pdfminer.pdfinterp.handle_error(
+                    pdfminer.pdfinterp.PDFInterpreterError,
+                    'Unknown operator: %r' % operator.decode('latin-1'))
+            elif nargs and not self.argstack and len(operands) == nargs:
+                getattr(self, name)(*operands)
+            else:
+                self.argstack.extend(operands)
+                if nargs:
+                    args = self.pop(nargs)
+                    if len(args) == nargs:
+                        getattr(self, name)(*args)
+                else:
+                    getattr(self, name)()
+
     # setgray-stroking
     def do_G(self, gray):
         self.do_CS(pdfminer.pdfcolor.LITERAL_DEVICE_GRAY)
@@ -207,17 +331,75 @@ class ColoredInterpreter(pdfminer.pdfinterp.PDFPageInterpreter):
         self.graphicstate.fill_color = self.ncs.make_color(self.pop(samples))
 
 
+# (interpreter class, operator) -> (method name, number of arguments)
+_OPERATOR_METHODS = {}
+
+
+def _operator_method(cls, operator):
+    """
+    Return the name and the number of arguments of an operator's method.
+
+    `cls` -- the interpreter class
+    `operator` -- the operator's bytes, as returned by `lexer.iter_operations`
+
+    Returns (None, None) for unknown operators.
+
+    """
+    try:
+        return _OPERATOR_METHODS[cls, operator]
+    except KeyError:
+        pass
+    # The same naming scheme as pdfminer: T* -> do_T_a, ' -> do__q, etc.
+    name = 'do_' + operator.decode('latin-1').replace('*', '_a').replace(
+        '"', '_w').replace("'", '_q')
+    method = getattr(cls, name, None)
+    if method is None:
+        result = (None, None)
+    else:
+        result = (name, method.__code__.co_argcount - 1)
+    _OPERATOR_METHODS[cls, operator] = result
+    return result
+
+
+def intersect_bboxes(bbox_1, bbox_2):
+    """
+    Return the intersection of two bounding boxes.
+
+    Either box can be None, meaning the whole plane. Boxes that don't
+    intersect result in an empty box with right < left or top < bottom.
+
+    """
+    if bbox_1 is None:
+        return bbox_2
+    if bbox_2 is None:
+        return bbox_1
+    return (max(bbox_1[0], bbox_2[0]), max(bbox_1[1], bbox_2[1]),
+            min(bbox_1[2], bbox_2[2]), min(bbox_1[3], bbox_2[3]))
+
+
+def bboxes_overlap(bbox_1, bbox_2):
+    "Check whether two bounding boxes intersect (or touch)."
+    return (bbox_1[0] <= bbox_2[2] and bbox_2[0] <= bbox_1[2]
+            and bbox_1[1] <= bbox_2[3] and bbox_2[1] <= bbox_1[3])
+
+
 class DeviceLoader(pdfminer.pdfdevice.PDFTextDevice):
 
     """
     An interpreter that creates `Page` objects.
+
+    If `drop_clipped` is True, graphics objects entirely outside the
+    clipping path or the page's crop box are not added to the page.
+
     """
 
-    def __init__(self, rsrcmgr):
+    def __init__(self, rsrcmgr, drop_clipped=False):
         super(DeviceLoader, self).__init__(rsrcmgr)
         self.page = None
         self.str_container = None
         self.unit = 1
+        self.clip = None
+        self.drop_clipped = drop_clipped
 
     def __repr__(self):
         return object.__repr__(self)
@@ -225,12 +407,38 @@ class DeviceLoader(pdfminer.pdfdevice.PDFTextDevice):
     def begin_page(self, page, ctm):
         self.page = Page(page)
         self.unit = pdfminer.pdftypes.resolve1(page.attrs.get('UserUnit', 1))
+        self.clip = None
 
     def set_ctm(self, ctm):
         # pdfminer adjusts the ctm for the page rotation and MediaBox,
         # so we just need to adjust for the UserUnit
         self.ctm = tuple(c * self.unit for c in ctm)
 
+    def set_clip(self, bbox):
+        "Set the bounding box of the clipping path, or None for no clipping."
+        if bbox is not None:
+            bbox = tuple(c * self.unit for c in bbox)
+        self.clip = bbox
+
+    def add_object(self, obj, add, margin=0):
+        """
+        Record the clip of a new graphics object and add it to the page.
+
+        `add` is the page method used to add the object. If
+        `self.drop_clipped` is set, objects whose bounding box (expanded by
+        `margin`) lies outside the clip or the crop box are dropped.
+
+        """
+        obj.clip_bbox = self.clip
+        if self.drop_clipped:
+            left, bottom, right, top = obj.get_bbox()
+            bbox = (left - margin, bottom - margin,
+                    right + margin, top + margin)
+            if (self.clip is not None and not bboxes_overlap(bbox, self.clip)
+                    or not bboxes_overlap(bbox, self.page.crop_box)):
+                return
+        add(obj)
+
     def paint_path(self, graphicstate, stroked, filled, evenodd, path):
         # Converts path to device coordinates and adds the path to the page
         device_path = []
@@ -244,10 +452,13 @@ class DeviceLoader(pdfminer.pdfdevice.PDFTextDevice):
             device_path.append(tuple(new_seg))
         stroke = StrokeState.from_gs(graphicstate) if stroked else None
         fill = FillState.from_gs(graphicstate) if filled else None
-        self.page.add_shape(Shape(stroke, fill, evenodd, device_path))
+        # Strokes can extend half a line width beyond the path
+        margin = graphicstate.linewidth * self.unit / 2 if stroked else 0
+        self.add_object(Shape(stroke, fill, evenodd, device_path),
+                        self.page.add_shape, margin)
 
     def render_image(self, name, stream):
-        self.page.add_image(Image(self.ctm, stream))
+        self.add_object(Image(self.ctm, stream), self.page.add_image)
 
     def render_string_horizontal(self, *args):
         return self.render_string_hv('horizontal', *args)
@@ -310,8 +521,14 @@ class DeviceLoader(pdfminer.pdfdevice.PDFTextDevice):
                         vec[hv] += wordspace
                     needcharspace = True
                     string.append(font.to_unichr(cid))
-                self.page.add_lettering(Lettering(
-                    u''.join(string), font, self.str_container.bbox, hv == 0))
+                # Keep the glyph boxes in a compact array, with one entry
+                # per character (a glyph can map to several characters)
+                char_bboxes = array.array('f')
+                for text, glyph in zip(string, self.str_container):
+                    char_bboxes.extend(glyph.bbox * len(text))
+                self.add_object(Lettering(
+                    u''.join(string), font, self.str_container.bbox, hv == 0,
+                    char_bboxes), self.page.add_lettering)
                 self.str_container = None
         return tuple(vec)
 
@@ -320,22 +537,103 @@ class Document(object):
 
     """
     An in-memory PDF document.
+
+    If `drop_clipped` is True, graphics objects that are entirely outside
+    the clipping path in effect when they are drawn, or outside the page's
+    crop box, are left out of the pages.
+
+    If `cache` is a `minecart.cache.PageCache`, extracted pages are stored
+    in it, and pages found in it are loaded from there instead of being
+    interpreted again. Pages loaded from the cache are detached copies (see
+    `minecart.serialize`), but keep their `m_page` and image streams.
+
+    If `reuse_duplicates` is True, pages with the same fingerprint (see
+    `page_fingerprint`) as a page extracted earlier, and still in use, are
+    not interpreted: they are returned as shallow copies of that page (see
+    `Page.copy`), which share its graphics objects.
+
+    By default, every object parsed from the file is kept for the life of
+    the document. If `object_cache` is a `minecart.cache.ObjectCache`, it
+    is used to store them instead, and the streams in it are released after
+    each page is extracted, so that iterating over long documents runs in
+    bounded memory.
+
+    `get_page` can be called from several threads at once. Each thread
+    interprets pages with its own `interpreter` and `device`, while access
+    to the parser and the object cache is serialized by `self.lock`. Streams
+    are decoded under a lock of their own, so that threads decoding
+    different streams (e.g., in zlib, which releases the GIL) run in
+    parallel.
+
     """
 
-    def __init__(self, pdffile):
-        res_mgr = pdfminer.pdfinterp.PDFResourceManager()
-        self.device = DeviceLoader(res_mgr)
-        self.interpreter = ColoredInterpreter(res_mgr, self.device)
+    def __init__(self, pdffile, drop_clipped=False, cache=None,
+                 reuse_duplicates=False, object_cache=None):
+        self.resource_manager = pdfminer.pdfinterp.PDFResourceManager()
+        self.drop_clipped = drop_clipped
+        self._local = threading.local()
+        self.lock = threading.RLock()
+        self.pdffile = pdffile
         self.parser = pdfminer.pdfparser.PDFParser(pdffile)
         self.doc = pdfminer.pdfparser.PDFDocument(caching=True)
+        self.object_cache = object_cache
+        if object_cache is not None:
+            from .cache import ObjectCache
+            #pylint: disable=W0212
+            self.doc._cached_objs = object_cache
+            # The objects parsed from each object stream are kept as a list
+            # under the stream's id, so a few streams are enough
+            self.doc._parsed_objs = ObjectCache(max_objects=4,
+                                                max_bytes=None)
         self.parser.set_document(self.doc)
         self.doc.set_parser(self.parser)
+        _synchronize(self.doc, self.lock)
+        self.text_index = None
+        self.cache = cache
+        self._digest = None
+        self.reuse_duplicates = reuse_duplicates
+        # Extracted pages by fingerprint, as long as they are in use
+        self._extracted = weakref.WeakValueDictionary()
+
+    def _get_local(self):
+        "Return the per-thread state, creating it if needed."
+        local = self._local
+        if not hasattr(local, 'interpreter'):
+            local.device = DeviceLoader(self.resource_manager,
+                                        self.drop_clipped)
+            local.interpreter = ColoredInterpreter(self.resource_manager,
+                                                   local.device)
+        return local
+
+    @property
+    def device(self):
+        "The `DeviceLoader` used by the current thread."
+        return self._get_local().device
+
+    @property
+    def interpreter(self):
+        "The `ColoredInterpreter` used by the current thread."
+        return self._get_local().interpreter
+
+    def iter_pages(self, prefetch=0):
+        """
+        Iterate through all the pages in a document.
+
+        If `prefetch` is positive, the pages are extracted by a background
+        thread, which works ahead of the caller while it processes each page
+        (e.g., while it writes out the previous one). At most `prefetch`
+        extracted pages wait to be consumed, so memory use stays bounded.
+        Exceptions raised while extracting a page are raised by the iterator
+        when that page would have been returned. Since the document is safe
+        to use from several threads, it can still be used (e.g., with
+        `get_page`) while the iteration is in progress.
 
-    def iter_pages(self):
-        "Iterate through all the pages in a document."
-        for page in self.doc.get_pages():
-            self.interpreter.process_page(page)
-            yield self.device.page
+        """
+        pages = (self._extract_page(i, page)
+                 for i, page in enumerate(self.doc.get_pages()))
+        if prefetch > 0:
+            return iter_prefetched(pages, prefetch)
+        return pages
 
     def get_page(self, num):
         """
@@ -347,5 +645,340 @@ class Document(object):
         """
         for i, page in enumerate(self.doc.get_pages()):
             if i == num:
-                self.interpreter.process_page(page)
-                return self.device.page
+                return self._extract_page(i, page)
+
+    def aiter_pages(self, executor=None, prefetch=1):
+        """
+        Asynchronously iterate through all the pages, with `async for`.
+
+        The pages are extracted in `executor` (the event loop's default
+        executor if None), up to `prefetch` pages ahead of the consumer.
+        See `minecart.aio.AsyncPageIterator`.
+
+        """
+        from .aio import AsyncPageIterator
+        return AsyncPageIterator(self, executor, prefetch)
+
+    def aget_page(self, num, executor=None):
+        """
+        Get a specific page in the document, asynchronously.
+
+        Returns an awaitable that extracts the page in `executor` (the event
+        loop's default executor if None). See `get_page`.
+
+        """
+        from .aio import get_page
+        return get_page(self, num, executor)
+
+    def cache_key(self, num):
+        "Return the key for page `num` in `self.cache`."
+        from .cache import PageCache, file_digest
+        if self._digest is None:
+            # Reading the file moves its position, which pdfminer may be
+            # using from other threads
+            with self.lock:
+                if self._digest is None:
+                    self._digest = file_digest(self.pdffile)
+        return PageCache.make_key(
+            self._digest, num,
+            [('drop_clipped', bool(self.drop_clipped))])
+
+    def fingerprint(self, m_page):
+        "Return the `page_fingerprint` of a pdfminer page in this document."
+        return page_fingerprint(m_page, crop_box=self.drop_clipped)
+
+    def duplicate_pages(self):
+        """
+        Return the groups of pages that are extracted identically.
+
+        Returns a list of lists of 0-based page numbers, one list for each
+        set of two or more pages with the same fingerprint (see
+        `page_fingerprint`), in document order. The pages are not
+        interpreted.
+
+        """
+        groups = collections.OrderedDict()
+        for i, page in enumerate(self.doc.get_pages()):
+            groups.setdefault(self.fingerprint(page), []).append(i)
+        return [group for group in groups.values() if len(group) > 1]
+
+    def _extract_page(self, num, m_page):
+        "Return the `Page` for a pdfminer page, reusing earlier pages."
+        if not self.reuse_duplicates:
+            return self._load_page(num, m_page)
+        fingerprint = self.fingerprint(m_page)
+        page = self._extracted.get(fingerprint)
+        if page is not None:
+            return page.copy(m_page)
+        page = self._extracted[fingerprint] = self._load_page(num, m_page)
+        return page
+
+    def _interpret(self, m_page):
+        "Interpret a pdfminer page and return the resulting `Page`."
+        local = self._get_local()
+        local.interpreter.process_page(m_page)
+        if self.object_cache is not None:
+            with self.lock:
+                self.object_cache.release_streams()
+        return local.device.page
+
+    def _load_page(self, num, m_page):
+        "Return the `Page` for a pdfminer page, using the cache if set."
+        if self.cache is None:
+            return self._interpret(m_page)
+        from . import serialize
+        key = self.cache_key(num)
+        data = self.cache.get(key)
+        if data is not None:
+            try:
+                page = serialize.loads(data, self)
+            except Exception:  #pylint: disable=W0703
+                self.cache.discard(key)  # Corrupt or truncated entry
+            else:
+                page.m_page = m_page
+                return page
+        page = self._interpret(m_page)
+        self.cache.put(key, serialize.dumps(page))
+        return page
+
+    def iter_unique_images(self):
+        """
+        Iterate over the distinct images drawn anywhere in the document.
+
+        Yields `(image, placements)` tuples, where `image` is the `Image`
+        for the first placement of the image and `placements` is a list of
+        `(page_num, ctm, bbox)` tuples, one for each time the image is drawn.
+        Images are considered the same if they come from the same PDF
+        object, or if their stream dictionaries and (encoded) data are
+        identical. Since only one `Image` is returned per distinct image, its
+        data will only be decoded once, no matter how many times it is drawn.
+
+        All pages are processed before the first image is yielded.
+
+        """
+        groups = []
+        by_objid = {}
+        by_digest = {}
+        for page_num, page in enumerate(self.iter_pages()):
+            for image in page.images:
+                objid = image.obj.objid
+                group = by_objid.get(objid) if objid is not None else None
+                if group is None:
+                    digest = stream_digest(image.obj)
+                    group = by_digest.get(digest)
+                    if group is None:
+                        group = by_digest[digest] = (image, [])
+                        groups.append(group)
+                    if objid is not None:
+                        by_objid[objid] = group
+                group[1].append((page_num, image.ctm, image.bbox))
+        for group in groups:
+            yield group
+
+    def build_text_index(self, **params):
+        """
+        Build a `minecart.index.TextIndex` over the text in all pages.
+
+        The index is built in a single pass over the document and kept in
+        `self.text_index`, where `search` will use it. It can be saved with
+        `index.save(fp)`, and a saved index can be reused by assigning
+        `TextIndex.load(fp)` to `doc.text_index`. The keyword arguments are
+        passed on to `Page.iter_lines`.
+
+        """
+        from .index import TextIndex
+        self.text_index = TextIndex.build(self.iter_pages(), **params)
+        return self.text_index
+
+    def search(self, term):
+        """
+        Find the places where `term` appears in the document.
+
+        Returns a list of `minecart.index.SearchHit` tuples with the page
+        number, lettering index and bounding box of each match. The search
+        is case-insensitive and ignores punctuation (see
+        `TextIndex.search`). The text index is built on the first call if
+        needed.
+
+        """
+        if self.text_index is None:
+            self.build_text_index()
+        return self.text_index.search(term)
+
+
+def _synchronize(doc, lock):
+    """
+    Make a `PDFDocument` safe to use from several threads.
+
+    `doc.getobj` (which uses the shared parser and object cache) is
+    serialized with `lock`, and every stream it returns gets a lock of its
+    own for decoding its data.
+
+    """
+    getobj = doc.getobj
+
+    def locked_getobj(objid):
+        "Wraps `PDFDocument.getobj`."
+        with lock:
+            obj = getobj(objid)
+            if (isinstance(obj, pdfminer.pdftypes.PDFStream)
+                    and 'get_data' not in vars(obj)):
+                obj.get_data = _locked_get_data(obj)
+        return obj
+
+    doc.getobj = locked_getobj
+
+
+def _locked_get_data(stream):
+    "Return a thread-safe version of `stream.get_data`."
+    get_data = stream.get_data
+    lock = threading.Lock()
+
+    def locked_get_data():
+        "Wraps `PDFStream.get_data`."
+        if stream.data is None:
+            with lock:
+                return get_data()
+        return stream.data
+
+    return locked_get_data
+
+
+def iter_prefetched(iterable, size):
+    """
+    Iterate over `iterable`, consuming it in a background thread.
+
+    The thread stays at most `size` items ahead of the caller. If consuming
+    `iterable` raises an exception, it is raised here after the items that
+    came before it. Closing the returned generator stops the thread (after
+    it finishes computing the current item).
+
+    """
+    items = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def put(entry):
+        "Add an entry to the queue, unless stopped. Return if added."
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def work():
+        "Move the items of `iterable` into the queue."
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as exc:  #pylint: disable=W0703
+            put((_DONE, exc))
+        else:
+            put((_DONE, None))
+
+    thread = threading.Thread(target=work, name='minecart-prefetch')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+# Marks the end of the items from `iter_prefetched`'s background thread
+_DONE = object()
+
+
+def stream_digest(stream):
+    """
+    Return a digest identifying the contents of a `PDFStream`.
+
+    The digest covers the stream dictionary (except for /Length) and the
+    stream data, using the encoded data whenever it is still available so
+    that the stream need not be decoded.
+
+    """
+    hasher = hashlib.sha1()
+    for key, value in sorted(stream.attrs.items()):
+        if key != 'Length':
+            hasher.update(("%s=%r;" % (key, value)).encode('utf-8'))
+    if stream.rawdata is not None or not stream.get_filters():
+        # The data of unfiltered streams is the same once decoded
+        hasher.update(b'raw:')
+        data = stream.data if stream.rawdata is None else stream.rawdata
+    else:
+        hasher.update(b'decoded:')
+        data = stream.data
+    if isinstance(data, six.text_type):
+        data = data.encode('latin-1')
+    hasher.update(data)
+    return hasher.digest()
+
+
+def _canonical(obj, out):
+    """
+    Append a canonical representation of a PDF object to the list `out`.
+
+    Indirect references are written by object id rather than resolved, and
+    dictionaries are written with sorted keys.
+
+    """
+    if isinstance(obj, pdfminer.pdftypes.PDFObjRef):
+        out.append('R%d' % obj.objid)
+    elif isinstance(obj, dict):
+        out.append('<<')
+        for key in sorted(obj):
+            out.append('/%s' % key)
+            _canonical(obj[key], out)
+        out.append('>>')
+    elif isinstance(obj, list):
+        out.append('[')
+        for item in obj:
+            _canonical(item, out)
+        out.append(']')
+    elif isinstance(obj, pdfminer.pdftypes.PDFStream):
+        out.append('S' + stream_digest(obj).hex())
+    else:
+        out.append(repr(obj))
+
+
+def page_fingerprint(m_page, crop_box=False):
+    """
+    Return a digest identifying what a pdfminer page would be extracted as.
+
+    The digest covers the page's content streams (see `stream_digest`), its
+    resource dictionary, with indirect references compared by object id
+    rather than by content, and the page attributes that affect the
+    coordinates of the extracted objects (media box, rotation and user
+    unit). Set `crop_box` to also cover the crop box, when it determines
+    which objects are kept.
+
+    The content streams are hashed without decoding them (the interpreter
+    doesn't store their decoded data either, see `streams.iter_decoded`),
+    and the page is not interpreted, so computing the fingerprint is cheap
+    compared to extracting the page.
+
+    """
+    hasher = hashlib.sha1()
+    for stream in m_page.contents:
+        stream = pdfminer.pdftypes.resolve1(stream)
+        if isinstance(stream, pdfminer.pdftypes.PDFStream):
+            hasher.update(stream_digest(stream))
+    out = []
+    _canonical(m_page.attrs.get('Resources'), out)
+    _canonical([m_page.mediabox, m_page.rotate,
+                m_page.attrs.get('UserUnit', 1)], out)
+    if crop_box:
+        _canonical(m_page.cropbox, out)
+    hasher.update(' '.join(out).encode('utf-8'))
+    return hasher.digest()
+
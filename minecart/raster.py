@@ -0,0 +1,320 @@
+u"""
+This module renders pages into low-resolution NumPy images.
+
+The renderer is meant for thumbnails and previews rather than print
+quality: there is no anti-aliasing, clipping is only applied through the
+bounding box of the clipping path, and text is drawn as gray boxes over the
+letterings' bounding boxes. In exchange, it only needs the objects minecart
+already extracts, and each shape is scan-converted with a handful of NumPy
+operations:
+
+1. The shape's path is flattened (see `minecart.geometry.flatten`) and
+   converted to pixel coordinates.
+2. Each edge is intersected with the center lines of the pixel rows it
+   spans, all at once.
+3. Every crossing adds its direction (+1 upwards, -1 downwards) at its
+   column in a difference array, so that a cumulative sum along the rows
+   yields the winding number at each pixel center.
+4. The fill rule turns the winding numbers into a mask, which is painted
+   with the shape's color.
+
+Strokes are rendered by filling a quadrilateral around each segment of the
+path, as wide as the line width (and at least a pixel wide).
+
+Requires `numpy` to be installed, and `pillow` to draw images.
+
+"""
+
+from __future__ import division
+
+import math
+
+import numpy
+
+from . import geometry
+
+TEXT_COLOR = (128, 128, 128)
+MISSING_IMAGE_COLOR = (192, 192, 192)
+
+
+def _to_rgb(color):
+    "Convert a `Color` into a tuple of 0-255 ints, or None if it can't."
+    try:
+        rgb = color.as_rgb()
+    except Exception:  #pylint: disable=W0703
+        return None
+    if rgb is None or len(rgb) != 3:
+        return None
+    return tuple(int(round(min(max(value, 0), 1) * 255)) for value in rgb)
+
+
+class Rasterizer(object):
+
+    """
+    Paints graphics objects onto an RGB image array.
+
+    `out` -- a (height, width, 3) uint8 array to draw on
+    `scale` -- the number of pixels per PDF unit
+    `page_height` -- the page height in PDF units, to flip the y axis
+    `tolerance` -- the curve flattening tolerance, in PDF units
+
+    """
+
+    def __init__(self, out, scale, page_height, tolerance=None):
+        self.out = out
+        self.scale = scale
+        self.page_height = page_height
+        if tolerance is None:
+            tolerance = .25 / scale  # A quarter pixel
+        self.tolerance = tolerance
+
+    def to_pixels(self, points):
+        "Convert an (n, 2) array of page coordinates to pixel coordinates."
+        pixels = numpy.empty_like(points, dtype=float)
+        pixels[:, 0] = points[:, 0] * self.scale
+        pixels[:, 1] = (self.page_height - points[:, 1]) * self.scale
+        return pixels
+
+    def window(self, bbox):
+        """
+        Return the (top, bottom, left, right) pixel window covering `bbox`,
+        clipped to the image, or None if it is empty.
+
+        """
+        height, width = self.out.shape[:2]
+        left = max(int(math.floor(bbox[0] * self.scale)), 0)
+        right = min(int(math.ceil(bbox[2] * self.scale)), width)
+        top = max(int(math.floor((self.page_height - bbox[3])
+                                 * self.scale)), 0)
+        bottom = min(int(math.ceil((self.page_height - bbox[1])
+                                   * self.scale)), height)
+        if left >= right or top >= bottom:
+            return None
+        return top, bottom, left, right
+
+    def fill_polygons(self, polygons, evenodd, color, clip=None):
+        """
+        Fill the polygons (a list of (n, 2) arrays of pixel coordinates).
+
+        The polygons are implicitly closed, and their interior is determined
+        by the fill rule. `clip` is an optional (top, bottom, left, right)
+        window outside of which nothing is painted.
+
+        """
+        polygons = [polygon for polygon in polygons if len(polygon) > 1]
+        if not polygons:
+            return
+        starts = numpy.vstack(polygons)
+        ends = numpy.vstack([numpy.roll(polygon, -1, axis=0)
+                             for polygon in polygons])
+        height, width = self.out.shape[:2]
+        top, bottom, left, right = 0, height, 0, width
+        if clip is not None:
+            top, bottom, left, right = clip
+        top = max(top, int(math.floor(starts[:, 1].min())))
+        bottom = min(bottom, int(math.ceil(starts[:, 1].max())) + 1)
+        left = max(left, int(math.floor(starts[:, 0].min())))
+        right = min(right, int(math.ceil(starts[:, 0].max())) + 1)
+        if left >= right or top >= bottom:
+            return
+        x0, y0 = starts[:, 0], starts[:, 1]
+        x1, y1 = ends[:, 0], ends[:, 1]
+        # Each edge crosses the centers (row + .5) of the rows in
+        # [first_row, last_row)
+        low = numpy.minimum(y0, y1)
+        high = numpy.maximum(y0, y1)
+        first_row = numpy.maximum(numpy.ceil(low - .5), top).astype(int)
+        last_row = numpy.minimum(numpy.ceil(high - .5), bottom).astype(int)
+        counts = numpy.maximum(last_row - first_row, 0)
+        total = counts.sum()
+        if not total:
+            return
+        edge = numpy.repeat(numpy.arange(len(counts)), counts)
+        offsets = numpy.arange(total) - numpy.repeat(
+            numpy.cumsum(counts) - counts, counts)
+        rows = first_row[edge] + offsets
+        centers = rows + .5
+        slope = (x1 - x0)[edge] / (y1 - y0)[edge]
+        crossings = x0[edge] + (centers - y0[edge]) * slope
+        direction = numpy.where(y1[edge] > y0[edge], 1, -1)
+        if evenodd:
+            direction = numpy.ones_like(direction)
+        # A crossing at x affects the pixels whose centers (col + .5) are to
+        # its right
+        cols = numpy.clip(numpy.floor(crossings + .5).astype(int) - left,
+                          0, right - left)
+        diff = numpy.zeros((bottom - top, right - left + 1), dtype=int)
+        numpy.add.at(diff, (rows - top, cols), direction)
+        winding = numpy.cumsum(diff[:, :-1], axis=1)
+        if evenodd:
+            mask = winding % 2 != 0
+        else:
+            mask = winding != 0
+        self.out[top:bottom, left:right][mask] = color
+
+    def clip_window(self, obj):
+        "Return the pixel window for the object's clip, if any."
+        if obj.clip_bbox is None:
+            return None
+        window = self.window(obj.clip_bbox)
+        if window is None:
+            return (0, 0, 0, 0)
+        return window
+
+    def draw_shape(self, shape):
+        "Paint a `Shape`'s fill and stroke."
+        subpaths = geometry.flatten(shape, self.tolerance)
+        if not subpaths:
+            return
+        clip = self.clip_window(shape)
+        pixel_paths = [(self.to_pixels(subpath.points), subpath.closed)
+                       for subpath in subpaths]
+        if shape.fill is not None:
+            color = _to_rgb(shape.fill.color)
+            if color is not None:
+                self.fill_polygons([points for points, _ in pixel_paths],
+                                   shape.evenodd, color, clip)
+        if shape.stroke is not None:
+            color = _to_rgb(shape.stroke.color)
+            if color is not None:
+                half_width = max(shape.stroke.linewidth * self.scale, 1) / 2
+                self.fill_polygons(
+                    _stroke_quads(pixel_paths, half_width), False, color,
+                    clip)
+
+    def fill_box(self, bbox, color, clip=None):
+        "Fill a rectangle given in page coordinates."
+        window = self.window(bbox)
+        if window is None:
+            return
+        top, bottom, left, right = window
+        if clip is not None:
+            top, bottom = max(top, clip[0]), min(bottom, clip[1])
+            left, right = max(left, clip[2]), min(right, clip[3])
+        if left < right and top < bottom:
+            self.out[top:bottom, left:right] = color
+
+    def draw_lettering(self, lettering):
+        "Paint a lettering as a box."
+        if lettering and not lettering.isspace():
+            self.fill_box(lettering.get_bbox(), TEXT_COLOR,
+                          self.clip_window(lettering))
+
+    def draw_image(self, image):
+        """
+        Paint an `Image` at its placement.
+
+        Each pixel in the image's bounding box is mapped back to the image's
+        unit square through the inverse of its CTM and takes the color of
+        the nearest image sample. Images that can't be decoded are drawn as
+        gray boxes.
+
+        """
+        window = self.window(image.get_bbox())
+        clip = self.clip_window(image)
+        if window is None:
+            return
+        top, bottom, left, right = window
+        if clip is not None:
+            top, bottom = max(top, clip[0]), min(bottom, clip[1])
+            left, right = max(left, clip[2]), min(right, clip[3])
+            if left >= right or top >= bottom:
+                return
+        try:
+            samples = numpy.asarray(image.as_pil().convert('RGBA'))
+        except Exception:  #pylint: disable=W0703
+            self.fill_box(image.get_bbox(), MISSING_IMAGE_COLOR, clip)
+            return
+        a, b, c, d, e, f = image.ctm  #pylint: disable=C0103
+        det = a * d - b * c
+        if not det:
+            return
+        rows, cols = numpy.mgrid[top:bottom, left:right]
+        x = (cols + .5) / self.scale - e
+        y = self.page_height - (rows + .5) / self.scale - f
+        # Invert the CTM: the unit square maps onto the image, with v = 1
+        # at its top row
+        u = (d * x - c * y) / det
+        v = (a * y - b * x) / det
+        inside = (u >= 0) & (u < 1) & (v > 0) & (v <= 1)
+        img_height, img_width = samples.shape[:2]
+        sample_cols = numpy.clip((u * img_width).astype(int), 0,
+                                 img_width - 1)
+        sample_rows = numpy.clip(((1 - v) * img_height).astype(int), 0,
+                                 img_height - 1)
+        pixels = samples[sample_rows[inside], sample_cols[inside]]
+        alpha = pixels[:, 3:4] / 255
+        target = self.out[top:bottom, left:right]
+        target[inside] = (pixels[:, :3] * alpha
+                          + target[inside] * (1 - alpha)).round()
+
+    def draw(self, obj):
+        "Paint any graphics object."
+        if hasattr(obj, 'path'):
+            self.draw_shape(obj)
+        elif hasattr(obj, 'ctm'):
+            self.draw_image(obj)
+        else:
+            self.draw_lettering(obj)
+
+
+def _stroke_quads(pixel_paths, half_width):
+    "Return the quadrilaterals covering each segment of the paths."
+    quads = []
+    for points, closed in pixel_paths:
+        if closed:
+            points = numpy.vstack((points, points[:1]))
+        start, end = points[:-1], points[1:]
+        delta = end - start
+        length = numpy.hypot(delta[:, 0], delta[:, 1])
+        keep = length > 0
+        start, end, delta, length = (start[keep], end[keep], delta[keep],
+                                     length[keep])
+        if not len(start):
+            continue
+        # The normal (rotated 90 degrees) scaled to half the line width.
+        # All the quads have the same orientation, so the nonzero rule
+        # paints their union
+        normal = numpy.empty_like(delta)
+        normal[:, 0] = -delta[:, 1]
+        normal[:, 1] = delta[:, 0]
+        normal *= (half_width / length)[:, None]
+        corners = numpy.stack((start + normal, end + normal,
+                               end - normal, start - normal), axis=1)
+        quads.extend(corners)
+    return quads
+
+
+def rasterize(page, dpi=72, out=None, background=(255, 255, 255),
+              draw_text=True):
+    """
+    Render a `Page` into an RGB image array.
+
+    `dpi` -- the resolution of the result, in pixels per inch
+    `out` -- an optional (height, width, 3) uint8 array to draw on, which
+             is cleared to `background` first. Its size must match the page
+             at the given resolution.
+    `background` -- the RGB color of the page
+    `draw_text` -- whether to draw the letterings' bounding boxes
+
+    Objects are painted in the order they were drawn (by `z_index`).
+    Returns the image array, with the top of the page in its first row.
+
+    """
+    scale = dpi / 72
+    size = (int(math.ceil(page.height * scale)),
+            int(math.ceil(page.width * scale)), 3)
+    if out is None:
+        out = numpy.empty(size, dtype=numpy.uint8)
+    elif out.shape != size:
+        raise ValueError("Expected an output array of shape %r, got %r"
+                         % (size, out.shape))
+    out[...] = background
+    rasterizer = Rasterizer(out, scale, page.height)
+    objects = list(page.shapes) + list(page.images)
+    if draw_text:
+        objects.extend(page.letterings)
+    objects.sort(key=lambda obj: obj.z_index)
+    for obj in objects:
+        rasterizer.draw(obj)
+    return out
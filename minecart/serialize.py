@@ -0,0 +1,430 @@
+u"""
+This module converts pages to and from a compact binary format.
+
+`Page` objects keep references to the pdfminer objects they were built from
+(the page itself, fonts, image streams), so pickling them drags along most
+of the parsed document, if it works at all. `dumps` writes out only what the
+graphics objects are made of, detached from the document:
+
+* the page size and boxes;
+* the shapes, with their path operators in a string and all their
+  coordinates in a single packed array of doubles;
+* the fill and stroke colors and the stroke parameters, each stored once in
+  a table and referenced by index;
+* the letterings' text, bounding boxes and per-character boxes, with the
+  font names stored once;
+* the images' CTMs, PDF object ids and simple stream attributes (size,
+  bits per component, color space and filter names), and for inline
+  images, which have no object id, all of their attributes and data;
+* the z-index and clipping box of every object.
+
+The result is a `marshal` dump of plain tuples, strings and byte strings, so
+that it loads quickly. Since `marshal`'s format may change between Python
+versions, the data is meant for caches and for moving pages between
+processes, not for long-term storage.
+
+Colors in device color spaces, Pattern and Separation keep their values;
+colors in other color spaces are stored as their DeviceRGB equivalents.
+Loaded letterings get a `DetachedFont` holding only the font name. Loaded
+images only have their stream attributes, unless a `Document` is given to
+`loads`, in which case the image streams are looked up by object id.
+Inline images are always rebuilt whole.
+
+"""
+
+from __future__ import division
+
+import array
+import itertools
+import marshal
+
+import pdfminer.pdftypes
+import pdfminer.psparser
+
+from . import color
+from . import content
+from .miner import FillState, StrokeState
+
+MAGIC = b'MCPG'
+FORMAT_VERSION = 2
+
+# The number of coordinates following each path operator
+PATH_ARGS = {'m': 2, 'l': 2, 'c': 6, 'v': 4, 'y': 4, 'h': 0}
+
+
+class DetachedFont(object):
+
+    """
+    Stands in for the font of a loaded `Lettering`.
+
+    `fontname` -- the name of the PDF font, or None if it had none
+
+    """
+
+    def __init__(self, fontname):
+        self.fontname = fontname
+
+    def __repr__(self):
+        return "<%s: %s>" % (self.__class__.__name__, self.fontname)
+
+
+class _Table(object):
+
+    "Assigns consecutive ids to distinct hashable values."
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def add(self, value):
+        "Return the id for `value`, adding it if new."
+        try:
+            return self.ids[value]
+        except KeyError:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+            return self.ids[value]
+
+
+def _color_key(col):
+    """
+    Return a marshalable (family name, value) tuple for a `Color`.
+
+    None is kept as None, and colors that can't be stored (including
+    `NO_COLOR`) are mapped to an empty tuple.
+
+    """
+    if col is None:
+        return None
+    if col is color.NO_COLOR:
+        return ()
+    family = col.space.family
+    if isinstance(family, (color.DeviceFamily, color.StubColorSpaceFamily)):
+        try:
+            return (family.name, tuple(float(part) for part in col.value))
+        except (TypeError, ValueError):
+            # E.g., a Pattern color referring to a pattern by name
+            return (family.name, None)
+    try:
+        rgb = col.as_rgb()
+        return ('DeviceRGB', tuple(float(part) for part in rgb))
+    except Exception:  #pylint: disable=W0703
+        return ()
+
+
+def _make_color(key, spaces):
+    "Rebuild a `Color` from the output of `_color_key`."
+    if key is None:
+        return None
+    if not key:
+        return color.NO_COLOR
+    name, value = key
+    space = spaces.get(name)
+    if space is None:
+        space = spaces[name] = color.FAMILIES[name].make_space()
+    return color.Color(space, value)
+
+
+def _stroke_key(stroke, colors):
+    "Return a marshalable tuple with the parameters of a `StrokeState`."
+    dash = stroke.dash
+    if dash is not None:
+        dashes, phase = dash
+        dash = (tuple(float(value) for value in dashes), float(phase))
+    return (colors.add(_color_key(stroke.color)), stroke.linewidth,
+            stroke.linecap, stroke.linejoin, stroke.miterlimit, dash)
+
+
+def _make_stroke(key, colors):
+    "Rebuild a `StrokeState` from the output of `_stroke_key`."
+    stroke = StrokeState()
+    (color_id, stroke.linewidth, stroke.linecap, stroke.linejoin,
+     stroke.miterlimit, dash) = key
+    stroke.color = colors[color_id]
+    stroke.dash = None if dash is None else (list(dash[0]), dash[1])
+    return stroke
+
+
+def _image_attrs(stream):
+    """
+    Return the simple entries of an image's stream dictionary.
+
+    Numbers and booleans are kept as they are, and PDF names (or lists of
+    names) are stored as strings (or tuples of strings).
+
+    """
+    attrs = {}
+    for key, value in stream.attrs.items():
+        value = pdfminer.pdftypes.resolve1(value)
+        if isinstance(value, (bool, int, float)):
+            attrs[key] = value
+        elif isinstance(value, pdfminer.psparser.PSLiteral):
+            attrs[key] = pdfminer.psparser.literal_name(value)
+        elif isinstance(value, list) and value and all(
+                isinstance(item, pdfminer.psparser.PSLiteral)
+                for item in value):
+            attrs[key] = tuple(pdfminer.psparser.literal_name(item)
+                               for item in value)
+    return attrs
+
+
+def _inline_image(stream):
+    """
+    Return the attributes and data of an inline image's `PDFStream`.
+
+    Inline images can't be looked up in the document, so all of their
+    attributes (see `_encode_object`) and data are kept.
+
+    """
+    data = [stream.rawdata, stream.data]
+    for index, value in enumerate(data):
+        if isinstance(value, str):
+            data[index] = value.encode('latin-1')
+    return (_encode_object(stream.attrs),) + tuple(data)
+
+
+def _make_inline_image(inline):
+    "Rebuild an inline image's `PDFStream` from `_inline_image`."
+    attrs, rawdata, data = inline
+    stream = pdfminer.pdftypes.PDFStream(_decode_object(attrs), rawdata)
+    stream.data = data
+    return stream
+
+
+def _encode_object(value):
+    """
+    Convert a direct PDF object to plain types, for `marshal`.
+
+    Names become ('/', name), arrays ('[', items) and dictionaries ('<<',
+    items), so that they can be told apart from strings and tuples.
+
+    """
+    if isinstance(value, pdfminer.psparser.PSLiteral):
+        return ('/', pdfminer.psparser.literal_name(value))
+    if isinstance(value, list):
+        return ('[', tuple(_encode_object(item) for item in value))
+    if isinstance(value, dict):
+        return ('<<', tuple((key, _encode_object(item))
+                            for key, item in sorted(value.items())))
+    return value
+
+
+def _decode_object(value):
+    "Rebuild a PDF object from `_encode_object`."
+    if not isinstance(value, tuple):
+        return value
+    kind, items = value
+    if kind == '/':
+        return pdfminer.psparser.LIT(items)
+    if kind == '[':
+        return [_decode_object(item) for item in items]
+    return dict((key, _decode_object(item)) for key, item in items)
+
+
+def _make_stream(attrs, objid):
+    "Build a data-less `PDFStream` with the attributes from `_image_attrs`."
+    resolved = {}
+    for key, value in attrs.items():
+        if isinstance(value, str):
+            value = pdfminer.psparser.LIT(value)
+        elif isinstance(value, tuple):
+            value = [pdfminer.psparser.LIT(item) for item in value]
+        resolved[key] = value
+    stream = pdfminer.pdftypes.PDFStream(resolved, None)
+    stream.objid = objid
+    return stream
+
+
+def _pack(typecode, values):
+    "Pack a sequence of numbers into a byte string."
+    return array.array(typecode, values).tobytes()
+
+
+def _unpack(typecode, data):
+    "Unpack a byte string written by `_pack`."
+    values = array.array(typecode)
+    values.frombytes(data)
+    return values
+
+
+def dumps(page):
+    """
+    Serialize a `Page` into a compact byte string.
+
+    The page can be rebuilt with `loads`. See the module documentation for
+    what is (and isn't) kept.
+
+    """
+    colors = _Table()
+    strokes = _Table()
+    clips = _Table()
+
+    def clip_id(obj):
+        "Return the id of the object's clip box, or -1 if unclipped."
+        if obj.clip_bbox is None:
+            return -1
+        return clips.add(tuple(float(value) for value in obj.clip_bbox))
+
+    ops, op_counts, coords = [], [], []
+    shape_ints = []  # (z_index, stroke, fill, evenodd, clip) per shape
+    for shape in page.shapes:
+        count = 0
+        for segment in shape.path:
+            ops.append(segment[0])
+            coords.extend(segment[1:1 + PATH_ARGS[segment[0]]])
+            count += 1
+        op_counts.append(count)
+        shape_ints.extend((
+            shape.z_index,
+            -1 if shape.stroke is None else strokes.add(
+                _stroke_key(shape.stroke, colors)),
+            -1 if shape.fill is None else colors.add(
+                _color_key(shape.fill.color)),
+            1 if shape.evenodd else 0,
+            clip_id(shape)))
+
+    fonts = _Table()
+    texts, bboxes, char_counts, char_boxes = [], [], [], array.array('f')
+    lettering_ints = []  # (z_index, font, horizontal, clip) per lettering
+    for lettering in page.letterings:
+        texts.append(lettering)
+        bboxes.extend(lettering.bbox)
+        if lettering.char_bboxes is None:
+            char_counts.append(-1)
+        else:
+            char_counts.append(len(lettering.char_bboxes))
+            char_boxes.extend(lettering.char_bboxes)
+        fontname = getattr(lettering.font, 'fontname', None)
+        lettering_ints.extend((
+            lettering.z_index,
+            fonts.add(None if fontname is None else str(fontname)),
+            1 if lettering.horizontal else 0,
+            clip_id(lettering)))
+
+    ctms, image_ints, image_attrs, inline_images = [], [], [], []
+    for image in page.images:
+        ctms.extend(image.ctm)
+        objid = getattr(image.obj, 'objid', None)
+        image_ints.extend((image.z_index, -1 if objid is None else objid,
+                           clip_id(image)))
+        image_attrs.append(_image_attrs(image.obj))
+        inline_images.append(
+            _inline_image(image.obj) if objid is None
+            and isinstance(image.obj, pdfminer.pdftypes.PDFStream) else None)
+
+    data = (
+        FORMAT_VERSION,
+        (page.width, page.height, tuple(page.crop_box),
+         tuple(page.bleed_box), tuple(page.trim_box), tuple(page.art_box)),
+        tuple(colors.values),
+        tuple(strokes.values),
+        tuple(clips.values),
+        (''.join(ops), _pack('i', op_counts), _pack('d', coords),
+         _pack('i', shape_ints)),
+        (tuple(fonts.values), u''.join(texts), _pack('i', [
+            len(text) for text in texts]), _pack('d', bboxes),
+         _pack('i', char_counts), char_boxes.tobytes(),
+         _pack('i', lettering_ints)),
+        (_pack('d', ctms), _pack('i', image_ints), tuple(image_attrs),
+         tuple(inline_images)),
+    )
+    return MAGIC + marshal.dumps(data)
+
+
+def loads(data, document=None):
+    """
+    Rebuild a `Page` from the output of `dumps`.
+
+    The page is not attached to any PDF page (`page.m_page` is None). If
+    `document` (a `minecart.Document`) is given, the images' streams are
+    looked up in it by object id, so that their data can be decoded.
+    Otherwise, the images get data-less streams with their simple
+    attributes.
+
+    Raises ValueError if `data` was not written by a compatible version.
+
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a serialized page")
+    parts = marshal.loads(data[len(MAGIC):])
+    if parts[0] != FORMAT_VERSION:
+        raise ValueError("Unsupported page format version: %r" % parts[0])
+    (_, boxes, color_keys, stroke_keys, clips, shape_data, lettering_data,
+     image_data) = parts
+
+    page = content.Page.detached(*boxes)
+    spaces = {}
+    colors = [_make_color(key, spaces) for key in color_keys]
+    strokes = [_make_stroke(key, colors) for key in stroke_keys]
+    fills = []
+    for col in colors:
+        fill = FillState()
+        fill.color = col
+        fills.append(fill)
+
+    max_z = -1
+    ops, op_counts, coords, shape_ints = shape_data
+    op_iter = iter(ops)
+    coord_iter = iter(_unpack('d', coords))
+    shape_ints = _unpack('i', shape_ints)
+    for i, count in enumerate(_unpack('i', op_counts)):
+        path = []
+        for kind in itertools.islice(op_iter, count):
+            path.append((kind,) + tuple(
+                itertools.islice(coord_iter, PATH_ARGS[kind])))
+        z_index, stroke, fill, evenodd, clip = shape_ints[5 * i:5 * i + 5]
+        shape = content.Shape(None if stroke < 0 else strokes[stroke],
+                              None if fill < 0 else fills[fill],
+                              bool(evenodd), path)
+        _place(page.shapes, shape, z_index, clips, clip)
+        max_z = max(max_z, z_index)
+
+    (font_names, texts, lengths, bboxes, char_counts, char_boxes,
+     lettering_ints) = lettering_data
+    fonts = [DetachedFont(name) for name in font_names]
+    bboxes = _unpack('d', bboxes)
+    char_boxes = _unpack('f', char_boxes)
+    lettering_ints = _unpack('i', lettering_ints)
+    start = char_start = 0
+    for i, (length, char_count) in enumerate(zip(_unpack('i', lengths),
+                                                 _unpack('i', char_counts))):
+        text = texts[start:start + length]
+        start += length
+        char_bboxes = None
+        if char_count >= 0:
+            char_bboxes = char_boxes[char_start:char_start + char_count]
+            char_start += char_count
+        z_index, font, horizontal, clip = lettering_ints[4 * i:4 * i + 4]
+        lettering = content.Lettering(
+            text, fonts[font], tuple(bboxes[4 * i:4 * i + 4]),
+            bool(horizontal), char_bboxes)
+        _place(page.letterings, lettering, z_index, clips, clip)
+        max_z = max(max_z, z_index)
+
+    ctms, image_ints, image_attrs, inline_images = image_data
+    ctms = _unpack('d', ctms)
+    image_ints = _unpack('i', image_ints)
+    for i, attrs in enumerate(image_attrs):
+        z_index, objid, clip = image_ints[3 * i:3 * i + 3]
+        objid = None if objid < 0 else objid
+        stream = None
+        if inline_images[i] is not None:
+            stream = _make_inline_image(inline_images[i])
+        elif document is not None and objid is not None:
+            stream = pdfminer.pdftypes.resolve1(document.doc.getobj(objid))
+        if stream is None:
+            stream = _make_stream(attrs, objid)
+        image = content.Image(tuple(ctms[6 * i:6 * i + 6]), stream)
+        _place(page.images, image, z_index, clips, clip)
+        max_z = max(max_z, z_index)
+
+    page.next_z_index = itertools.count(max_z + 1)
+    return page
+
+
+def _place(collection, obj, z_index, clips, clip):
+    "Add a loaded object to a page collection."
+    obj.z_index = z_index
+    if clip >= 0:
+        obj.clip_bbox = clips[clip]
+    collection.append(obj)
@@ -0,0 +1,269 @@
+u"""
+This module exports pages as SVG documents.
+
+The SVG is written straight to a file object, one element at a time, so the
+memory used does not depend on the size of the page. The graphics objects
+are written in the order they were drawn, with:
+
+* `Shape` objects as `<path>` elements, carrying their fill and stroke
+  colors (from `Color.as_rgb`), fill rule and stroke parameters;
+* `Lettering` objects as `<text>` elements stretched over their bounding
+  boxes (the actual glyphs are not exported);
+* `Image` objects as `<image>` elements, transformed by their CTM. Images
+  are embedded as PNG data URIs by default (which requires `pillow`), but a
+  callback can provide a URL for each image instead.
+
+Clipping paths are exported through their bounding boxes, as `<clipPath>`
+definitions written the first time each box is used.
+
+"""
+
+from __future__ import division
+
+import base64
+import heapq
+import io
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+LINE_CAPS = ('butt', 'round', 'square')
+LINE_JOINS = ('miter', 'round', 'bevel')
+
+# Characters that are not allowed in XML documents
+_INVALID_XML = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def format_number(value, precision=3):
+    "Format a number compactly, with at most `precision` decimals."
+    text = '%.*f' % (precision, value)
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    if text == '-0':
+        text = '0'
+    return text
+
+
+def format_color(color):
+    "Return the SVG color for a `Color`, or None if it can't be converted."
+    try:
+        rgb = color.as_rgb()
+    except Exception:  #pylint: disable=W0703
+        return None
+    if rgb is None or len(rgb) != 3:
+        return None
+    return '#%02x%02x%02x' % tuple(
+        int(round(min(max(value, 0), 1) * 255)) for value in rgb)
+
+
+def embed_image(image):
+    """
+    Return a data URI with the image encoded as PNG, or None on failure.
+
+    Requires `pillow` to be installed.
+
+    """
+    try:
+        pil_image = image.as_pil()
+        if pil_image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+            pil_image = pil_image.convert('RGB')
+        buf = io.BytesIO()
+        pil_image.save(buf, 'PNG')
+    except Exception:  #pylint: disable=W0703
+        return None
+    return 'data:image/png;base64,' + base64.b64encode(
+        buf.getvalue()).decode('ascii')
+
+
+class SVGWriter(object):
+
+    """
+    Writes the graphics objects on a page as SVG elements.
+
+    `fp` -- a text file object to write to
+    `height` -- the page height, used to flip the y axis
+    `image_href` -- a callable taking an `Image` and returning the URL to
+                    use for it (or None to skip the image)
+    `precision` -- the number of decimals to use for coordinates
+
+    """
+
+    def __init__(self, fp, height, image_href=embed_image, precision=3):
+        self.fp = fp
+        self.height = height
+        self.image_href = image_href
+        self.precision = precision
+        self.clip_ids = {}
+
+    def num(self, value):
+        "Format a number."
+        return format_number(value, self.precision)
+
+    def point(self, x, y):
+        "Format a point, flipping the y axis."
+        return '%s %s' % (self.num(x), self.num(self.height - y))
+
+    def clip_attr(self, obj):
+        "Return the clip-path attribute for an object, defining it if new."
+        if obj.clip_bbox is None:
+            return ''
+        clip_id = self.clip_ids.get(obj.clip_bbox)
+        if clip_id is None:
+            clip_id = self.clip_ids[obj.clip_bbox] = 'clip%d' % len(
+                self.clip_ids)
+            left, bottom, right, top = obj.clip_bbox
+            self.fp.write(
+                '<clipPath id="%s"><rect x="%s" y="%s" width="%s" '
+                'height="%s"/></clipPath>\n' % (
+                    clip_id, self.num(left), self.num(self.height - top),
+                    self.num(max(right - left, 0)),
+                    self.num(max(top - bottom, 0))))
+        return ' clip-path="url(#%s)"' % clip_id
+
+    def path_data(self, path):
+        "Convert a `Shape` path into SVG path data."
+        parts = []
+        current = (0, 0)
+        for segment in path:
+            kind = segment[0]
+            if kind == 'm':
+                parts.append('M' + self.point(*segment[1:3]))
+                current = segment[1:3]
+            elif kind == 'l':
+                parts.append('L' + self.point(*segment[1:3]))
+                current = segment[1:3]
+            elif kind == 'h':
+                parts.append('Z')
+            else:
+                if kind == 'c':
+                    control = segment[1:7]
+                elif kind == 'v':
+                    control = tuple(current) + segment[1:5]
+                elif kind == 'y':
+                    control = segment[1:5] + segment[3:5]
+                else:
+                    continue
+                parts.append('C' + ' '.join(
+                    self.point(*control[i:i + 2]) for i in (0, 2, 4)))
+                current = control[4:6]
+        return ''.join(parts)
+
+    def write_shape(self, shape):
+        "Write a `Shape` as a path element."
+        data = self.path_data(shape.path)
+        if not data:
+            return
+        attrs = []
+        fill = shape.fill and format_color(shape.fill.color)
+        attrs.append(' fill="%s"' % (fill or 'none'))
+        if fill and shape.evenodd:
+            attrs.append(' fill-rule="evenodd"')
+        stroke = shape.stroke and format_color(shape.stroke.color)
+        if stroke:
+            params = shape.stroke
+            attrs.append(' stroke="%s" stroke-width="%s"' % (
+                stroke, self.num(params.linewidth)))
+            if params.linecap in (1, 2):
+                attrs.append(' stroke-linecap="%s"'
+                             % LINE_CAPS[params.linecap])
+            if params.linejoin in (1, 2):
+                attrs.append(' stroke-linejoin="%s"'
+                             % LINE_JOINS[params.linejoin])
+            # pdfminer leaves the miter limit and dash pattern as None until
+            # they're set, which means the PDF defaults
+            miterlimit = (10 if params.miterlimit is None
+                          else params.miterlimit)
+            if miterlimit != 4:
+                attrs.append(' stroke-miterlimit="%s"'
+                             % self.num(max(miterlimit, 1)))
+            dashes, phase = params.dash or ([], 0)
+            if dashes and any(dashes):
+                attrs.append(' stroke-dasharray="%s"' % ' '.join(
+                    self.num(dash) for dash in dashes))
+                if phase:
+                    attrs.append(' stroke-dashoffset="%s"' % self.num(phase))
+        elif not fill:
+            return
+        attrs.append(self.clip_attr(shape))
+        self.fp.write('<path d="%s"%s/>\n' % (data, ''.join(attrs)))
+
+    def write_lettering(self, lettering):
+        "Write a `Lettering` as a text element stretched over its bbox."
+        text = _INVALID_XML.sub(u'', lettering)
+        if not text.strip():
+            return
+        left, bottom, right, top = lettering.get_bbox()
+        attrs = []
+        font_name = getattr(lettering.font, 'fontname', None)
+        if font_name:
+            # Drop the subset prefix (e.g., 'ABCDEF+Helvetica')
+            font_name = str(font_name).split('+', 1)[-1]
+            attrs.append(' font-family=%s' % quoteattr(font_name))
+        if lettering.horizontal:
+            size, length = top - bottom, right - left
+            x, y = left, bottom
+        else:
+            size, length = right - left, top - bottom
+            x, y = (left + right) / 2, top
+            attrs.append(' writing-mode="tb"')
+        if size <= 0:
+            return
+        if length > 0:
+            attrs.append(' textLength="%s" lengthAdjust="spacingAndGlyphs"'
+                         % self.num(length))
+        attrs.append(self.clip_attr(lettering))
+        self.fp.write('<text x="%s" y="%s" font-size="%s"%s>%s</text>\n' % (
+            self.num(x), self.num(self.height - y), self.num(size),
+            ''.join(attrs), escape(text)))
+
+    def write_image(self, image):
+        "Write an `Image` element, placed with its CTM."
+        href = self.image_href(image) if self.image_href else None
+        if href is None:
+            return
+        # Maps the image (with its first row at the top) onto the page,
+        # and then flips the page's y axis
+        a, b, c, d, e, f = image.ctm  #pylint: disable=C0103
+        matrix = (a, -b, -c, d, c + e, self.height - d - f)
+        self.fp.write(
+            '<image width="1" height="1" preserveAspectRatio="none" '
+            'transform="matrix(%s)" xlink:href=%s%s/>\n' % (
+                ' '.join(self.num(value) for value in matrix),
+                quoteattr(href), self.clip_attr(image)))
+
+    def write(self, obj):
+        "Write any graphics object."
+        if hasattr(obj, 'path'):
+            self.write_shape(obj)
+        elif hasattr(obj, 'ctm'):
+            self.write_image(obj)
+        else:
+            self.write_lettering(obj)
+
+
+def write_svg(page, fp, image_href=embed_image, precision=3):
+    """
+    Write a `Page` to the text file object `fp` as an SVG document.
+
+    `image_href` -- a callable taking an `Image` and returning the URL for
+                    the image, or None to leave it out. Defaults to embedding
+                    the image as a PNG data URI. Pass None to leave out all
+                    images.
+    `precision` -- the number of decimals to write for coordinates
+
+    The objects are written in the order they were drawn, as soon as they
+    are converted, so the whole document is never held in memory.
+
+    """
+    writer = SVGWriter(fp, page.height, image_href, precision)
+    fp.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<svg xmlns="http://www.w3.org/2000/svg" '
+        'xmlns:xlink="http://www.w3.org/1999/xlink" version="1.1" '
+        'width="%spt" height="%spt" viewBox="0 0 %s %s">\n' % (
+            writer.num(page.width), writer.num(page.height),
+            writer.num(page.width), writer.num(page.height)))
+    # Each collection is already sorted by z_index
+    for obj in heapq.merge(page.shapes, page.images, page.letterings,
+                           key=lambda obj: obj.z_index):
+        writer.write(obj)
+    fp.write('</svg>\n')
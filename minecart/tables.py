@@ -0,0 +1,424 @@
+u"""
+This module finds ruled tables among the shapes on a page.
+
+Tables are usually drawn as many short horizontal and vertical lines (or
+thin filled rectangles), often one per cell edge. Finding them takes four
+steps, each built on sorting so that pages with tens of thousands of rules
+stay fast:
+
+1. The axis-aligned straight segments of the page's shapes are classified
+   as horizontal or vertical rules (`extract_rules`).
+2. Collinear rules that touch or overlap are merged with a sort-and-sweep
+   (`merge_rules`).
+3. Horizontal and vertical rules that cross are found by bisecting into the
+   vertical rules sorted by x, and crossing rules are joined into connected
+   components with a union-find structure. Each component with enough rules
+   becomes a `Table`, whose grid lines are the distinct positions of its
+   rules.
+4. Letterings are assigned to cells by bisecting their centers into the grid
+   lines. Adjacent cells not separated by a rule are merged into spanning
+   cells.
+
+"""
+
+from __future__ import division
+
+import bisect
+
+from . import text
+
+
+class Rule(object):
+
+    """
+    A horizontal or vertical line segment on the page.
+
+    `horizontal` -- whether the rule is horizontal
+    `position` -- the y coordinate of a horizontal rule, or the x coordinate
+                  of a vertical one
+    `start`, `end` -- the extent of the rule along its direction
+                      (`start <= end`)
+
+    """
+
+    __slots__ = ('horizontal', 'position', 'start', 'end')
+
+    def __init__(self, horizontal, position, start, end):
+        self.horizontal = horizontal
+        self.position = position
+        self.start = start
+        self.end = end
+
+    def get_bbox(self):
+        "Return the bounding box of the rule."
+        if self.horizontal:
+            return (self.start, self.position, self.end, self.position)
+        return (self.position, self.start, self.position, self.end)
+
+    def __repr__(self):
+        return "<%s: %s %r %r-%r>" % (
+            self.__class__.__name__,
+            'horizontal' if self.horizontal else 'vertical',
+            self.position, self.start, self.end)
+
+
+class TableCell(object):
+
+    """
+    A cell in a `Table`.
+
+    `row`, `col` -- the index of the cell's top-left position in the grid
+    `rowspan`, `colspan` -- the number of grid rows and columns the cell
+                            covers
+    `bbox` -- the bounding box of the cell
+    `letterings` -- the `Lettering` objects whose centers fall in the cell
+
+    """
+
+    def __init__(self, row, col, bbox):
+        self.row = row
+        self.col = col
+        self.rowspan = 1
+        self.colspan = 1
+        self.bbox = bbox
+        self.letterings = []
+
+    def get_bbox(self):
+        return self.bbox
+
+    @property
+    def text(self):
+        "Return the text in the cell, with one line per row."
+        return u'\n'.join(text.group_lines(self.letterings))
+
+    def __repr__(self):
+        return "<%s: (%d, %d) %r>" % (self.__class__.__name__,
+                                      self.row, self.col, self.bbox)
+
+
+class Table(object):
+
+    """
+    A ruled table found on a page.
+
+    `xs` -- the x coordinates of the column boundaries, left to right
+    `ys` -- the y coordinates of the row boundaries, top to bottom
+    `cells` -- the list of `TableCell`s, in reading order. Spanning cells
+               only appear once.
+    `rules` -- the merged `Rule`s making up the table
+
+    """
+
+    def __init__(self, xs, ys, cells, rules):
+        self.xs = xs
+        self.ys = ys
+        self.cells = cells
+        self.rules = rules
+        self.bbox = (xs[0], ys[-1], xs[-1], ys[0])
+
+    def get_bbox(self):
+        return self.bbox
+
+    @property
+    def shape(self):
+        "Return the number of (grid) rows and columns in the table."
+        return len(self.ys) - 1, len(self.xs) - 1
+
+    def as_lists(self):
+        """
+        Return the text of the table as a list of rows.
+
+        Each row is a list with the text in each grid column. The text of a
+        spanning cell is placed at its top-left position, and the other
+        positions it covers are set to None.
+
+        """
+        rows, cols = self.shape
+        grid = [[None] * cols for _ in range(rows)]
+        for cell in self.cells:
+            grid[cell.row][cell.col] = cell.text
+        return grid
+
+    def __repr__(self):
+        return "<%s: %dx%d %r>" % ((self.__class__.__name__,) + self.shape
+                                   + (self.bbox,))
+
+
+def extract_rules(shapes, max_thickness=2., tolerance=.5):
+    """
+    Return a list with the horizontal and vertical `Rule`s in `shapes`.
+
+    The straight, axis-aligned segments of stroked paths are rules (with
+    `tolerance` as the maximum deviation from the axis). Filled rectangles
+    thinner than `max_thickness` in one direction are rules along their
+    center line. Curved segments are ignored.
+
+    """
+    rules = []
+    for shape in shapes:
+        if shape.stroke is None:
+            if shape.fill is None or not _is_rectangle(shape.path):
+                continue
+            left, bottom, right, top = shape.get_bbox()
+            width, height = right - left, top - bottom
+            if height <= max_thickness < width:
+                rules.append(Rule(True, (top + bottom) / 2, left, right))
+            elif width <= max_thickness < height:
+                rules.append(Rule(False, (left + right) / 2, bottom, top))
+            continue
+        start = current = None
+        for segment in shape.path:
+            kind = segment[0]
+            if kind == 'm':
+                start = current = segment[1:3]
+                continue
+            elif kind == 'l':
+                point = segment[1:3]
+            elif kind == 'h':
+                point = start
+            else:
+                current = segment[-2:]
+                continue
+            if current is not None and point is not None:
+                rule = _segment_rule(current, point, tolerance)
+                if rule is not None:
+                    rules.append(rule)
+            current = point
+    return rules
+
+
+def _is_rectangle(path):
+    "Check whether a path is a single subpath of at most five lines."
+    if not path or path[0][0] != 'm':
+        return False
+    for segment in path[1:]:
+        if segment[0] not in 'lh':
+            return False
+    return len(path) <= 6
+
+
+def _segment_rule(point_0, point_1, tolerance):
+    "Return a `Rule` for a line segment if it is horizontal or vertical."
+    (x0, y0), (x1, y1) = point_0, point_1
+    if abs(y1 - y0) <= tolerance and abs(x1 - x0) > tolerance:
+        return Rule(True, (y0 + y1) / 2, min(x0, x1), max(x0, x1))
+    if abs(x1 - x0) <= tolerance and abs(y1 - y0) > tolerance:
+        return Rule(False, (x0 + x1) / 2, min(y0, y1), max(y0, y1))
+    return None
+
+
+def merge_rules(rules, tolerance=1.):
+    """
+    Merge collinear rules that overlap or nearly touch.
+
+    Rules are collinear if their positions differ by at most `tolerance`,
+    and are merged if the gap between them is at most `tolerance`. Merged
+    rules take the position of the first (lowest) rule in the group.
+    Returns a new list of rules, sorted by orientation, position and start.
+
+    """
+    merged = []
+    for horizontal in (True, False):
+        group = sorted((rule for rule in rules
+                        if rule.horizontal == horizontal),
+                       key=lambda rule: (rule.position, rule.start))
+        i = 0
+        while i < len(group):
+            # Collect the run of rules at (nearly) the same position
+            position = group[i].position
+            j = i
+            while (j < len(group)
+                   and group[j].position - position <= tolerance):
+                j += 1
+            current = None
+            for rule in sorted(group[i:j], key=lambda rule: rule.start):
+                if (current is not None
+                        and rule.start <= current.end + tolerance):
+                    current.end = max(current.end, rule.end)
+                else:
+                    current = Rule(horizontal, position, rule.start, rule.end)
+                    merged.append(current)
+            i = j
+    return merged
+
+
+def _find(parents, i):
+    "Find the root of `i` in a union-find forest, compressing the path."
+    root = i
+    while parents[root] != root:
+        root = parents[root]
+    while parents[i] != root:
+        parents[i], i = root, parents[i]
+    return root
+
+
+def _distinct(values, tolerance):
+    "Return the sorted `values`, dropping those within `tolerance`."
+    result = []
+    for value in sorted(values):
+        if not result or value - result[-1] > tolerance:
+            result.append(value)
+    return result
+
+
+def _merge_intervals(intervals, tolerance):
+    "Return the union of (start, end) intervals as a sorted disjoint list."
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + tolerance:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _covered(intervals, value, tolerance):
+    "Check whether one of the disjoint sorted intervals covers `value`."
+    i = bisect.bisect_right(intervals, (value + tolerance, float('inf')))
+    return i > 0 and intervals[i - 1][1] >= value - tolerance
+
+
+def _nearest(values, value):
+    "Return the index of the item in sorted `values` closest to `value`."
+    i = bisect.bisect_left(values, value)
+    if i == len(values) or (
+            i > 0 and value - values[i - 1] < values[i] - value):
+        return i - 1
+    return i
+
+
+def _make_table(rules, tolerance):
+    """
+    Build a `Table` from the horizontal and vertical rules of a component.
+
+    Returns a tuple `(table, grid)`, where `grid` lists the cell covering
+    each grid position, row by row.
+
+    """
+    xs = _distinct((rule.position for rule in rules if not rule.horizontal),
+                   tolerance)
+    ys = _distinct((rule.position for rule in rules if rule.horizontal),
+                   tolerance)
+    # For each grid line, the intervals covered by its rules
+    vertical = [[] for _ in xs]
+    horizontal = [[] for _ in ys]
+    for rule in rules:
+        if rule.horizontal:
+            horizontal[_nearest(ys, rule.position)].append(
+                (rule.start, rule.end))
+        else:
+            vertical[_nearest(xs, rule.position)].append(
+                (rule.start, rule.end))
+    vertical = [_merge_intervals(line, tolerance) for line in vertical]
+    horizontal = [_merge_intervals(line, tolerance)
+                  for line in reversed(horizontal)]
+    ys.reverse()
+    rows, cols = len(ys) - 1, len(xs) - 1
+    # Union-find over the grid positions: neighbours not separated by a
+    # rule belong to the same cell
+    parents = list(range(rows * cols))
+    for row in range(rows):
+        middle_y = (ys[row] + ys[row + 1]) / 2
+        for col in range(cols - 1):
+            if not _covered(vertical[col + 1], middle_y, tolerance):
+                parents[_find(parents, row * cols + col + 1)] = _find(
+                    parents, row * cols + col)
+    for col in range(cols):
+        middle_x = (xs[col] + xs[col + 1]) / 2
+        for row in range(rows - 1):
+            if not _covered(horizontal[row + 1], middle_x, tolerance):
+                parents[_find(parents, (row + 1) * cols + col)] = _find(
+                    parents, row * cols + col)
+    cells = []
+    cell_map = {}
+    grid = []
+    for row in range(rows):
+        for col in range(cols):
+            root = _find(parents, row * cols + col)
+            cell = cell_map.get(root)
+            if cell is None:
+                cell = cell_map[root] = TableCell(
+                    row, col, (xs[col], ys[row + 1], xs[col + 1], ys[row]))
+                cells.append(cell)
+            else:
+                cell.rowspan = max(cell.rowspan, row - cell.row + 1)
+                cell.colspan = max(cell.colspan, col - cell.col + 1)
+                left, bottom, right, top = cell.bbox
+                cell.bbox = (min(left, xs[col]), min(bottom, ys[row + 1]),
+                             max(right, xs[col + 1]), max(top, ys[row]))
+            grid.append(cell)
+    return Table(xs, ys, cells, rules), grid
+
+
+def find_tables(shapes, letterings=(), max_thickness=2., tolerance=1.,
+                min_cells=2):
+    """
+    Find the ruled tables drawn by `shapes` and fill them with `letterings`.
+
+    `max_thickness` -- the maximum thickness of a filled rectangle to be
+                       considered a rule
+    `tolerance` -- the maximum distance between rules considered to touch
+                   or to be collinear
+    `min_cells` -- the minimum number of grid cells in a table, so that
+                   simple boxes around text or figures are not reported
+
+    Returns a list of `Table` objects, top to bottom.
+
+    """
+    rules = merge_rules(extract_rules(shapes, max_thickness, tolerance),
+                        tolerance)
+    horizontal = [rule for rule in rules if rule.horizontal]
+    vertical = sorted((rule for rule in rules if not rule.horizontal),
+                      key=lambda rule: rule.position)
+    v_positions = [rule.position for rule in vertical]
+    n_horizontal = len(horizontal)
+    parents = list(range(len(horizontal) + len(vertical)))
+    for i, h_rule in enumerate(horizontal):
+        first = bisect.bisect_left(v_positions, h_rule.start - tolerance)
+        last = bisect.bisect_right(v_positions, h_rule.end + tolerance)
+        for j in range(first, last):
+            v_rule = vertical[j]
+            if (v_rule.start - tolerance <= h_rule.position
+                    <= v_rule.end + tolerance):
+                parents[_find(parents, n_horizontal + j)] = _find(parents, i)
+    components = {}
+    for i, rule in enumerate(horizontal + vertical):
+        components.setdefault(_find(parents, i), []).append(rule)
+    found = []
+    for component in components.values():
+        n_h = sum(1 for rule in component if rule.horizontal)
+        if n_h < 2 or len(component) - n_h < 2:
+            continue
+        table, grid = _make_table(component, tolerance)
+        rows, cols = table.shape
+        if rows * cols >= min_cells:
+            found.append((table, grid))
+    found.sort(key=lambda item: (-item[0].bbox[3], item[0].bbox[0]))
+    _assign_letterings(found, letterings)
+    return [table for table, _ in found]
+
+
+def _assign_letterings(found, letterings):
+    """
+    Place each lettering in the table cell containing its center.
+
+    `found` is a list of `(table, grid)` tuples as returned by `_make_table`.
+
+    """
+    # ys is descending, so bisect into the negated values
+    neg_ys = [[-y for y in table.ys] for table, _ in found]
+    for lettering in letterings:
+        if not lettering:
+            continue
+        left, bottom, right, top = lettering.get_bbox()
+        x, y = (left + right) / 2, (bottom + top) / 2
+        for (table, grid), table_neg_ys in zip(found, neg_ys):
+            t_left, t_bottom, t_right, t_top = table.bbox
+            if not (t_left < x < t_right and t_bottom < y < t_top):
+                continue
+            rows, cols = table.shape
+            col = min(bisect.bisect_right(table.xs, x) - 1, cols - 1)
+            row = min(bisect.bisect_right(table_neg_ys, -y) - 1, rows - 1)
+            grid[row * cols + col].letterings.append(lettering)
+            break
@@ -0,0 +1,446 @@
+u"""
+This module assembles `Lettering` objects into lines and words.
+
+PDF content streams draw text in arbitrary chunks: a single `Tj` operator can
+draw a whole line or just a few characters of a word, and the chunks can be
+drawn in any order. The functions in this module reconstruct the lines of text
+on a page by clustering the letterings by their baseline, and then splitting
+and joining them by the horizontal gaps between them.
+
+The clustering uses a sort-and-sweep algorithm, so that it stays O(n log n)
+even for pages with tens of thousands of letterings. Letterings are first
+sorted by the position of their center across the line direction, and each
+lettering is only compared against the line currently being built.
+
+Vertical text (`Lettering.horizontal == False`) is handled by swapping the
+roles of the axes: lines run top to bottom, and are ordered right to left.
+
+"""
+
+from __future__ import division
+
+import bisect
+import re
+
+import six
+
+from .content import GraphicsObject
+
+WORD_RE = re.compile(r'\S+', re.UNICODE)
+
+
+class TextSpan(six.text_type, GraphicsObject):
+
+    """
+    A piece of text assembled from one or more `Lettering` objects.
+
+    `data` -- the text of the span
+    `letterings` -- the sequence of `Lettering` objects contributing to the
+                    span, in reading order
+    `bbox` -- the bounding box of the span, as (left, bottom, right, top)
+    `horizontal` -- whether the text runs horizontally
+
+    """
+
+    def __new__(cls, data, letterings, bbox, horizontal=True):
+        span = six.text_type.__new__(cls, data)
+        span.letterings = letterings
+        span.bbox = bbox
+        span.horizontal = horizontal
+        return span
+
+    def __init__(self, data, letterings, bbox, horizontal=True):
+        super(TextSpan, self).__init__()
+
+    def get_bbox(self):
+        return self.bbox
+
+    def __repr__(self):
+        return "<%s: %s %r>" % (self.__class__.__name__, self, self.bbox)
+
+
+class Word(TextSpan):
+
+    """
+    A sequence of non-whitespace characters on a single line.
+
+    A word can span several letterings (e.g., when a word is kerned using
+    `TJ`) and a lettering can contain several words.
+
+    """
+
+
+class TextLine(TextSpan):
+
+    """
+    A line of text, made up of letterings sharing a common baseline.
+
+    In addition to the `TextSpan` attributes, a line has `offsets`, a list
+    with the index in the line text at which each of its letterings starts.
+    Spaces are inserted in the text between letterings separated by a gap,
+    so the offsets need not be contiguous.
+
+    """
+
+    def __new__(cls, data, letterings, bbox, horizontal=True, offsets=()):
+        line = TextSpan.__new__(cls, data, letterings, bbox, horizontal)
+        line.offsets = offsets
+        return line
+
+    def __init__(self, data, letterings, bbox, horizontal=True, offsets=()):
+        super(TextLine, self).__init__(data, letterings, bbox, horizontal)
+
+    @property
+    def words(self):
+        "Return a list with the `Word` objects in this line."
+        return [self.make_span(match.start(), match.end(), Word)
+                for match in WORD_RE.finditer(self)]
+
+    def make_span(self, start, end, span_class=TextSpan):
+        """
+        Return a `span_class` instance with the text in `self[start:end]`.
+
+        The bounding box of the result only includes the parts of the
+        letterings that overlap the given range.
+
+        """
+        letterings, bbox = span_letterings(self.letterings, self.offsets,
+                                           start, end)
+        return span_class(self[start:end], letterings, bbox, self.horizontal)
+
+
+def substring_bbox(lettering, start, end):
+    """
+    Return the bounding box of `lettering[start:end]`.
+
+    If the lettering has no per-character bounding boxes, the box is
+    interpolated along the text direction in proportion to the number of
+    characters.
+
+    """
+    left, bottom, right, top = lettering.get_bbox()
+    length = len(lettering)
+    if not length or (start <= 0 and end >= length):
+        return (left, bottom, right, top)
+    if getattr(lettering, 'char_bboxes', None) is not None:
+        return lettering[max(0, start):min(length, end)].get_bbox()
+    start = max(0, start) / length
+    end = min(length, end) / length
+    if lettering.horizontal:
+        width = right - left
+        return (left + start * width, bottom, left + end * width, top)
+    height = top - bottom
+    return (left, top - end * height, right, top - start * height)
+
+
+def span_letterings(letterings, offsets, start, end):
+    """
+    Map the text range [start, end) back to the letterings it came from.
+
+    `letterings` and `offsets` are parallel sequences as found on `TextLine`
+    objects. Returns a tuple `(contributing, bbox)` with the list of
+    letterings overlapping the range and their combined bounding box.
+
+    """
+    first = max(bisect.bisect_right(offsets, start) - 1, 0)
+    last = bisect.bisect_left(offsets, end)
+    contributing = []
+    lefts, bottoms, rights, tops = [], [], [], []
+    for i in range(first, last):
+        lettering = letterings[i]
+        sub_start = start - offsets[i]
+        sub_end = end - offsets[i]
+        if sub_end <= 0 or sub_start >= len(lettering):
+            continue  # The range only covers an inserted space
+        contributing.append(lettering)
+        left, bottom, right, top = substring_bbox(lettering, sub_start,
+                                                  sub_end)
+        lefts.append(left)
+        bottoms.append(bottom)
+        rights.append(right)
+        tops.append(top)
+    if not contributing:
+        return contributing, None
+    return contributing, (min(lefts), min(bottoms), max(rights), max(tops))
+
+
+def _directed_box(bbox, horizontal):
+    """
+    Map a bbox to (along_0, along_1, across_0, across_1).
+
+    "along" increases in reading order within a line and "across" decreases
+    in reading order from one line to the next.
+
+    """
+    left, bottom, right, top = bbox
+    if horizontal:
+        return left, right, bottom, top
+    return -top, -bottom, left, right
+
+
+def group_lines(letterings, line_overlap=.5, char_margin=1., word_margin=.1):
+    """
+    Cluster the given letterings into `TextLine` objects.
+
+    `line_overlap` -- two letterings are on the same line if their extents
+                      across the line direction overlap by at least this
+                      fraction of the smaller one
+    `char_margin` -- letterings on the same baseline separated by more than
+                     this many line heights are split into separate lines
+                     (e.g., when they belong to different columns)
+    `word_margin` -- a space is inserted between consecutive letterings
+                     separated by more than this many line heights
+
+    Returns a list of lines, horizontal ones first, each group in reading
+    order (top to bottom for horizontal lines, right to left for vertical
+    ones).
+
+    """
+    lines = []
+    for horizontal in (True, False):
+        items = []
+        for lettering in letterings:
+            # Empty letterings have no meaningful bounding box
+            if lettering and bool(lettering.horizontal) == horizontal:
+                box = _directed_box(lettering.get_bbox(), horizontal)
+                items.append((box, lettering))
+        # Sort by the center across the lines, in reading order
+        items.sort(key=lambda item: -(item[0][2] + item[0][3]))
+        cluster = []
+        anchor = None
+        for item in items:
+            across_0, across_1 = item[0][2:]
+            if anchor is not None:
+                overlap = min(across_1, anchor[1]) - max(across_0, anchor[0])
+                size = min(across_1 - across_0, anchor[1] - anchor[0])
+                if overlap >= max(0, line_overlap * size):
+                    cluster.append(item)
+                    continue
+                lines.extend(_split_cluster(cluster, horizontal,
+                                            char_margin, word_margin))
+            cluster = [item]
+            anchor = (across_0, across_1)
+        if cluster:
+            lines.extend(_split_cluster(cluster, horizontal,
+                                        char_margin, word_margin))
+    return lines
+
+
+def _split_cluster(cluster, horizontal, char_margin, word_margin):
+    "Split a cluster of letterings on a baseline into `TextLine`s."
+    cluster.sort(key=lambda item: item[0][0])
+    height = max(box[3] - box[2] for box, _ in cluster)
+    lines = []
+    current = []
+    end = None
+    for item in cluster:
+        if end is not None and item[0][0] - end > char_margin * height:
+            lines.append(_make_line(current, horizontal, height,
+                                    word_margin))
+            current = []
+            end = None
+        current.append(item)
+        end = item[0][1] if end is None else max(end, item[0][1])
+    lines.append(_make_line(current, horizontal, height, word_margin))
+    return lines
+
+
+def _make_line(items, horizontal, height, word_margin):
+    "Build a `TextLine` from sorted (directed box, lettering) items."
+    parts = []
+    offsets = []
+    letterings = []
+    position = 0
+    end = None
+    for box, lettering in items:
+        if (end is not None and box[0] - end > word_margin * height
+                and parts and not parts[-1][-1:].isspace()
+                and not lettering[:1].isspace()):
+            parts.append(u' ')
+            position += 1
+        offsets.append(position)
+        letterings.append(lettering)
+        parts.append(six.text_type(lettering))
+        position += len(lettering)
+        end = box[1] if end is None else max(end, box[1])
+    bboxes = [lettering.get_bbox() for lettering in letterings]
+    bbox = (min(box[0] for box in bboxes), min(box[1] for box in bboxes),
+            max(box[2] for box in bboxes), max(box[3] for box in bboxes))
+    return TextLine(u''.join(parts), letterings, bbox, horizontal, offsets)
+
+
+def _find_gaps(intervals, min_gap):
+    """
+    Split a projection profile at its gaps.
+
+    `intervals` is a list of (start, end, index) tuples. Returns a tuple
+    `(groups, gaps)`, where `groups` lists the indices in each run of
+    overlapping intervals (in increasing order) and `gaps` lists the
+    (start, end) of the uncovered stretches separating them that are at
+    least `min_gap` long.
+
+    """
+    intervals.sort()
+    groups = [[]]
+    gaps = []
+    reach = None
+    for start, end, index in intervals:
+        if reach is not None and start - reach >= min_gap:
+            gaps.append((reach, start))
+            groups.append([])
+        groups[-1].append(index)
+        reach = end if reach is None else max(reach, end)
+    return groups, gaps
+
+
+def _common_gaps(gaps_a, gaps_b):
+    "Return the intersections of the gaps in two (sorted) gap lists."
+    common = []
+    for start_a, end_a in gaps_a:
+        for start_b, end_b in gaps_b:
+            start, end = max(start_a, start_b), min(end_a, end_b)
+            if end > start:
+                common.append((start, end))
+    return common
+
+
+def reading_order(lines, column_gap=.5, block_gap=1.):
+    """
+    Sort horizontal `TextLine`s into reading order with a recursive XY-cut.
+
+    The lines are recursively split into blocks at the gaps in their
+    projections onto the x axis (column gutters at least `column_gap` line
+    heights wide) or, if there are none, onto the y axis (blank space at
+    least `block_gap` line heights tall). Columns are read left to right and
+    blocks top to bottom. Consecutive blocks sharing a column gutter are
+    merged before recursing, so that columns are read through even when
+    their paragraph breaks happen to line up. Each split uses a
+    sort-and-sweep over the bounding boxes, so the whole procedure is
+    O(n log n) per level of nesting.
+
+    Lines that cannot be split further are read top to bottom.
+
+    """
+    if not lines:
+        return []
+    boxes = [line.get_bbox() for line in lines]
+    heights = sorted(box[3] - box[1] for box in boxes)
+    height = max(heights[len(heights) // 2], 1e-6)
+    min_x_gap = column_gap * height
+    min_y_gap = block_gap * height
+
+    def x_groups(indices):
+        "Split `indices` at the column gutters."
+        return _find_gaps([(boxes[i][0], boxes[i][2], i) for i in indices],
+                          min_x_gap)
+
+    ordered = []
+    stack = [list(range(len(lines)))]
+    while stack:
+        indices = stack.pop()
+        groups, _ = x_groups(indices)
+        if len(groups) == 1:
+            bands, _ = _find_gaps([(-boxes[i][3], -boxes[i][1], i)
+                                   for i in indices], min_y_gap)
+            groups = []
+            gutters = []
+            for band in bands:
+                band_gutters = x_groups(band)[1]
+                common = _common_gaps(gutters, band_gutters)
+                if groups and common:
+                    groups[-1].extend(band)
+                    gutters = common
+                else:
+                    groups.append(band)
+                    gutters = band_gutters
+        if len(groups) == 1:
+            indices.sort(key=lambda i: (-(boxes[i][1] + boxes[i][3]),
+                                        boxes[i][0]))
+            ordered.extend(lines[i] for i in indices)
+        else:
+            stack.extend(reversed(groups))
+    return ordered
+
+
+class TextMatch(TextSpan):
+
+    """
+    A `TextSpan` for a regular expression match in the text of a page.
+
+    `match` -- the `re` match object, with offsets into the page text
+               buffer
+
+    """
+
+    def __new__(cls, data, letterings, bbox, horizontal=True, match=None):
+        span = TextSpan.__new__(cls, data, letterings, bbox, horizontal)
+        span.match = match
+        return span
+
+    def __init__(self, data, letterings, bbox, horizontal=True, match=None):
+        super(TextMatch, self).__init__(data, letterings, bbox, horizontal)
+
+
+class TextBuffer(object):
+
+    """
+    The text of a sequence of `TextLine`s, joined by newlines.
+
+    `text` -- the joined text
+    `lines` -- the lines in the buffer
+    `starts` -- the offset in `text` at which each line starts
+
+    Matches in the buffer are mapped back to the letterings they come from
+    by bisecting into `starts` and then into the offsets of each line, so
+    finding the geometry of a match is logarithmic in the size of the page.
+
+    """
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.starts = []
+        position = 0
+        for line in lines:
+            self.starts.append(position)
+            position += len(line) + 1
+        self.text = u'\n'.join(lines)
+
+    def make_match(self, match):
+        "Return a `TextMatch` for a match object over `self.text`."
+        start, end = match.span()
+        letterings = []
+        lefts, bottoms, rights, tops = [], [], [], []
+        first = max(bisect.bisect_right(self.starts, start) - 1, 0)
+        last = bisect.bisect_left(self.starts, end)
+        for i in range(first, last):
+            line = self.lines[i]
+            contributing, bbox = span_letterings(
+                line.letterings, line.offsets,
+                start - self.starts[i], end - self.starts[i])
+            if bbox is None:
+                continue
+            letterings.extend(contributing)
+            lefts.append(bbox[0])
+            bottoms.append(bbox[1])
+            rights.append(bbox[2])
+            tops.append(bbox[3])
+        if letterings:
+            bbox = (min(lefts), min(bottoms), max(rights), max(tops))
+        else:
+            bbox = None  # e.g., a match of just a line break
+        horizontal = self.lines[first].horizontal if self.lines else True
+        return TextMatch(match.group(), letterings, bbox, horizontal, match)
+
+    def search(self, pattern, flags=0):
+        """
+        Return a list of `TextMatch`es for the non-overlapping matches of
+        `pattern` (a string or compiled regular expression) in the buffer.
+
+        Empty matches are skipped.
+
+        """
+        if isinstance(pattern, six.string_types):
+            pattern = re.compile(pattern, flags)
+        return [self.make_match(match)
+                for match in pattern.finditer(self.text)
+                if match.end() > match.start()]
@@ -27,6 +27,7 @@ setup(
     install_requires=['pdfminer3k', 'six'],
     extras_require={
         'PIL': ['Pillow'],
+        'numpy': ['numpy'],
     },
     packages=["minecart"],
 )
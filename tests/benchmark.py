@@ -0,0 +1,264 @@
+"""
+Benchmarks for extracting pages with minecart.
+
+Each scenario builds a synthetic PDF with `writer` (a number of pages, each
+with `size` graphics objects of one kind), extracts all of its pages with
+`minecart.Document.iter_pages`, and reports the pages and graphics objects
+extracted per second (the best of several runs) and the peak memory
+allocated during an extraction (measured with `tracemalloc`, in a separate
+run, since tracing slows Python down).
+
+Usage:
+
+    python tests/benchmark.py [scenario[size] ...] [--save FILE]
+                              [--compare FILE]
+
+`--save` stores the results as a JSON baseline, and `--compare` checks the
+results against a saved baseline, exiting with status 1 if any scenario is
+slower (or uses more memory) than the baseline by more than `--tolerance`.
+Baselines are only meaningful on the machine they were recorded on.
+
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+import minecart  #pylint: disable=C0413
+import writer  #pylint: disable=C0413
+
+FONT = {'Type': '/Font', 'Subtype': '/Type1', 'BaseFont': '/Helvetica'}
+
+
+def paths_page(size):
+    "A page with `size` stroked straight lines."
+    page = writer.Page()
+    page.add_content(b"".join(
+        b"%d %d m %d %d l S\n" % (i % 600, i % 700, i % 500, i % 800 + 5)
+        for i in range(size)))
+    return page
+
+
+def curves_page(size):
+    "A page with `size` filled Bezier curves."
+    page = writer.Page()
+    page.add_content(b"".join(
+        b"%d 0 m %d 50 %d 50 %d 0 c f\n" % (i % 600, i % 600 + 5,
+                                            i % 600 + 10, i % 600 + 15)
+        for i in range(size)))
+    return page
+
+
+def text_page(size):
+    "A page with `size` text runs of a few characters each."
+    page = writer.Page()
+    page['Resources'] = {'Font': {'F1': FONT}}
+    page.add_content(b"BT /F1 10 Tf\n" + b"".join(
+        b"1 0 0 1 %d %d Tm (run %d) Tj\n" % (i % 550, i % 780, i)
+        for i in range(size)) + b"ET\n")
+    return page
+
+
+COLOR_OPERATORS = (b"%.2f g", b"%.2f 0.5 0.25 rg", b"0 %.2f 0.5 0 k",
+                   b"/CS0 cs %.2f 0.5 0.5 sc")
+
+
+def colors_page(size):
+    "A page with `size` rectangles, each in a different color space."
+    page = writer.Page()
+    page['Resources'] = {'ColorSpace': {
+        'CS0': ['/CalRGB', {'WhitePoint': [0.9505, 1.0, 1.089]}]}}
+    page.add_content(b"".join(
+        COLOR_OPERATORS[i % 4] % ((i % 100) / 100) +
+        b" %d %d 5 5 re f\n" % (i % 600, i % 780)
+        for i in range(size)))
+    return page
+
+
+def images_page(size):
+    "A page with `size` distinct 8x8 RGB images."
+    page = writer.Page()
+    xobjects = page['Resources']['XObject'] = {}
+    content = []
+    for i in range(size):
+        data = bytes(bytearray((i + j) % 256 for j in range(8 * 8 * 3)))
+        xobjects['Im%d' % i] = writer.Stream(
+            zlib.compress(data), Type='/XObject', Subtype='/Image',
+            Width=8, Height=8, ColorSpace='/DeviceRGB', BitsPerComponent=8,
+            Filter='/FlateDecode')
+        content.append(b"q 8 0 0 8 %d %d cm /Im%d Do Q\n"
+                       % (i % 600, i % 780, i))
+    page.add_content(b"".join(content))
+    return page
+
+
+def nesting_page(size):
+    "A page with form XObjects nested `size` deep, each drawing a line."
+    form = None
+    for depth in reversed(range(size)):
+        data = b"0 %d m 100 %d l S\n" % (depth, depth)
+        resources = {}
+        if form is not None:
+            data += b"/Fm0 Do\n"
+            resources['XObject'] = {'Fm0': form}
+        form = writer.Stream(data, Type='/XObject', Subtype='/Form',
+                             BBox=[0, 0, 612, 792], Resources=resources)
+    page = writer.Page()
+    page['Resources'] = {'XObject': {'Fm0': form}}
+    page.add_content(b"/Fm0 Do\n")
+    return page
+
+
+# name -> (page builder, default sizes)
+SCENARIOS = {
+    'paths': (paths_page, (100, 1000, 10000)),
+    'curves': (curves_page, (100, 1000, 10000)),
+    'text': (text_page, (100, 1000, 5000)),
+    'colors': (colors_page, (100, 1000, 10000)),
+    'images': (images_page, (10, 100, 500)),
+    'nesting': (nesting_page, (5, 20, 60)),
+}
+
+
+def build_pdf(scenario, size, pages):
+    "Return the bytes of a PDF with `pages` pages of the given scenario."
+    builder = SCENARIOS[scenario][0]
+    document = writer.Document()
+    for _ in range(pages):
+        document.add_page(builder(size))
+    out = io.BytesIO()
+    document.write_to_file(out)
+    return out.getvalue()
+
+
+def extract(data):
+    "Extract every page in the PDF `data`, and return (pages, objects)."
+    pages = objects = 0
+    for page in minecart.Document(io.BytesIO(data)).iter_pages():
+        pages += 1
+        objects += len(page.shapes) + len(page.images) + len(page.letterings)
+    return pages, objects
+
+
+def run_scenario(scenario, size, pages=5, repeat=3):
+    """
+    Benchmark one scenario, and return a dict with the results.
+
+    The extraction is timed `repeat` times and the best time is used.
+
+    """
+    data = build_pdf(scenario, size, pages)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        num_pages, num_objects = extract(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        extract(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'pages': num_pages,
+        'objects': num_objects,
+        'seconds': best,
+        'pages_per_sec': num_pages / best,
+        'objects_per_sec': num_objects / best,
+        'peak_kb': peak / 1024,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print how `results` compare to `baseline`, and return the regressions.
+
+    A regression is a scenario whose pages/sec dropped, or whose peak memory
+    grew, by more than `tolerance` (a fraction) relative to the baseline.
+
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        old = baseline[key]
+        speed = result['pages_per_sec'] / old['pages_per_sec']
+        memory = result['peak_kb'] / old['peak_kb']
+        slower = speed < 1 - tolerance or memory > 1 + tolerance
+        if slower:
+            regressions.append(key)
+        print("%-16s speed x%.2f  memory x%.2f%s" % (
+            key, speed, memory, "  REGRESSION" if slower else ""))
+    return regressions
+
+
+def parse_selection(names):
+    "Return (scenario, size) pairs for the `scenario[size]` arguments."
+    if not names:
+        return [(scenario, size) for scenario in sorted(SCENARIOS)
+                for size in SCENARIOS[scenario][1]]
+    selection = []
+    for name in names:
+        scenario, _, size = name.partition('[')
+        if scenario not in SCENARIOS:
+            raise SystemExit("Unknown scenario %r. Choose from: %s" % (
+                scenario, ", ".join(sorted(SCENARIOS))))
+        if size:
+            selection.append((scenario, int(size.rstrip(']'))))
+        else:
+            selection.extend((scenario, default)
+                             for default in SCENARIOS[scenario][1])
+    return selection
+
+
+def main(argv=None):
+    "Run the benchmarks from the command line."
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument('scenarios', nargs='*',
+                        help="scenarios to run, as NAME or NAME[SIZE]")
+    parser.add_argument('--pages', type=int, default=5,
+                        help="pages per document (default: %(default)s)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs per scenario (default: %(default)s)")
+    parser.add_argument('--save', metavar='FILE',
+                        help="save the results as a baseline")
+    parser.add_argument('--compare', metavar='FILE',
+                        help="compare the results with a saved baseline")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative slowdown or memory growth "
+                        "(default: %(default)s)")
+    args = parser.parse_args(argv)
+    results = {}
+    print("%-16s %10s %12s %10s" % ("scenario", "pages/s", "objects/s",
+                                    "peak KiB"))
+    for scenario, size in parse_selection(args.scenarios):
+        key = "%s[%d]" % (scenario, size)
+        results[key] = result = run_scenario(scenario, size, args.pages,
+                                             args.repeat)
+        print("%-16s %10.1f %12.0f %10.0f" % (
+            key, result['pages_per_sec'], result['objects_per_sec'],
+            result['peak_kb']))
+    if args.save:
+        with open(args.save, 'w') as outfile:
+            json.dump(results, outfile, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
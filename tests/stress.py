@@ -0,0 +1,355 @@
+"""
+This module generates large, pathological PDFs for stress testing.
+
+Like `writer`, this is for testing only! `StreamingWriter` builds on
+`writer.Writer`, but writes each object to the output file as soon as it is
+added, instead of keeping the whole document in memory:
+
+* Streams are Flate-compressed (through a spooled temporary file, so their
+  length is known before they are written), and can be built from an
+  iterable of chunks, so content streams with millions of operators never
+  have to exist in memory as a whole.
+* Other objects are packed into compressed object streams, and the
+  document ends with a cross-reference stream, as in PDF 1.5.
+* `add` returns a `Ref` to the written object, which can be used in any
+  number of later objects, so resources can be shared between pages.
+
+The `KINDS` of documents below approximate the worst inputs seen in
+practice, and are generated from a seed, so a corpus can be rebuilt byte for
+byte. Run this module as a script to write one:
+
+    python tests/stress.py KIND OUTPUT [--count N] [--pages N] [--seed N]
+
+***DO NOT USE THIS MODULE FOR PRODUCTION CODE.***
+
+"""
+
+from __future__ import division, print_function
+
+import argparse
+import array
+import random
+import shutil
+import sys
+import tempfile
+import zlib
+
+import writer
+
+# Bytes mapped to the range 0-63, to make noisy images a bit compressible
+_DIM = bytes(bytearray(byte & 0x3F for byte in range(256)))
+
+
+class Ref(object):
+
+    "A reference to an object written by a `StreamingWriter`."
+
+    __slots__ = ('objid',)
+
+    def __init__(self, objid):
+        self.objid = objid
+
+    def __repr__(self):
+        return "Ref(%d)" % self.objid
+
+
+class StreamingWriter(writer.Writer):
+
+    """
+    Writes a PDF document to a file one object at a time.
+
+    `outfile` -- a binary file object, opened for writing
+    `level` -- the zlib compression level of the streams
+    `objects_per_stream` -- the number of objects packed into each object
+                            stream, or 0 to write every object directly
+    `spool_size` -- the size up to which streams are compressed in memory
+                    (larger streams are spooled to a temporary file)
+
+    Dictionaries in the objects added are always written directly, and
+    streams must be added with `add` or `add_stream` and referenced by the
+    `Ref` returned. Call `close` to write the page tree and the
+    cross-reference stream.
+
+    """
+
+    def __init__(self, outfile, level=6, objects_per_stream=100,
+                 spool_size=16 * 1024 * 1024):
+        writer.Writer.__init__(self, outfile, None)
+        self.obj_stack = []
+        self.level = level
+        self.objects_per_stream = objects_per_stream
+        self.spool_size = spool_size
+        # Cross-reference entries, indexed by objid - 1
+        self.kinds = array.array('B')
+        self.fields = array.array('Q')
+        self.indexes = array.array('L')
+        self.pending = []  # (objid, body) for the next object stream
+        self.page_ids = array.array('L')
+        self.catalog = self.reserve()
+        self.pages = self.reserve()
+        self.outfile.write(self.HEADER)
+
+    def convert_literal(self, val, force_inline=False):
+        if isinstance(val, Ref):
+            return b"%d 0 R" % val.objid
+        if isinstance(val, writer.Stream):
+            raise ValueError("Streams must be added with `add`")
+        return writer.Writer.convert_literal(
+            self, val, force_inline or isinstance(val, dict))
+
+    def reserve(self):
+        "Return a `Ref` for an object that will be added later."
+        self.kinds.append(0)
+        self.fields.append(0)
+        self.indexes.append(0)
+        return Ref(len(self.kinds))
+
+    def add(self, obj, ref=None):
+        """
+        Add a dictionary (or other literal) or a `writer.Stream`.
+
+        `ref` -- the reserved `Ref` of the object, if any
+
+        Returns the `Ref` of the object.
+
+        """
+        if ref is None:
+            ref = self.reserve()
+        if isinstance(obj, writer.Stream):
+            info = dict(obj.info)
+            del info['Length']
+            return self.add_stream([obj.data], ref, **info)
+        body = self.convert_literal(obj, force_inline=True)
+        if self.objects_per_stream:
+            self.pending.append((ref.objid, body))
+            if len(self.pending) >= self.objects_per_stream:
+                self.flush_objects()
+        else:
+            self._write_object(ref.objid, body)
+        return ref
+
+    def add_stream(self, chunks, ref=None, **info):
+        """
+        Add a stream with the data in the iterable of bytes `chunks`.
+
+        `info` holds the entries of the stream dictionary. The data is
+        Flate-compressed, unless `info` already has a Filter.
+
+        Returns the `Ref` of the stream.
+
+        """
+        if ref is None:
+            ref = self.reserve()
+        compress = self.level and 'Filter' not in info
+        with tempfile.SpooledTemporaryFile(self.spool_size) as spool:
+            compressor = zlib.compressobj(self.level) if compress else None
+            for chunk in chunks:
+                spool.write(compressor.compress(chunk) if compress else chunk)
+            if compress:
+                spool.write(compressor.flush())
+                info['Filter'] = '/FlateDecode'
+            info['Length'] = spool.tell()
+            spool.seek(0)
+            self._start_object(ref.objid)
+            self.outfile.write(self.convert_literal(info, force_inline=True))
+            self.outfile.write(b"stream\n")
+            shutil.copyfileobj(spool, self.outfile)
+            self.outfile.write(b"\nendstream\nendobj\n")
+        return ref
+
+    def add_page(self, page):
+        """
+        Add a `writer.Page` (or a page dictionary).
+
+        A `writer.Stream` in the page's Contents is added first. Returns the
+        `Ref` of the page.
+
+        """
+        page = dict(page)
+        page['Parent'] = self.pages
+        if isinstance(page.get('Contents'), writer.Stream):
+            page['Contents'] = self.add(page['Contents'])
+        ref = self.add(page)
+        self.page_ids.append(ref.objid)
+        return ref
+
+    def flush_objects(self):
+        "Write the pending objects into an object stream."
+        if not self.pending:
+            return
+        ref = self.reserve()
+        header = []
+        offset = 0
+        for index, (objid, body) in enumerate(self.pending):
+            header.append(b"%d %d" % (objid, offset))
+            offset += len(body) + 1
+            self.kinds[objid - 1] = 2
+            self.fields[objid - 1] = ref.objid
+            self.indexes[objid - 1] = index
+        header = b" ".join(header) + b"\n"
+        bodies = [body + b"\n" for _, body in self.pending]
+        count = len(self.pending)
+        self.pending = []
+        self.add_stream([header] + bodies, ref, Type='/ObjStm', N=count,
+                        First=len(header))
+
+    def close(self):
+        "Write the page tree, the catalog and the cross-reference stream."
+        self.flush_objects()
+        kids = b" ".join(b"%d 0 R" % objid for objid in self.page_ids)
+        self._write_object(self.pages.objid, (
+            b"<< /Type /Pages /Count %d /Kids [%s] >>"
+            % (len(self.page_ids), kids)))
+        self._write_object(self.catalog.objid, (
+            b"<< /Type /Catalog /Pages %d 0 R >>" % self.pages.objid))
+        xref = self.reserve()
+        xref_offset = self.outfile.tell()
+        self.kinds[-1] = 1
+        self.fields[-1] = xref_offset
+        width = max(4, (max(self.fields).bit_length() + 7) // 8)
+        entries = [b"\x00" + b"\x00" * width + b"\xff\xff"]  # Object 0
+        for kind, field, index in zip(self.kinds, self.fields, self.indexes):
+            entries.append(bytes(bytearray([kind])) +
+                           _to_bytes(field, width) + _to_bytes(index, 2))
+        self.add_stream([b"".join(entries)], xref, Type='/XRef',
+                        Size=len(self.kinds) + 1, W=[1, width, 2],
+                        Root=self.catalog)
+        self.outfile.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+    def _start_object(self, objid):
+        "Record the offset of an object and write its header."
+        self.kinds[objid - 1] = 1
+        self.fields[objid - 1] = self.outfile.tell()
+        self.outfile.write(b"%d 0 obj\n" % objid)
+
+    def _write_object(self, objid, body):
+        "Write an object directly to the file."
+        self._start_object(objid)
+        self.outfile.write(body)
+        self.outfile.write(b"\nendobj\n")
+
+
+def _to_bytes(value, width):
+    "Return `value` as a big-endian unsigned integer of `width` bytes."
+    return bytes(bytearray((value >> shift) & 0xFF
+                           for shift in range(8 * (width - 1), -1, -8)))
+
+
+def _lines(rng, segments, batch=1000):
+    "Yield the content stream of a path with `segments` random lines."
+    yield b"%.2f %.2f m\n" % (rng.uniform(0, 612), rng.uniform(0, 792))
+    for start in range(0, segments, batch):
+        yield b"".join(
+            b"%.2f %.2f l\n" % (rng.uniform(0, 612), rng.uniform(0, 792))
+            for _ in range(min(batch, segments - start)))
+    yield b"S\n"
+
+
+def cad_document(out, rng, count=1000000, pages=1):
+    "Pages with a single path of `count` random line segments each."
+    doc = StreamingWriter(out)
+    for _ in range(pages):
+        page = writer.Page()
+        page['Contents'] = doc.add_stream(_lines(rng, count))
+        doc.add_page(page)
+    doc.close()
+
+
+def _glyphs(rng, runs, batch=1000):
+    "Yield the content stream of `runs` one-glyph text runs."
+    yield b"BT /F1 8 Tf 0 0 Td\n"
+    for start in range(0, runs, batch):
+        yield b"".join(
+            b"%.1f %.1f Td (%s) Tj\n" % (
+                rng.uniform(-5, 5), rng.uniform(-5, 5),
+                bytes(bytearray([rng.randint(0x41, 0x5A)])))
+            for _ in range(min(batch, runs - start)))
+    yield b"ET\n"
+
+
+def glyphs_document(out, rng, count=100000, pages=1):
+    "Pages with `count` one-glyph `Tj` runs each, sharing their font."
+    doc = StreamingWriter(out)
+    resources = doc.add({'Font': {'F1': doc.add({
+        'Type': '/Font', 'Subtype': '/Type1', 'BaseFont': '/Helvetica'})}})
+    for _ in range(pages):
+        page = writer.Page()
+        page['Resources'] = resources
+        page['Contents'] = doc.add_stream(_glyphs(rng, count))
+        doc.add_page(page)
+    doc.close()
+
+
+def pages_document(out, rng, count=10000, pages=None):
+    "`count` small pages, sharing their resources."
+    doc = StreamingWriter(out)
+    resources = doc.add({'Font': {'F1': doc.add({
+        'Type': '/Font', 'Subtype': '/Type1', 'BaseFont': '/Helvetica'})}})
+    for num in range(count if pages is None else pages):
+        page = writer.Page()
+        page['Resources'] = resources
+        page['Contents'] = doc.add_stream(
+            [b"".join(_lines(rng, 10)),
+             b"BT /F1 12 Tf 72 72 Td (Page %d) Tj ET\n" % num])
+        doc.add_page(page)
+    doc.close()
+
+
+def _image_rows(rng, width, height, batch=64):
+    "Yield the data of a noisy RGB image."
+    for start in range(0, height, batch):
+        size = 3 * width * min(batch, height - start)
+        noise = rng.getrandbits(8 * size).to_bytes(size, 'little')
+        yield noise.translate(_DIM)
+
+
+def images_document(out, rng, count=4000, pages=1):
+    "Pages with a `count` x `count` RGB image each."
+    doc = StreamingWriter(out)
+    for _ in range(pages):
+        image = doc.add_stream(
+            _image_rows(rng, count, count), Type='/XObject',
+            Subtype='/Image', Width=count, Height=count,
+            ColorSpace='/DeviceRGB', BitsPerComponent=8)
+        page = writer.Page()
+        page['Resources'] = {'XObject': {'Im0': image}}
+        page['Contents'] = doc.add_stream([b"q 612 0 0 792 0 0 cm /Im0 Do Q"])
+        doc.add_page(page)
+    doc.close()
+
+
+# name -> the function writing a document of that kind
+KINDS = {
+    'cad': cad_document,
+    'glyphs': glyphs_document,
+    'pages': pages_document,
+    'images': images_document,
+}
+
+
+def generate(kind, out, seed=0, **params):
+    "Write a document of the given kind to `out`, generated from `seed`."
+    KINDS[kind](out, random.Random(seed), **params)
+
+
+def main(argv=None):
+    "Write a stress test document from the command line."
+    parser = argparse.ArgumentParser(
+        description="Generate a large PDF for stress testing.")
+    parser.add_argument('kind', choices=sorted(KINDS))
+    parser.add_argument('output', help="the file to write")
+    parser.add_argument('--count', type=int,
+                        help="segments, runs, pages or image size, "
+                        "depending on the kind")
+    parser.add_argument('--pages', type=int, help="the number of pages")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    params = {name: getattr(args, name) for name in ('count', 'pages')
+              if getattr(args, name) is not None}
+    with open(args.output, 'wb') as out:
+        generate(args.kind, out, args.seed, **params)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
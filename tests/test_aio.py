@@ -0,0 +1,142 @@
+"Unit tests for the aio module."
+
+import asyncio
+import concurrent.futures
+import io
+import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import minecart.miner
+
+from test_miner import make_pages_pdf
+
+
+def run(coroutine):
+    "Run a coroutine in a new event loop."
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def get_paths(page):
+    "Return the paths of the shapes on a page."
+    return [shape.path for shape in page.shapes]
+
+
+class TestAsyncDocument(unittest.TestCase):
+
+    "Test the asynchronous Document interface."
+
+    def setUp(self):
+        self.pdf = make_pages_pdf(
+            [(b'', [i % 3]) for i in range(6)],
+            [b'0 0 m 10 10 l S', b'0 0 10 10 re f', b'1 1 m 5 5 l S'])
+        self.expected = [get_paths(page) for page in self.open().iter_pages()]
+
+    def open(self):
+        "Return a Document for the test PDF."
+        return minecart.miner.Document(io.BytesIO(self.pdf))
+
+    def count_pages(self, doc):
+        "Patch `doc` to count the pages interpreted."
+        return mock.patch.object(doc, '_interpret', wraps=doc._interpret)
+
+    def test_aiter_pages(self):
+        "Test iterating through the pages with `async for`."
+        async def collect(doc, executor):
+            "Return the paths on each page."
+            paths = []
+            async for page in doc.aiter_pages(executor, prefetch=2):
+                paths.append(get_paths(page))
+            return paths
+
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            self.assertEqual(run(collect(self.open(), executor)),
+                             self.expected)
+        self.assertEqual(run(collect(self.open(), None)), self.expected)
+
+    def test_backpressure(self):
+        "Test that extraction stops once `prefetch` pages are waiting."
+        doc = self.open()
+
+        async def consume():
+            "Take a page, and give the producer time to run ahead."
+            pages = doc.aiter_pages(prefetch=1)
+            await pages.__anext__()
+            await asyncio.sleep(.2)
+            count = process.call_count
+            await pages.aclose()
+            return count
+
+        with self.count_pages(doc) as process:
+            # One page consumed, one in the queue and one waiting for room
+            self.assertEqual(run(consume()), 3)
+            self.assertEqual(process.call_count, 3)
+
+    def test_aclose(self):
+        "Test that closing the iterator stops the extraction."
+        doc = self.open()
+
+        async def consume():
+            "Stop after the first two pages."
+            pages = []
+            async with doc.aiter_pages(prefetch=1) as page_iter:
+                async for page in page_iter:
+                    pages.append(page)
+                    if len(pages) == 2:
+                        break
+            self.assertTrue(page_iter.task.done())
+            async for page in page_iter:
+                self.fail("Page after closing: %r" % page)
+            return pages
+
+        with self.count_pages(doc) as process:
+            self.assertEqual(len(run(consume())), 2)
+        self.assertLessEqual(process.call_count, 4)
+
+    def test_errors(self):
+        "Test that errors are raised in order."
+        doc = self.open()
+        original = doc._extract_page
+
+        def extract(num, m_page):
+            "Fail on the third page."
+            if num == 2:
+                raise ValueError("bad page")
+            return original(num, m_page)
+
+        async def consume():
+            "Collect pages until an error."
+            pages = []
+            with self.assertRaises(ValueError):
+                async for page in doc.aiter_pages(prefetch=3):
+                    pages.append(page)
+            return pages
+
+        with mock.patch.object(doc, '_extract_page', extract):
+            self.assertEqual([get_paths(page) for page in run(consume())],
+                             self.expected[:2])
+
+    def test_aget_page(self):
+        "Test concurrent calls to `aget_page`."
+        doc = self.open()
+
+        async def get_all():
+            "Request all the pages at once."
+            return await asyncio.gather(*[doc.aget_page(num)
+                                          for num in range(6)])
+
+        self.assertEqual([get_paths(page) for page in run(get_all())],
+                         self.expected)
+        # The document can be used from another event loop
+        self.assertEqual(get_paths(run(doc.aget_page(1))), self.expected[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
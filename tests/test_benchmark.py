@@ -0,0 +1,38 @@
+"Unit tests for the benchmark scenarios and the PDF writer."
+
+import unittest
+
+import benchmark
+
+
+class TestScenarios(unittest.TestCase):
+
+    "Test that each scenario extracts the expected objects."
+
+    def test_object_counts(self):
+        "Test every scenario on a small document."
+        for scenario in sorted(benchmark.SCENARIOS):
+            result = benchmark.run_scenario(scenario, 3, pages=2, repeat=1)
+            self.assertEqual(result['pages'], 2, scenario)
+            self.assertEqual(result['objects'], 6, scenario)
+            self.assertGreater(result['peak_kb'], 0)
+
+    def test_compare(self):
+        "Test flagging slower and larger scenarios."
+        baseline = {'a[1]': {'pages_per_sec': 10, 'peak_kb': 100},
+                    'b[1]': {'pages_per_sec': 10, 'peak_kb': 100}}
+        results = {'a[1]': {'pages_per_sec': 9, 'peak_kb': 110},
+                   'b[1]': {'pages_per_sec': 10, 'peak_kb': 150},
+                   'c[1]': {'pages_per_sec': 1, 'peak_kb': 1}}
+        self.assertEqual(benchmark.compare(results, baseline, 0.2), ['b[1]'])
+
+    def test_selection(self):
+        "Test parsing the scenarios to run."
+        self.assertEqual(benchmark.parse_selection(['paths[7]', 'nesting']),
+                         [('paths', 7), ('nesting', 5), ('nesting', 20),
+                          ('nesting', 60)])
+        self.assertRaises(SystemExit, benchmark.parse_selection, ['nope'])
+
+
+if __name__ == '__main__':
+    unittest.main()
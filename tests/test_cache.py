@@ -0,0 +1,219 @@
+"Unit tests for the cache module."
+
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import minecart
+import minecart.cache
+
+from pdfminer.pdftypes import PDFStream
+from pdfminer.psparser import LIT
+
+TESTDOCS = os.path.join(os.path.dirname(__file__), 'testdocs')
+
+
+class TestPageCache(unittest.TestCase):
+
+    "Test the on-disk page cache."
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_file_digest(self):
+        "Test that the digest covers the file and restores its position."
+        fileobj = io.BytesIO(b'abc' * 100000)
+        fileobj.seek(10)
+        digest = minecart.cache.file_digest(fileobj)
+        self.assertEqual(fileobj.tell(), 10)
+        self.assertNotEqual(
+            digest, minecart.cache.file_digest(io.BytesIO(b'abc')))
+        self.assertEqual(digest, minecart.cache.file_digest(
+            io.BytesIO(b'abc' * 100000)))
+
+    def test_make_key(self):
+        "Test that keys depend on the page, version and options."
+        make_key = minecart.cache.PageCache.make_key
+        key = make_key('digest', 0)
+        self.assertEqual(key, make_key('digest', 0))
+        self.assertNotEqual(key, make_key('digest', 1))
+        self.assertNotEqual(key, make_key('other', 0))
+        self.assertNotEqual(key, make_key('digest', 0, [('opt', True)]))
+        with mock.patch('minecart.__version__', '0.0.1'):
+            self.assertNotEqual(key, make_key('digest', 0))
+
+    def test_get_put(self):
+        "Test storing and retrieving entries."
+        cache = minecart.cache.PageCache(os.path.join(self.directory, 'new'))
+        self.assertIsNone(cache.get('key'))
+        cache.put('key', b'data')
+        self.assertEqual(cache.get('key'), b'data')
+        cache.put('key', b'other')
+        self.assertEqual(cache.get('key'), b'other')
+        self.assertEqual(cache.size(), 5)
+        # No temporary files are left behind
+        self.assertEqual(os.listdir(cache.directory), ['key.page'])
+        cache.discard('key')
+        cache.discard('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_eviction(self):
+        "Test that the least recently used entries are evicted."
+        cache = minecart.cache.PageCache(self.directory, max_size=25)
+        now = time.time()
+
+        def put(key, age):
+            "Add an entry last used `age` seconds ago."
+            cache.put(key, b'x' * 10)
+            os.utime(cache._path(key), (now - age, now - age))
+
+        put('a', 30)
+        put('b', 20)
+        cache.put('c', b'x' * 10)
+        self.assertIsNone(cache.get('a'))  # Evicted on the last put
+        os.utime(cache._path('c'), (now - 10, now - 10))
+        cache.get('b')  # Marks 'b' as recently used
+        cache.put('d', b'x' * 10)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get('b'), b'x' * 10)
+        self.assertEqual(cache.get('d'), b'x' * 10)
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    "Test extracting pages through a cache."
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.cache = minecart.cache.PageCache(directory)
+
+    def open(self, name, **params):
+        "Open one of the test documents."
+        pdffile = open(os.path.join(TESTDOCS, name), 'rb')
+        self.addCleanup(pdffile.close)
+        return minecart.Document(pdffile, cache=self.cache, **params)
+
+    def test_hit(self):
+        "Test that cached pages are loaded instead of interpreted."
+        first = list(self.open('simple1.pdf').iter_pages())
+        self.assertEqual(len(list(self.cache.iter_entries())), len(first))
+        doc = self.open('simple1.pdf')
+        with mock.patch.object(doc.interpreter, 'process_page') as process:
+            pages = list(doc.iter_pages())
+            page = doc.get_page(0)
+        self.assertFalse(process.called)
+        self.assertEqual([list(page.letterings) for page in pages],
+                         [list(page.letterings) for page in first])
+        self.assertEqual(list(page.letterings), list(first[0].letterings))
+        self.assertIsNotNone(page.m_page)
+
+    def test_options(self):
+        "Test that pages extracted with other options are not reused."
+        self.open('laundry.pdf').get_page(0)
+        doc = self.open('laundry.pdf', drop_clipped=True)
+        with mock.patch.object(doc.interpreter, 'process_page',
+                               wraps=doc.interpreter.process_page) as process:
+            doc.get_page(0)
+        self.assertTrue(process.called)
+
+    def test_corrupt_entry(self):
+        "Test that unreadable entries are replaced."
+        doc = self.open('laundry.pdf')
+        key = doc.cache_key(0)
+        self.cache.put(key, b'garbage')
+        page = doc.get_page(0)
+        self.assertEqual(len(page.images), 1)
+        self.assertNotEqual(self.cache.get(key), b'garbage')
+        cached = self.open('laundry.pdf').get_page(0)
+        self.assertEqual(cached.images[0].as_pil().size, (949, 690))
+
+
+class TestObjectCache(unittest.TestCase):
+
+    "Test the bounded cache of PDF objects."
+
+    def test_lru(self):
+        "Test that the least recently used objects are evicted."
+        cache = minecart.cache.ObjectCache(max_objects=2, max_bytes=None)
+        cache[1] = 'one'
+        cache[2] = 'two'
+        self.assertEqual(cache[1], 'one')
+        cache[3] = 'three'
+        self.assertNotIn(2, cache)
+        self.assertEqual((cache[1], cache[3]), ('one', 'three'))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNone(cache.get(2))
+        self.assertRaises(KeyError, cache.__getitem__, 2)
+
+    def test_bytes(self):
+        "Test bounding the size of the cached streams."
+        cache = minecart.cache.ObjectCache(max_objects=None, max_bytes=100)
+        first = PDFStream({}, b'x' * 60)
+        second = PDFStream({}, b'x' * 60)
+        cache[1] = first
+        cache[2] = second
+        self.assertNotIn(1, cache)
+        self.assertEqual(cache.total_bytes, 60)
+        # Sizes are measured again on access
+        second.data = b'y' * 30
+        self.assertIs(cache[2], second)
+        self.assertEqual(cache.total_bytes, 90)
+        del cache[2]
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_pinning(self):
+        "Test that pinned objects are never evicted."
+        cache = minecart.cache.ObjectCache(max_objects=1, max_bytes=None)
+        page = {'Type': LIT('Page')}
+        cache[1] = page
+        cache[2] = 'two'
+        cache[3] = 'three'
+        cache.pin(3)
+        cache[4] = PDFStream({}, b'data')
+        self.assertEqual(sorted(cache.pinned), [1, 3])
+        self.assertIs(cache[1], page)
+        self.assertEqual(cache[3], 'three')
+        cache.release_streams()
+        self.assertNotIn(4, cache)
+        cache.unpin(3)
+        cache[5] = 'five'
+        self.assertNotIn(3, cache)
+        self.assertIn(1, cache)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_document(self):
+        "Test extracting pages with a small object cache."
+        with open(os.path.join(TESTDOCS, 'ai-files-are-pdfs.pdf'),
+                  'rb') as pdffile:
+            expected = [[shape.path for shape in page.shapes]
+                        for page in minecart.Document(pdffile).iter_pages()]
+            pdffile.seek(0)
+            object_cache = minecart.cache.ObjectCache(max_objects=2)
+            doc = minecart.Document(pdffile, object_cache=object_cache)
+            self.assertIs(doc.doc._cached_objs, object_cache)
+            pages = [[shape.path for shape in page.shapes]
+                     for page in doc.iter_pages()]
+            self.assertEqual(pages, expected)
+            self.assertEqual(pages, [[shape.path for shape in page.shapes]
+                                     for page in doc.iter_pages()])
+        self.assertLessEqual(len(object_cache) - len(object_cache.pinned), 2)
+        self.assertFalse(any(isinstance(obj, PDFStream)
+                             for obj in object_cache._objects.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
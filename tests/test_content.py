@@ -0,0 +1,129 @@
+"Unit tests for the content module."
+
+import array
+import unittest
+
+import pdfminer.pdftypes
+from pdfminer.psparser import LIT
+
+import minecart.content
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+
+def make_image_stream(data, width, height, **attrs):
+    "Create an unfiltered image PDFStream with the given attributes."
+    attrs.update({'Width': width, 'Height': height, 'Length': len(data)})
+    attrs.setdefault('BitsPerComponent', 8)
+    return pdfminer.pdftypes.PDFStream(attrs, data)
+
+
+@unittest.skipIf(PIL is None, "Requires pillow")
+class TestImageMasks(unittest.TestCase):
+
+    "Test the decoding of images and their masks."
+
+    def setUp(self):
+        self.rgb_data = bytes([255, 0, 0, 0, 255, 0,
+                               0, 0, 255, 255, 255, 255])
+
+    def test_no_mask(self):
+        "Images without masks are decoded without an alpha channel."
+        stream = make_image_stream(self.rgb_data, 2, 2,
+                                   ColorSpace=LIT('DeviceRGB'))
+        image = minecart.content.Image((2, 0, 0, 2, 0, 0), stream).as_pil()
+        self.assertEqual(image.mode, 'RGB')
+        self.assertEqual(image.getpixel((1, 0)), (0, 255, 0))
+
+    def test_soft_mask(self):
+        "Soft masks are composited in as the alpha channel."
+        smask = make_image_stream(bytes([0, 64, 128, 255]), 2, 2,
+                                  ColorSpace=LIT('DeviceGray'))
+        stream = make_image_stream(self.rgb_data, 2, 2, SMask=smask,
+                                   ColorSpace=LIT('DeviceRGB'))
+        image = minecart.content.Image((2, 0, 0, 2, 0, 0), stream)
+        pil = image.as_pil()
+        self.assertEqual(pil.mode, 'RGBA')
+        self.assertEqual(pil.getpixel((0, 0)), (255, 0, 0, 0))
+        self.assertEqual(pil.getpixel((1, 1)), (255, 255, 255, 255))
+        self.assertEqual(image.as_pil(apply_mask=False).mode, 'RGB')
+        array = image.as_array()
+        self.assertEqual(array.shape, (2, 2, 4))
+        self.assertEqual(list(array[0, 1]), [0, 255, 0, 64])
+
+    def test_stencil_mask(self):
+        "Stencil masks hide the samples set to 1 and are resized."
+        # A 1-bit 4x1 mask, masking out the last two samples
+        mask = make_image_stream(bytes([0b00110000]), 4, 1, ImageMask=True,
+                                 BitsPerComponent=1)
+        stream = make_image_stream(bytes([10, 20, 30, 40]), 4, 1, Mask=mask,
+                                   ColorSpace=LIT('DeviceGray'))
+        pil = minecart.content.Image((1, 0, 0, 1, 0, 0), stream).as_pil()
+        self.assertEqual(pil.mode, 'LA')
+        self.assertEqual([pil.getpixel((x, 0)) for x in range(4)],
+                         [(10, 255), (20, 255), (30, 0), (40, 0)])
+
+    def test_color_key_mask(self):
+        "Color key masks hide samples with all components in range."
+        stream = make_image_stream(self.rgb_data, 2, 2,
+                                   ColorSpace=LIT('DeviceRGB'),
+                                   Mask=[0, 10, 250, 255, 0, 10])
+        pil = minecart.content.Image((1, 0, 0, 1, 0, 0), stream).as_pil()
+        self.assertEqual([pil.getpixel((x, y))[3]
+                          for y in range(2) for x in range(2)],
+                         [255, 0, 255, 255])
+
+    def test_shared_mask_cache(self):
+        "Masks shared between images are only decoded once."
+        smask = make_image_stream(bytes([0, 64, 128, 255]), 2, 2,
+                                  ColorSpace=LIT('DeviceGray'))
+        first = minecart.content.Image((1, 0, 0, 1, 0, 0), make_image_stream(
+            self.rgb_data, 2, 2, SMask=smask, ColorSpace=LIT('DeviceRGB')))
+        second = minecart.content.Image((1, 0, 0, 1, 0, 0), make_image_stream(
+            self.rgb_data, 2, 2, SMask=smask, ColorSpace=LIT('DeviceRGB')))
+        self.assertIs(first.get_alpha(), second.get_alpha())
+
+
+class TestLettering(unittest.TestCase):
+
+    "Test the Lettering class."
+
+    def setUp(self):
+        boxes = array.array('f', [0, 0, 5, 10, 5, 0, 12, 10,
+                                  12, 0, 15, 12, 15, 0, 20, 10])
+        self.lettering = minecart.content.Lettering(u'abcd', None,
+                                                    (0, 0, 20, 12), True,
+                                                    boxes)
+        self.lettering.z_index = 3
+
+    def test_slice(self):
+        "Slicing returns a Lettering with the exact bounding box."
+        sub = self.lettering[1:3]
+        self.assertIsInstance(sub, minecart.content.Lettering)
+        self.assertEqual(sub, u'bc')
+        self.assertEqual(sub.get_bbox(), (5, 0, 15, 12))
+        self.assertEqual(list(sub.char_bboxes), [5, 0, 12, 10, 12, 0, 15, 12])
+        self.assertEqual(sub.z_index, 3)
+        self.assertIsNone(sub.font)
+        self.assertEqual(sub[-1].get_bbox(), (12, 0, 15, 12))
+
+    def test_index(self):
+        "Indexing returns single-character Letterings."
+        self.assertEqual(self.lettering[-1].get_bbox(), (15, 0, 20, 10))
+        self.assertEqual(self.lettering[0], u'a')
+
+    def test_no_char_bboxes(self):
+        "Without character boxes, slicing returns plain strings."
+        lettering = minecart.content.Lettering(u'abcd', None, (0, 0, 20, 12))
+        self.assertIsNone(lettering.char_bboxes)
+        self.assertNotIsInstance(lettering[1:3], minecart.content.Lettering)
+        self.assertEqual(lettering[1:3], u'bc')
+
+    def test_empty_and_stepped_slices(self):
+        "Slices with no characters or with steps are plain strings."
+        self.assertNotIsInstance(self.lettering[2:2],
+                                 minecart.content.Lettering)
+        self.assertEqual(self.lettering[::2], u'ac')
@@ -0,0 +1,168 @@
+"Unit tests for the geometry module."
+
+import math
+import unittest
+
+import minecart.content
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    import minecart.geometry
+
+KAPPA = 4 * (math.sqrt(2) - 1) / 3
+
+
+def circle(x, y, radius, clockwise=False):
+    "Return the path for a circle made of four Bézier curves."
+    k = KAPPA * radius
+    sign = -1 if clockwise else 1
+    return [
+        ('m', x + radius, y),
+        ('c', x + radius, y + sign * k, x + k, y + sign * radius,
+         x, y + sign * radius),
+        ('c', x - k, y + sign * radius, x - radius, y + sign * k,
+         x - radius, y),
+        ('c', x - radius, y - sign * k, x - k, y - sign * radius,
+         x, y - sign * radius),
+        ('c', x + k, y - sign * radius, x + radius, y - sign * k,
+         x + radius, y),
+        ('h',),
+    ]
+
+
+def square(left, bottom, size, clockwise=False):
+    "Return the path for a square."
+    corners = [(left + size, bottom), (left + size, bottom + size),
+               (left, bottom + size)]
+    if clockwise:
+        corners.reverse()
+    return ([('m', left, bottom)] + [('l', x, y) for x, y in corners]
+            + [('h',)])
+
+
+def shape(path, evenodd=False):
+    "Make a filled shape."
+    return minecart.content.Shape(None, None, evenodd, path)
+
+
+@unittest.skipIf(numpy is None, "Requires numpy")
+class TestFlatten(unittest.TestCase):
+
+    "Test the flattening of paths."
+
+    def test_lines(self):
+        "Subpaths are split at movetos and closepaths."
+        subpaths = minecart.geometry.flatten(
+            [('m', 0, 0), ('l', 1, 0), ('l', 1, 1), ('h',), ('l', 0, 2),
+             ('m', 5, 5)])
+        self.assertEqual(len(subpaths), 2)
+        self.assertTrue(subpaths[0].closed)
+        self.assertEqual(subpaths[0].points.tolist(),
+                         [[0, 0], [1, 0], [1, 1]])
+        self.assertFalse(subpaths[1].closed)
+        self.assertEqual(subpaths[1].points.tolist(), [[0, 0], [0, 2]])
+
+    def test_tolerance(self):
+        "Flattened curves stay within the tolerance of the true curve."
+        for tolerance in (1, .1, .01):
+            subpaths = minecart.geometry.flatten(circle(0, 0, 100),
+                                                 tolerance)
+            points = subpaths[0].points
+            middles = (points + numpy.roll(points, -1, axis=0)) / 2
+            # The chords' midpoints are the furthest from the curve
+            errors = 100 - numpy.hypot(middles[:, 0], middles[:, 1])
+            self.assertLessEqual(errors.max(), tolerance)
+        straight = minecart.geometry.flatten(
+            [('m', 0, 0), ('c', 1, 1, 2, 2, 3, 3)])
+        self.assertEqual(len(straight[0].points), 2)
+
+    def test_v_y_curves(self):
+        "The v and y operators repeat the current or final point."
+        v_path = [('m', 0, 0), ('v', 10, 10, 20, 0)]
+        c_path = [('m', 0, 0), ('c', 0, 0, 10, 10, 20, 0)]
+        numpy.testing.assert_allclose(
+            minecart.geometry.flatten(v_path)[0].points,
+            minecart.geometry.flatten(c_path)[0].points)
+        y_path = [('m', 0, 0), ('y', 10, 10, 20, 0)]
+        c_path = [('m', 0, 0), ('c', 10, 10, 20, 0, 20, 0)]
+        numpy.testing.assert_allclose(
+            minecart.geometry.flatten(y_path)[0].points,
+            minecart.geometry.flatten(c_path)[0].points)
+
+
+@unittest.skipIf(numpy is None, "Requires numpy")
+class TestMeasures(unittest.TestCase):
+
+    "Test area and perimeter computations."
+
+    def test_area(self):
+        "Areas are computed for curves and polygons."
+        self.assertAlmostEqual(minecart.geometry.area(shape(square(1, 1, 3))),
+                               9)
+        # The Bézier approximation of the circle is slightly too large
+        self.assertAlmostEqual(
+            minecart.geometry.area(shape(circle(0, 0, 10)), .001),
+            math.pi * 100, delta=.1)
+
+    def test_area_fill_rules(self):
+        "Holes depend on the fill rule and subpath orientation."
+        same = square(0, 0, 10) + square(3, 3, 4)
+        opposite = square(0, 0, 10) + square(3, 3, 4, clockwise=True)
+        area = minecart.geometry.area
+        self.assertAlmostEqual(area(shape(same, evenodd=True)), 84)
+        self.assertAlmostEqual(area(shape(opposite, evenodd=True)), 84)
+        self.assertAlmostEqual(area(shape(same)), 100)
+        self.assertAlmostEqual(area(shape(opposite)), 84)
+        # An island inside the hole
+        nested = opposite + square(4, 4, 2)
+        self.assertAlmostEqual(area(shape(nested)), 88)
+        self.assertAlmostEqual(area(shape(nested, evenodd=True)), 88)
+
+    def test_perimeter(self):
+        "Only explicitly closed subpaths include the closing segment."
+        perimeter = minecart.geometry.perimeter
+        self.assertAlmostEqual(perimeter(shape(square(0, 0, 2))), 8)
+        self.assertAlmostEqual(perimeter(shape(square(0, 0, 2)[:-1])), 6)
+        self.assertAlmostEqual(perimeter(shape(circle(0, 0, 1), .001), .001),
+                               2 * math.pi, places=3)
+
+
+@unittest.skipIf(numpy is None, "Requires numpy")
+class TestContains(unittest.TestCase):
+
+    "Test point-in-shape computations."
+
+    def test_fill_rules(self):
+        "The shape's fill rule determines the interior."
+        path = circle(0, 0, 10) + circle(0, 0, 5)
+        points = [(0, 0), (7, 0), (0, -7), (20, 0)]
+        self.assertEqual(
+            minecart.geometry.contains(shape(path), points).tolist(),
+            [True, True, True, False])
+        self.assertEqual(
+            minecart.geometry.contains(shape(path, True), points).tolist(),
+            [False, True, True, False])
+
+    def test_open_subpath(self):
+        "Unclosed subpaths are implicitly closed."
+        path = square(0, 0, 10)[:-1]
+        self.assertEqual(
+            minecart.geometry.contains(shape(path), [(5, 5)]).tolist(),
+            [True])
+
+    def test_hit_test(self):
+        "Many points are tested against many shapes."
+        shapes = [shape(square(0, 0, 10)), shape(circle(20, 20, 5)),
+                  shape(square(5, 5, 10))]
+        points = [(1, 1), (7, 7), (20, 20), (50, 50)]
+        hits = minecart.geometry.hit_test(shapes, points)
+        self.assertEqual(hits.tolist(), [
+            [True, True, False, False],
+            [False, False, True, False],
+            [False, True, False, False],
+        ])
+        self.assertEqual(minecart.geometry.hit_test([], points).shape,
+                         (0, 4))
@@ -0,0 +1,86 @@
+"Unit tests for the index module."
+
+import io
+import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import minecart.content
+import minecart.index
+import minecart.text
+
+
+def make_page(letterings):
+    "Make a stand-in for a `Page` with the given letterings."
+    page = mock.MagicMock()
+    page.letterings = letterings
+    page.iter_lines.side_effect = (
+        lambda **params: iter(minecart.text.group_lines(letterings, **params)))
+    return page
+
+
+def lettering(data, bbox):
+    "Shortcut to create a Lettering without a font."
+    return minecart.content.Lettering(data, None, bbox)
+
+
+class TestTextIndex(unittest.TestCase):
+
+    "Test building, querying and storing a TextIndex."
+
+    def setUp(self):
+        self.pages = [
+            make_page([
+                lettering(u'Contract ABC-', (0, 700, 65, 710)),
+                lettering(u'1234 signed', (65, 700, 120, 710)),
+                lettering(u'Total due', (0, 680, 45, 690)),
+            ]),
+            make_page([
+                lettering(u'See contract abc 1234.', (0, 700, 110, 710)),
+            ]),
+        ]
+        self.index = minecart.index.TextIndex.build(self.pages)
+
+    def test_tokens(self):
+        "Tokens are lowercased runs of word characters."
+        self.assertEqual(self.index.page_count, 2)
+        self.assertEqual(sorted(self.index.postings), [
+            u'1234', u'abc', u'contract', u'due', u'see', u'signed',
+            u'total'])
+        self.assertEqual(self.index.postings[u'contract'][0][:3], (0, 0, 0))
+        self.assertEqual(self.index.postings[u'contract'][1][:3], (1, 1, 0))
+
+    def test_single_token(self):
+        "Single tokens match anywhere, case-insensitively."
+        hits = self.index.search(u'TOTAL')
+        self.assertEqual(hits, [(0, 2, (0, 680, 25, 690))])
+        self.assertEqual(self.index.search(u'missing'), [])
+        self.assertEqual(self.index.search(u' -- '), [])
+
+    def test_phrase(self):
+        "Multi-token queries match consecutive tokens across letterings."
+        hits = self.index.search(u'abc-1234')
+        self.assertEqual([hit.page_num for hit in hits], [0, 1])
+        self.assertEqual(hits[0].lettering_index, 0)
+        self.assertEqual(hits[0].bbox, (45, 700, 85, 710))
+        self.assertEqual(self.index.search(u'1234 abc'), [])
+        self.assertEqual(self.index.search_pages(u'contract abc'), [0, 1])
+
+    def test_save_load(self):
+        "A saved index can be loaded and queried."
+        buf = io.StringIO()
+        self.index.save(buf)
+        buf.seek(0)
+        loaded = minecart.index.TextIndex.load(buf)
+        self.assertEqual(loaded.page_count, 2)
+        self.assertEqual(loaded.postings, self.index.postings)
+        self.assertEqual(loaded.search(u'abc 1234'),
+                         self.index.search(u'abc 1234'))
+
+    def test_load_bad_version(self):
+        "Loading an index with another format version fails."
+        with self.assertRaises(ValueError):
+            minecart.index.TextIndex.load(io.StringIO(u'{"version": 0}'))
@@ -0,0 +1,64 @@
+"Unit tests for the package's lazy imports."
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import minecart
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Reports the modules loaded by `import minecart`, and by accessing one of
+# its classes
+IMPORT_SCRIPT = """
+import json, sys
+import minecart
+before = sorted(sys.modules)
+minecart.Document
+print(json.dumps([before, sorted(sys.modules)]))
+"""
+
+
+def run_import():
+    "Import minecart in a new interpreter and return the modules loaded."
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT] + [path for path in [env.get('PYTHONPATH')] if path])
+    output = subprocess.check_output(
+        [sys.executable, '-c', IMPORT_SCRIPT], env=env, cwd=ROOT)
+    before, after = json.loads(output.decode('utf-8'))
+    return set(before), set(after)
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "Needs module __getattr__")
+class TestLazyImport(unittest.TestCase):
+
+    "Test that importing the package doesn't load its dependencies."
+
+    def test_cold_import(self):
+        "Test that the dependencies are only loaded on first use."
+        before, after = run_import()
+        for name in before:
+            self.assertFalse(name.startswith(('pdfminer', 'PIL', 'numpy')),
+                             name)
+        self.assertEqual([name for name in before
+                          if name.startswith('minecart')], ['minecart'])
+        self.assertIn('pdfminer', after)
+        self.assertIn('minecart.miner', after)
+
+    def test_attributes(self):
+        "Test that the public names are imported on first access."
+        import minecart.content
+        import minecart.miner
+        self.assertIs(minecart.Document, minecart.miner.Document)
+        for name in ('Page', 'Shape', 'Image', 'Lettering'):
+            self.assertIs(getattr(minecart, name),
+                          getattr(minecart.content, name))
+            self.assertIn(name, dir(minecart))
+        self.assertRaises(AttributeError, getattr, minecart, 'Missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"Unit tests for the lexer module."
+
+import logging
+import unittest
+import zlib
+
+import pdfminer.pdftypes
+from pdfminer.psparser import KWD, LIT
+
+import minecart.lexer
+
+
+def operations(data):
+    "Return the list of operations in `data`."
+    return list(minecart.lexer.iter_operations(data))
+
+
+class TestLexer(unittest.TestCase):
+
+    "Test tokenizing content streams."
+
+    def test_numbers(self):
+        "Test numeric operands, whitespace and comments."
+        self.assertEqual(operations(
+            b'1 0 0 1 -2.5 +.5 cm%comment 9 l\r\n3. -.25\x00re % end'), [
+                (b'cm', [1, 0, 0, 1, -2.5, .5]), (b're', [3., -.25])])
+        self.assertIsInstance(operations(b'3 w')[0][1][0], int)
+        # Operands without an operator are dropped
+        self.assertEqual(operations(b'0 0 m 1 2'), [(b'm', [0, 0])])
+
+    def test_operators(self):
+        "Test operators that aren't letters, and constants."
+        self.assertEqual(operations(b"T* (a)' 1 2 (b)\" true false null d0"),
+                         [(b'T*', []), (b"'", ['a']), (b'"', [1, 2, 'b']),
+                          (b'd0', [True, False, None])])
+
+    def test_names(self):
+        "Test names, including escaped characters."
+        self.assertEqual(operations(b'/F1 12 Tf/A#20B#2f gs/ cs'), [
+            (b'Tf', [LIT('F1'), 12]), (b'gs', [LIT('A B/')]),
+            (b'cs', [LIT('')])])
+
+    def test_strings(self):
+        "Test literal and hexadecimal strings."
+        self.assertEqual(operations(
+            br'(a(b)\)c\\\n\101\0611\7\q\
+d) Tj <41 42 4> Tj <> Tj (x' b'\r\ny) Tj'), [
+                (b'Tj', ['a(b))c\\\nA11\x07qd']), (b'Tj', ['AB@']),
+                (b'Tj', ['']), (b'Tj', ['x\ny'])])
+        # Non-ASCII strings are kept as bytes, as in pdfminer
+        self.assertEqual(operations(b'(\xe9) Tj <FF> Tj'),
+                         [(b'Tj', [b'\xe9']), (b'Tj', [b'\xff'])])
+
+    def test_arrays_and_dicts(self):
+        "Test nested arrays and dictionaries."
+        self.assertEqual(operations(
+            b'[(a) -120 (b)]TJ [[1 2] [] true] 0 d '
+            b'/Span <</MCID 3 /A [/B] /C null /D <<>>>> BDC'), [
+                (b'TJ', [['a', -120, 'b']]),
+                (b'd', [[[1, 2], [], True], 0]),
+                (b'BDC', [LIT('Span'), {'MCID': 3, 'A': [LIT('B')],
+                                        'D': {}}])])
+        # Keywords inside arrays are kept, and stray closers are ignored
+        self.assertEqual(operations(b'] [1 R] >> n'),
+                         [(b'n', [[1, KWD('R')]])])
+
+    def test_inline_image(self):
+        "Test that inline image data is skipped over."
+        ops = operations(b'q BI /W 2 /H 1 /BPC 8 /CS /G /F [/AHx] ID\n'
+                         b'EIx EIy\nEI Q')
+        self.assertEqual([op for op, _ in ops], [b'q', b'EI', b'Q'])
+        image = ops[1][1][0]
+        self.assertIsInstance(image, pdfminer.pdftypes.PDFStream)
+        self.assertEqual(image.attrs, {'W': 2, 'H': 1, 'BPC': 8,
+                                       'CS': LIT('G'), 'F': [LIT('AHx')]})
+        self.assertEqual(image.rawdata, b'EIx EIy')
+        # With a length, the data may contain anything
+        ops = operations(b'BI /W 1 /H 1 /L 4 ID  EI EI S')
+        self.assertEqual(ops[0][1][0].rawdata, b' EI ')
+        self.assertEqual(ops[1], (b'S', []))
+        # Unterminated
+        ops = operations(b'BI /W 1 ID abc')
+        self.assertEqual(ops[0][1][0].rawdata, b'abc')
+
+    def test_join_streams(self):
+        "Test that streams are separated, so their tokens don't merge."
+        streams = [pdfminer.pdftypes.PDFStream({}, b'0 0 m 1'),
+                   pdfminer.pdftypes.PDFStream({}, b'1 l')]
+        data = minecart.lexer.join_streams(streams)
+        self.assertEqual(operations(data),
+                         [(b'm', [0, 0]), (b'l', [1, 1])])
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.assertEqual(minecart.lexer.join_streams([None]), b'')
+
+
+def stream_image(operation):
+    "Replace the inline image operand of an operation by its contents."
+    operator, operands = operation
+    return operator, [(operand.attrs, operand.rawdata)
+                      if isinstance(operand, pdfminer.pdftypes.PDFStream)
+                      else operand for operand in operands]
+
+
+class TestChunks(unittest.TestCase):
+
+    "Test tokenizing content streams read in chunks."
+
+    DATA = (b'BT /F1 12 Tf (a(b)c\\) \\101) Tj <4142\n43> Tj [1 (x) -2.5]'
+            b' TJ ET % comment\r0 0 1 rg /Na#20me << /A [true] >> BDC '
+            b'BI /W 2 /H 1 /L 6 ID  EI xEI EI 1 2 m false null d0 EMC '
+            b'BI /W 1 ID abc EI 3 4 l 5 6 re')
+
+    def assertSameOperations(self, chunks):
+        "Check that the chunks have the same operations as the whole data."
+        self.assertEqual(
+            [stream_image(op) for op in
+             minecart.lexer.iter_chunked_operations(chunks)],
+            [stream_image(op) for op in operations(b''.join(chunks))])
+
+    def test_splits(self):
+        "Test splitting the data at every position."
+        for pos in range(len(self.DATA) + 1):
+            self.assertSameOperations([self.DATA[:pos], self.DATA[pos:]])
+        self.assertSameOperations([self.DATA[pos:pos + 1]
+                                   for pos in range(len(self.DATA))])
+
+    def test_operations(self):
+        "Test that operations are read as soon as they're complete."
+        ops = minecart.lexer.iter_chunked_operations(
+            [b'0 0 m 1 2 l', b' 3 4 l'])
+        self.assertEqual(next(ops), (b'm', [0, 0]))
+        self.assertEqual(list(ops), [(b'l', [1, 2]), (b'l', [3, 4])])
+
+    def test_stream_data(self):
+        "Test that Flate streams are decompressed in chunks."
+        data = b''.join(b'%d 0 m %d 1 l S\n' % (i, i) for i in range(1000))
+        streams = [pdfminer.pdftypes.PDFStream(
+            {'Filter': LIT('FlateDecode')}, zlib.compress(data)),
+                   pdfminer.pdftypes.PDFStream({}, b'1 w')]
+        chunks = list(minecart.lexer.iter_stream_data(streams, 100))
+        self.assertEqual(b''.join(chunks), data + b'\n1 w')
+        self.assertLessEqual(max(len(chunk) for chunk in chunks), 100)
+        self.assertIsNone(streams[0].data)  # Not stored in the stream
+        self.assertEqual(
+            len(list(minecart.lexer.iter_chunked_operations(chunks))), 3001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,22 @@ try:
     import mock
 except ImportError:
     import unittest.mock as mock
+import concurrent.futures
+import io
 import os
+import shutil
+import tempfile
+import threading
+import zlib
 
 import minecart.miner
 import minecart.color
+import minecart.content
 import pdfminer.pdfdevice
+import pdfminer.pdfinterp
 import pdfminer.pdfcolor
+import pdfminer.pdftypes
+import pdfminer.psparser
 
 TRAVIS = int(os.getenv("TRAVIS", 0))
 
@@ -33,6 +43,59 @@ def _patched_callable(obj):
 mock._callable = _patched_callable  # pylint: disable=W0212
 
 
+def make_pdf(objects):
+    """
+    Return the bytes of a PDF file with the given objects.
+
+    `objects` is a list with the body of each object (as bytes), numbered
+    from 1. Object 1 must be the catalog.
+
+    """
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for num, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b'%d 0 obj\n' % num + body + b'\nendobj\n')
+    xref = out.tell()
+    out.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b'%010d 00000 n \n' % offset)
+    out.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+              % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_stream(data, attrs=b''):
+    "Return the body of a stream object with the given data."
+    return (b'<< /Length %d %s >>\nstream\n' % (len(data), attrs) + data
+            + b'\nendstream')
+
+
+def make_pages_pdf(pages, streams):
+    """
+    Return the bytes of a PDF file with the given pages.
+
+    `pages` is a list of (page attributes, content indices) tuples, where
+    the attributes are bytes added to the page dictionary and the indices
+    point into `streams`, a list with the data of each content stream. All
+    pages have empty resources and a 100x100 media box (unless overridden).
+
+    """
+    first_stream = len(pages) + 3
+    kids = b' '.join(b'%d 0 R' % (num + 3) for num in range(len(pages)))
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>',
+               b'<< /Type /Pages /Kids [%s] /Count %d '
+               b'/MediaBox [0 0 100 100] >>' % (kids, len(pages))]
+    for attrs, contents in pages:
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /Resources << >> %s '
+            b'/Contents [%s] >>' % (attrs, b' '.join(
+                b'%d 0 R' % (first_stream + index) for index in contents)))
+    objects.extend(make_stream(data) for data in streams)
+    return make_pdf(objects)
+
+
 class TestStrokeState(unittest.TestCase):
 
     "Testing of the StrokeState."
@@ -314,7 +377,7 @@ class TestDeviceLoader(unittest.TestCase):
     def test_paint_path_graphics(self, shape, stroke_from_gs, fill_from_gs):
         "Test correct passing of stroke/fill parameters to the Shape."
         gstate = minecart.miner.ColoredState()
-        shape_obj = shape.return_value = object()
+        shape_obj = shape.return_value = mock.Mock()
         path = [('m', 10, 10), ('l', 20, 20), ('l', 30, 10), ('h',)]
         self.device.ctm = (1, 0, 0, 1, 0, 0)
 
@@ -401,6 +464,127 @@ class TestDeviceLoader(unittest.TestCase):
         self.fail("Not implemented")
 
 
+class TestExecute(unittest.TestCase):
+
+    "Test dispatching the operators in content streams."
+
+    def setUp(self):
+        rsrcmgr = pdfminer.pdfinterp.PDFResourceManager()
+        self.device = minecart.miner.DeviceLoader(rsrcmgr)
+        self.device.page = mock.MagicMock()
+        self.device.page.crop_box = (0, 0, 612, 792)
+        self.interp = minecart.miner.ColoredInterpreter(rsrcmgr, self.device)
+        self.interp.init_resources({'ColorSpace': {
+            'CS0': pdfminer.psparser.LIT('DeviceCMYK')}})
+        self.interp.init_state((1, 0, 0, 1, 0, 0))
+
+    def run_content(self, data):
+        "Run the given content stream and return the shapes drawn."
+        self.interp.execute([pdfminer.pdftypes.PDFStream({}, data)])
+        return [call[0][0] for call in
+                self.device.page.add_shape.call_args_list]
+
+    def test_operands(self):
+        "Test methods with and without fixed numbers of arguments."
+        shapes = self.run_content(
+            b'/CS0 cs 0 1 0 0 sc 2 w 0 0 m 10 0 20 5 30 0 c h B')
+        self.assertEqual(tuple(shapes[0].fill.color.value), (0, 1, 0, 0))
+        self.assertEqual(shapes[0].stroke.linewidth, 2)
+        self.assertEqual(shapes[0].path, [('m', 0, 0),
+                                          ('c', 10, 0, 20, 5, 30, 0),
+                                          ('h',)])
+
+    def test_stack(self):
+        "Test that extra and missing operands are handled like pdfminer."
+        with mock.patch('pdfminer.pdfinterp.handle_error') as handle_error:
+            shapes = self.run_content(b'5 foo 1 2 m 3 l 4 5 6 l S')
+        self.assertEqual(handle_error.call_count, 1)
+        # Leftover operands stay on the stack, and are used by later
+        # operators that lack operands
+        self.assertEqual(shapes[0].path,
+                         [('m', 1, 2), ('l', 5, 3), ('l', 5, 6)])
+        self.assertEqual(self.interp.argstack, [4])
+
+    def test_subclass(self):
+        "Test that operators are dispatched to overridden methods."
+        class Interpreter(minecart.miner.ColoredInterpreter):
+            "An interpreter that records the T* operator."
+            def do_T_a(self):
+                self.called = True
+        interp = Interpreter(self.interp.rsrcmgr, self.device)
+        interp.init_resources({})
+        interp.init_state((1, 0, 0, 1, 0, 0))
+        interp.execute([pdfminer.pdftypes.PDFStream({}, b'BT T* ET')])
+        self.assertTrue(interp.called)
+
+
+class TestClipping(unittest.TestCase):
+
+    "Test the tracking of clipping paths and forms."
+
+    def setUp(self):
+        rsrcmgr = pdfminer.pdfinterp.PDFResourceManager()
+        self.device = minecart.miner.DeviceLoader(rsrcmgr)
+        self.device.page = mock.MagicMock()
+        self.device.page.crop_box = (0, 0, 612, 792)
+        self.interp = minecart.miner.ColoredInterpreter(rsrcmgr, self.device)
+        form = pdfminer.pdftypes.PDFStream(
+            {'Subtype': pdfminer.pdfinterp.LITERAL_FORM,
+             'BBox': [0, 0, 10, 10], 'Matrix': [2, 0, 0, 2, 100, 100],
+             'Resources': {}},
+            b'0 0 5 5 re f 20 20 5 5 re f')
+        self.interp.init_resources({'XObject': {'Fm1': form}})
+        self.interp.init_state((1, 0, 0, 1, 0, 0))
+
+    def run_content(self, data):
+        "Run the given content stream and return the shapes drawn."
+        self.interp.execute([pdfminer.pdftypes.PDFStream({}, data)])
+        return [call[0][0] for call in
+                self.device.page.add_shape.call_args_list]
+
+    def test_dup(self):
+        "Ensure dup returns another ColoredInterpreter."
+        self.assertIsInstance(self.interp.dup(),
+                              minecart.miner.ColoredInterpreter)
+
+    def test_clip_save_restore(self):
+        "The clip is intersected by W and restored by Q."
+        shapes = self.run_content(
+            b'q 0 0 50 50 re W n q 10 10 100 100 re W* n 0 0 m 1 1 l S Q '
+            b'0 0 m 1 1 l S Q 0 0 m 1 1 l S')
+        self.assertEqual([shape.clip_bbox for shape in shapes],
+                         [(10, 10, 50, 50), (0, 0, 50, 50), None])
+        self.assertIsNone(self.device.clip)
+
+    def test_user_unit(self):
+        "The clip is scaled by the UserUnit, like the CTM."
+        self.device.unit = 2
+        shapes = self.run_content(b'1 2 3 4 re W n 0 0 m 1 1 l S')
+        self.assertEqual(shapes[0].clip_bbox, (2, 4, 8, 12))
+
+    def test_forms(self):
+        "Forms inherit the graphic state and are clipped to their BBox."
+        shapes = self.run_content(b'1 0 0 rg /Fm1 Do 0 0 m 1 1 l S')
+        self.assertEqual(len(shapes), 3)
+        self.assertEqual(shapes[0].fill.color.as_rgb(), (1, 0, 0))
+        self.assertEqual(shapes[0].get_bbox(), (100, 100, 110, 110))
+        self.assertEqual(shapes[0].clip_bbox, (100, 100, 120, 120))
+        # The CTM and the clip are restored after the form
+        self.assertEqual(shapes[2].path, [('m', 0, 0), ('l', 1, 1)])
+        self.assertIsNone(shapes[2].clip_bbox)
+
+    def test_drop_clipped(self):
+        "Objects outside the clip or the crop box can be dropped."
+        self.device.drop_clipped = True
+        shapes = self.run_content(
+            b'q 0 0 50 50 re W n 10 10 m 20 20 l S 60 60 m 70 70 l S '
+            b'5 w 51 51 m 60 60 l S Q /Fm1 Do 700 700 m 710 710 l S')
+        self.assertEqual([shape.get_bbox() for shape in shapes], [
+            (10, 10, 20, 20), (51, 51, 60, 60), (100, 100, 110, 110)])
+        self.assertEqual(shapes[0].get_visible_bbox(), (10, 10, 20, 20))
+        self.assertEqual(shapes[1].get_visible_bbox(), None)
+
+
 class TestDocument(unittest.TestCase):
 
     "Test the Document class."
@@ -423,3 +607,251 @@ class TestDocument(unittest.TestCase):
     def test_get_page(self):
         ""
         self.fail("Not implemented!")
+
+    @mock.patch("minecart.miner.Document.iter_pages", autospec=True)
+    @mock.patch("pdfminer.pdfparser.PDFDocument", autospec=True)
+    @mock.patch("pdfminer.pdfparser.PDFParser", autospec=True)
+    def test_iter_unique_images(self, pdfparser, pdfdocument, iter_pages):
+        "Ensure images are grouped by object id and by content."
+        def make_stream(objid, data):
+            stream = pdfminer.pdftypes.PDFStream(
+                {'Width': 1, 'Height': 1, 'Length': len(data)}, data)
+            stream.set_objid(objid, 0)
+            return stream
+        logo = make_stream(5, b'logo')
+        logo_copy = make_stream(9, b'logo')
+        photo = make_stream(7, b'photo')
+        ctm1 = (1, 0, 0, 1, 0, 0)
+        ctm2 = (2, 0, 0, 2, 10, 10)
+        page1 = mock.MagicMock()
+        page1.images = [minecart.content.Image(ctm1, logo),
+                        minecart.content.Image(ctm2, photo)]
+        page2 = mock.MagicMock()
+        page2.images = [minecart.content.Image(ctm2, logo),
+                        minecart.content.Image(ctm1, logo_copy)]
+        iter_pages.return_value = iter([page1, page2])
+        doc = minecart.miner.Document(object())
+        groups = list(doc.iter_unique_images())
+        self.assertEqual(len(groups), 2)
+        (first, first_places), (second, second_places) = groups
+        self.assertIs(first, page1.images[0])
+        self.assertEqual(first_places, [
+            (0, ctm1, (0, 0, 1, 1)),
+            (1, ctm2, (10, 10, 12, 12)),
+            (1, ctm1, (0, 0, 1, 1)),
+        ])
+        self.assertIs(second, page1.images[1])
+        self.assertEqual(second_places, [(0, ctm2, (10, 10, 12, 12))])
+
+    @mock.patch("minecart.index.TextIndex.build", autospec=True)
+    @mock.patch("minecart.miner.Document.iter_pages", autospec=True)
+    @mock.patch("pdfminer.pdfparser.PDFDocument", autospec=True)
+    @mock.patch("pdfminer.pdfparser.PDFParser", autospec=True)
+    def test_search(self, pdfparser, pdfdocument, iter_pages, build):
+        "Ensure the text index is built once and used for searching."
+        doc = minecart.miner.Document(object())
+        self.assertIsNone(doc.text_index)
+        doc.search("term")
+        doc.search("other")
+        build.assert_called_once_with(iter_pages.return_value)
+        self.assertIs(doc.text_index, build.return_value)
+        self.assertEqual(build.return_value.search.call_args_list,
+                         [mock.call("term"), mock.call("other")])
+
+
+class TestDuplicatePages(unittest.TestCase):
+
+    "Test the fingerprinting and reuse of identical pages."
+
+    def setUp(self):
+        line, box = b'0 0 m 10 10 l S', b'0 0 10 10 re f'
+        self.pdf = make_pages_pdf([
+            (b'', [0]),
+            (b'', [0]),
+            (b'', [1]),  # Same bytes in another object
+            (b'', [2]),
+            (b'/MediaBox [10 10 110 110]', [0]),
+            (b'/CropBox [0 0 50 50]', [0]),
+        ], [line, line, box])
+
+    def open(self, **params):
+        "Return a Document for the test PDF."
+        return minecart.miner.Document(io.BytesIO(self.pdf), **params)
+
+    def test_duplicate_pages(self):
+        "Test grouping the pages without interpreting them."
+        doc = self.open()
+        with mock.patch.object(doc.interpreter, 'process_page') as process:
+            self.assertEqual(doc.duplicate_pages(), [[0, 1, 2, 5]])
+        self.assertFalse(process.called)
+        # The crop box matters when clipped objects are dropped
+        self.assertEqual(self.open(drop_clipped=True).duplicate_pages(),
+                         [[0, 1, 2]])
+
+    def test_fingerprint_after_decoding(self):
+        "Test that fingerprints don't change once pages are interpreted."
+        doc = self.open()
+        before = [doc.fingerprint(page) for page in doc.doc.get_pages()]
+        list(doc.iter_pages())
+        after = [doc.fingerprint(page) for page in doc.doc.get_pages()]
+        self.assertEqual(before, after)
+        # Neither fingerprinting nor interpreting stores the decoded data
+        for page in doc.doc.get_pages():
+            for stream in page.contents:
+                self.assertIsNone(pdfminer.pdftypes.resolve1(stream).data)
+
+    def test_reuse_duplicates(self):
+        "Test that duplicate pages are copied instead of interpreted."
+        doc = self.open(reuse_duplicates=True)
+        with mock.patch.object(doc.interpreter, 'process_page',
+                               wraps=doc.interpreter.process_page) as process:
+            pages = list(doc.iter_pages())
+        self.assertEqual(process.call_count, 3)
+        first, second, third, other, moved, cropped = pages
+        self.assertEqual(len(first.shapes), 1)
+        self.assertIs(second.shapes[0], first.shapes[0])
+        self.assertIsNot(second.shapes, first.shapes)
+        self.assertIs(third.shapes[0], first.shapes[0])
+        self.assertIsNot(other.shapes[0], first.shapes[0])
+        self.assertIsNot(moved.shapes[0], first.shapes[0])
+        self.assertIs(cropped.shapes[0], first.shapes[0])
+        self.assertIsNot(cropped.m_page, first.m_page)
+        self.assertEqual(cropped.crop_box, (0, 0, 50, 50))
+        self.assertEqual(first.crop_box, (0, 0, 100, 100))
+        second.add_shape(minecart.content.Shape(None, None, False, []))
+        self.assertEqual(second.shapes[-1].z_index, 1)
+        self.assertEqual(len(first.shapes), 1)
+
+    def test_released_pages(self):
+        "Test that pages are extracted again once they are released."
+        doc = self.open(reuse_duplicates=True)
+        with mock.patch.object(doc.interpreter, 'process_page',
+                               wraps=doc.interpreter.process_page) as process:
+            for _ in doc.iter_pages():
+                pass
+        # Only the device keeps the last page alive
+        self.assertGreater(process.call_count, 3)
+
+
+class TestPrefetch(unittest.TestCase):
+
+    "Test extracting pages in a background thread."
+
+    def test_order(self):
+        "Test that the items come in order."
+        self.assertEqual(list(minecart.miner.iter_prefetched(range(20), 3)),
+                         list(range(20)))
+        self.assertEqual(list(minecart.miner.iter_prefetched([], 3)), [])
+
+    def test_bounded(self):
+        "Test that the thread stays at most `size` items ahead."
+        produced = []
+        fourth = threading.Event()
+
+        def generate():
+            "Record each item as it is produced."
+            for item in range(10):
+                produced.append(item)
+                if item == 3:
+                    fourth.set()
+                yield item
+
+        items = minecart.miner.iter_prefetched(generate(), 2)
+        self.assertEqual(next(items), 0)
+        self.assertTrue(fourth.wait(10))
+        # Two items wait in the queue, and the fourth waits to be added, so
+        # the thread can't produce a fifth until more are consumed
+        self.assertEqual(len(produced), 4)
+        items.close()
+        self.assertLessEqual(len(produced), 5)
+
+    def test_errors(self):
+        "Test that errors are raised after the preceding items."
+        def generate():
+            "Fail after two items."
+            yield 1
+            yield 2
+            raise ValueError("bad page")
+
+        items = minecart.miner.iter_prefetched(generate(), 5)
+        self.assertEqual(next(items), 1)
+        self.assertEqual(next(items), 2)
+        self.assertRaises(ValueError, next, items)
+        self.assertRaises(StopIteration, next, items)
+
+    def test_iter_pages(self):
+        "Test that prefetching returns the same pages."
+        pdf = make_pages_pdf([(b'', [i % 3]) for i in range(7)], [
+            b'0 0 m 10 10 l S', b'0 0 10 10 re f', b'1 1 m 5 5 l S'])
+        expected = [
+            [shape.path for shape in page.shapes]
+            for page in minecart.miner.Document(io.BytesIO(pdf)).iter_pages()]
+        doc = minecart.miner.Document(io.BytesIO(pdf))
+        pages = doc.iter_pages(prefetch=2)
+        self.assertEqual([[shape.path for shape in page.shapes]
+                          for page in pages], expected)
+        self.assertNotIn('minecart-prefetch', [
+            thread.name for thread in threading.enumerate()])
+
+
+class TestThreadSafety(unittest.TestCase):
+
+    "Test extracting pages of one document from several threads."
+
+    def setUp(self):
+        streams = [b'%d %d m %d 10 l S\n' % (i, i, i + 5) * (i + 1)
+                   for i in range(8)]
+        self.pdf = make_pages_pdf(
+            [(b'', [i % 8]) for i in range(24)],
+            [zlib.compress(data) for data in streams])
+        self.pdf = self.pdf.replace(b'<< /Length', b'<< /Filter /FlateDecode '
+                                    b'/Length')
+        doc = minecart.miner.Document(io.BytesIO(self.pdf))
+        self.expected = [[shape.path for shape in page.shapes]
+                         for page in doc.iter_pages()]
+
+    def check_concurrent(self, **params):
+        "Extract all the pages (three times) in a thread pool."
+        doc = minecart.miner.Document(io.BytesIO(self.pdf), **params)
+        nums = list(range(24)) * 3
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            pages = list(executor.map(doc.get_page, nums))
+        self.assertEqual([[shape.path for shape in page.shapes]
+                          for page in pages], [self.expected[num]
+                                               for num in nums])
+        return doc
+
+    def test_get_page(self):
+        "Test concurrent calls to get_page."
+        self.assertEqual(len(self.expected[3]), 4)
+        doc = self.check_concurrent()
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            other = executor.submit(lambda: doc.interpreter).result()
+        self.assertIsNot(other, doc.interpreter)
+
+    def test_object_cache(self):
+        "Test concurrent calls with a bounded object cache."
+        import minecart.cache
+        self.check_concurrent(
+            object_cache=minecart.cache.ObjectCache(max_objects=3))
+
+    def test_page_cache(self):
+        "Test concurrent calls that read and fill a page cache."
+        import minecart.cache
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        for _ in range(2):  # Filling the cache, then reading from it
+            self.check_concurrent(cache=minecart.cache.PageCache(directory))
+
+    def test_streams(self):
+        "Test that shared streams are decoded once."
+        doc = minecart.miner.Document(io.BytesIO(self.pdf))
+        stream = doc.doc.getobj(27)
+        self.assertIs(doc.doc.getobj(27), stream)
+        with mock.patch.object(stream, 'decode',
+                               wraps=stream.decode) as decode:
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                results = list(executor.map(
+                    lambda _: stream.get_data(), range(16)))
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(set(results), {b'0 0 m 5 10 l S\n'})
@@ -0,0 +1,156 @@
+"Unit tests for the raster module."
+
+import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import pdfminer.pdftypes
+from pdfminer.psparser import LIT
+
+import minecart.color
+import minecart.content
+import minecart.miner
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    import minecart.raster
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+RED = minecart.color.DEVICE_RGB.make_color((1, 0, 0))
+BLUE = minecart.color.DEVICE_RGB.make_color((0, 0, 1))
+
+
+def square(left, bottom, size, clockwise=False):
+    "Return the path for a square."
+    corners = [(left + size, bottom), (left + size, bottom + size),
+               (left, bottom + size)]
+    if clockwise:
+        corners.reverse()
+    return ([('m', left, bottom)] + [('l', x, y) for x, y in corners]
+            + [('h',)])
+
+
+def make_shape(path, fill=None, stroke=None, linewidth=1, evenodd=False):
+    "Make a shape with the given fill and stroke colors."
+    fill_state = stroke_state = None
+    if fill is not None:
+        fill_state = minecart.miner.FillState()
+        fill_state.color = fill
+    if stroke is not None:
+        stroke_state = minecart.miner.StrokeState()
+        stroke_state.color = stroke
+        stroke_state.linewidth = linewidth
+    return minecart.content.Shape(stroke_state, fill_state, evenodd, path)
+
+
+def make_page(objects, width=20, height=10):
+    "Make a stand-in for a page with the given graphics objects."
+    page = mock.MagicMock()
+    page.width, page.height = width, height
+    page.shapes, page.images, page.letterings = [], [], []
+    for z_index, obj in enumerate(objects):
+        obj.z_index = z_index
+        if isinstance(obj, minecart.content.Shape):
+            page.shapes.append(obj)
+        elif isinstance(obj, minecart.content.Image):
+            page.images.append(obj)
+        else:
+            page.letterings.append(obj)
+    return page
+
+
+@unittest.skipIf(numpy is None, "Requires numpy")
+class TestRasterize(unittest.TestCase):
+
+    "Test the rendering of pages."
+
+    def test_fill(self):
+        "Filled shapes cover the pixels whose centers are inside them."
+        page = make_page([make_shape(square(2, 3, 4), fill=RED)])
+        image = minecart.raster.rasterize(page)
+        self.assertEqual(image.shape, (10, 20, 3))
+        red = (image == (255, 0, 0)).all(axis=2)
+        expected = numpy.zeros((10, 20), dtype=bool)
+        expected[3:7, 2:6] = True
+        numpy.testing.assert_array_equal(red, expected)
+        self.assertEqual(image[0, 0].tolist(), [255, 255, 255])
+
+    def test_resolution(self):
+        "The dpi scales the image."
+        page = make_page([make_shape(square(2, 3, 4), fill=RED)])
+        image = minecart.raster.rasterize(page, dpi=144)
+        self.assertEqual(image.shape, (20, 40, 3))
+        self.assertEqual((image == (255, 0, 0)).all(axis=2).sum(), 64)
+
+    def test_fill_rules(self):
+        "Holes follow the fill rule."
+        path = square(0, 0, 10) + square(3, 3, 4)
+        for evenodd, hole in ((True, True), (False, False)):
+            page = make_page([make_shape(path, fill=RED, evenodd=evenodd)])
+            image = minecart.raster.rasterize(page)
+            self.assertEqual(tuple(image[5, 5]) == (255, 255, 255), hole)
+            self.assertEqual(tuple(image[1, 1]), (255, 0, 0))
+
+    def test_stroke_and_order(self):
+        "Strokes are drawn as wide as the line, later objects on top."
+        page = make_page([
+            make_shape(square(0, 0, 10), fill=RED),
+            make_shape([('m', 0, 5), ('l', 20, 5)], stroke=BLUE,
+                       linewidth=2),
+        ])
+        image = minecart.raster.rasterize(page)
+        blue = (image == (0, 0, 255)).all(axis=2)
+        self.assertEqual(blue.sum(axis=0).tolist(), [2] * 20)
+        self.assertTrue(blue[4:6].all())
+        self.assertEqual(tuple(image[8, 5]), (255, 0, 0))
+
+    def test_clip_and_text(self):
+        "Clip boxes are honored and letterings are drawn as boxes."
+        shape = make_shape(square(0, 0, 10), fill=RED)
+        shape.clip_bbox = (0, 0, 5, 5)
+        lettering = minecart.content.Lettering(u'Hi', None, (12, 2, 16, 4))
+        page = make_page([shape, lettering])
+        image = minecart.raster.rasterize(page)
+        self.assertEqual((image == (255, 0, 0)).all(axis=2).sum(), 25)
+        gray = (image == minecart.raster.TEXT_COLOR).all(axis=2)
+        self.assertEqual(gray.sum(), 8)
+        self.assertTrue(gray[6:8, 12:16].all())
+        no_text = minecart.raster.rasterize(page, draw_text=False)
+        self.assertFalse((no_text == minecart.raster.TEXT_COLOR).all(
+            axis=2).any())
+
+    @unittest.skipIf(PIL is None, "Requires pillow")
+    def test_image(self):
+        "Images are sampled through their CTM."
+        data = bytes([255, 0, 0, 0, 255, 0, 0, 0, 255, 0, 0, 0])
+        stream = pdfminer.pdftypes.PDFStream(
+            {'Width': 2, 'Height': 2, 'BitsPerComponent': 8,
+             'ColorSpace': LIT('DeviceRGB'), 'Length': len(data)}, data)
+        image = minecart.content.Image((4, 0, 0, 4, 10, 2), stream)
+        out = minecart.raster.rasterize(make_page([image]))
+        self.assertEqual(tuple(out[4, 10]), (255, 0, 0))
+        self.assertEqual(tuple(out[4, 13]), (0, 255, 0))
+        self.assertEqual(tuple(out[7, 10]), (0, 0, 255))
+        self.assertEqual(tuple(out[7, 13]), (0, 0, 0))
+        self.assertEqual(tuple(out[8, 10]), (255, 255, 255))
+
+    def test_out(self):
+        "Drawing into an existing array clears it first."
+        page = make_page([make_shape(square(2, 3, 4), fill=RED)])
+        out = numpy.zeros((10, 20, 3), dtype=numpy.uint8)
+        result = minecart.raster.rasterize(page, out=out,
+                                           background=(0, 255, 0))
+        self.assertIs(result, out)
+        self.assertEqual(tuple(out[0, 0]), (0, 255, 0))
+        with self.assertRaises(ValueError):
+            minecart.raster.rasterize(page, out=out[:5])
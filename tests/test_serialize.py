@@ -0,0 +1,174 @@
+"Unit tests for the serialize module."
+
+import array
+import io
+import os
+import pickle
+import unittest
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import minecart
+import minecart.color
+import minecart.content
+import minecart.miner
+import minecart.serialize
+
+import writer
+
+from pdfminer.psparser import LIT
+
+TESTDOCS = os.path.join(os.path.dirname(__file__), 'testdocs')
+
+
+class TestSerialize(unittest.TestCase):
+
+    "Test round-tripping pages through `dumps` and `loads`."
+
+    def setUp(self):
+        self.page = page = minecart.content.Page.detached(
+            100, 50, (5, 5, 95, 45), trim_box=(10, 10, 90, 40))
+        stroke = minecart.miner.StrokeState()
+        stroke.color = minecart.color.DEVICE_CMYK.make_color((0, 1, 0, 0))
+        stroke.linewidth = 1.5
+        stroke.dash = ([3, 1], 2)
+        fill = minecart.miner.FillState()
+        fill.color = minecart.color.DEVICE_GRAY.make_color((.5,))
+        page.add_shape(minecart.content.Shape(
+            stroke, fill, True,
+            [('m', 0, 0), ('l', 10, 0), ('c', 10, 5, 5, 10, 0, 10),
+             ('v', 1, 1, 2, 2), ('y', 3, 3, 4, 4), ('h',)]))
+        font = mock.Mock(fontname='ABCDEF+Helvetica')
+        lettering = minecart.content.Lettering(
+            u'ab', font, (10, 20, 30, 30), True,
+            array.array('f', [10, 20, 20, 30, 20, 20, 30, 30]))
+        lettering.clip_bbox = (0, 0, 15, 50)
+        page.add_lettering(lettering)
+        page.add_shape(minecart.content.Shape(None, fill, False,
+                                              [('m', 1, 2), ('l', 3, 4)]))
+        stream = mock.Mock(objid=7, attrs={
+            'Width': 2, 'Height': 3, 'ColorSpace': LIT('DeviceRGB'),
+            'Filter': [LIT('FlateDecode')], 'Decode': [0, 1, 0, 1, 0, 1]})
+        page.add_image(minecart.content.Image((20, 0, 0, 10, 50, 5), stream))
+        page.add_lettering(minecart.content.Lettering(
+            u'c', None, (40, 40, 45, 48), False))
+
+    def test_round_trip(self):
+        "Test that the graphics objects are rebuilt."
+        page = minecart.serialize.loads(minecart.serialize.dumps(self.page))
+        self.assertIsNone(page.m_page)
+        self.assertEqual((page.width, page.height), (100, 50))
+        self.assertEqual(page.crop_box, (5, 5, 95, 45))
+        self.assertEqual(page.bleed_box, (5, 5, 95, 45))
+        self.assertEqual(page.trim_box, (10, 10, 90, 40))
+        self.assertEqual(len(page.shapes), 2)
+        shape = page.shapes[0]
+        self.assertEqual(shape.path, self.page.shapes[0].path)
+        self.assertTrue(shape.evenodd)
+        self.assertEqual(shape.stroke.color.space, minecart.color.DEVICE_CMYK)
+        self.assertEqual(shape.stroke.color.value, (0, 1, 0, 0))
+        self.assertEqual(shape.stroke.linewidth, 1.5)
+        self.assertEqual(shape.stroke.dash, ([3, 1], 2))
+        self.assertEqual(shape.fill.color.value, (.5,))
+        self.assertIsNone(page.shapes[1].stroke)
+        # Equal fill states are shared
+        self.assertIs(page.shapes[1].fill, shape.fill)
+        self.assertEqual([obj.z_index for obj in page.shapes], [0, 2])
+        self.assertEqual(page.images[0].z_index, 3)
+
+    def test_letterings(self):
+        "Test that text, boxes, fonts and clips are kept."
+        page = minecart.serialize.loads(minecart.serialize.dumps(self.page))
+        first, second = page.letterings
+        self.assertEqual((first, second), (u'ab', u'c'))
+        self.assertEqual(first.bbox, (10, 20, 30, 30))
+        self.assertEqual(first.font.fontname, 'ABCDEF+Helvetica')
+        self.assertEqual(first.clip_bbox, (0, 0, 15, 50))
+        self.assertEqual(first[1].get_bbox(), (20, 20, 30, 30))
+        self.assertIsNone(second.font.fontname)
+        self.assertIsNone(second.char_bboxes)
+        self.assertIsNone(second.clip_bbox)
+        self.assertFalse(second.horizontal)
+        self.assertEqual([obj.z_index for obj in page.letterings], [1, 4])
+        page.add_shape(minecart.content.Shape(None, None, False, []))
+        self.assertEqual(page.shapes[-1].z_index, 5)
+
+    def test_images(self):
+        "Test that the image attributes and object ids are kept."
+        page = minecart.serialize.loads(minecart.serialize.dumps(self.page))
+        image = page.images[0]
+        self.assertEqual(image.ctm, (20, 0, 0, 10, 50, 5))
+        self.assertEqual(image.bbox, self.page.images[0].bbox)
+        self.assertEqual(image.obj.objid, 7)
+        self.assertEqual(image.obj.attrs, {
+            'Width': 2, 'Height': 3, 'ColorSpace': LIT('DeviceRGB'),
+            'Filter': [LIT('FlateDecode')]})
+
+    def test_other_colors(self):
+        "Test colors outside the device families."
+        space = minecart.color.FAMILIES['CalRGB'].make_space(
+            [{'WhitePoint': [0.9505, 1.0, 1.089]}])
+        shape = self.page.shapes[1]
+        shape.fill = minecart.miner.FillState()
+        shape.fill.color = space.make_color((0, 0, 0))
+        shape.stroke = minecart.miner.StrokeState()
+        shape.stroke.color = minecart.color.NO_COLOR
+        shape.stroke.dash = None
+        page = minecart.serialize.loads(minecart.serialize.dumps(self.page))
+        fill = page.shapes[1].fill.color
+        self.assertEqual(fill.space, minecart.color.DEVICE_RGB)
+        for value, expected in zip(fill.value, space.as_rgb((0, 0, 0))):
+            self.assertAlmostEqual(value, expected)
+        self.assertIs(page.shapes[1].stroke.color, minecart.color.NO_COLOR)
+        self.assertIsNone(page.shapes[1].stroke.dash)
+
+    def test_bad_data(self):
+        "Test that foreign data is rejected."
+        data = minecart.serialize.dumps(self.page)
+        self.assertRaises(ValueError, minecart.serialize.loads, b'x' + data)
+        self.assertRaises(ValueError, minecart.serialize.loads,
+                          data.replace(b'MCPG', b'MCPX'))
+
+    def test_document(self):
+        "Test pickling pages and reattaching images to their document."
+        pdffile = open(os.path.join(TESTDOCS, 'laundry.pdf'), 'rb')
+        self.addCleanup(pdffile.close)
+        doc = minecart.Document(pdffile)
+        page = doc.get_page(0)
+        data = minecart.serialize.dumps(page)
+        self.assertLess(len(data), len(page.letterings) * 200)
+        copy = pickle.loads(pickle.dumps(page))
+        self.assertEqual(list(copy.letterings), list(page.letterings))
+        self.assertEqual(copy.letterings[0].font.fontname,
+                         page.letterings[0].font.fontname)
+        attached = minecart.serialize.loads(data, doc)
+        self.assertIs(attached.images[0].obj, page.images[0].obj)
+        self.assertEqual(attached.images[0].as_pil().size, (949, 690))
+
+    def test_inline_image(self):
+        "Test that inline images keep their attributes and data."
+        pdf = writer.Page()
+        pdf.add_content(b"q 2 0 0 1 0 0 cm BI /W 2 /H 1 /BPC 8 /CS /RGB "
+                        b"/D [1 0 1 0 1 0] /F [/AHx] ID 00ffff ff00ff> EI Q")
+        document = writer.Document()
+        document.add_page(pdf)
+        out = io.BytesIO()
+        document.write_to_file(out)
+        data = out.getvalue()
+        page = minecart.Document(io.BytesIO(data)).get_page(0)
+        for doc in (None, minecart.Document(io.BytesIO(data))):
+            copy = minecart.serialize.loads(
+                minecart.serialize.dumps(page), doc)
+            image = copy.images[0]
+            self.assertIsNone(image.obj.objid)
+            self.assertEqual(image.obj.attrs, page.images[0].obj.attrs)
+            self.assertEqual(image.as_pil().size, (2, 1))
+            self.assertEqual(image.as_pil().tobytes(),
+                             page.images[0].as_pil().tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
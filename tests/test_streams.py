@@ -0,0 +1,302 @@
+"Unit tests for the streams module."
+
+import base64
+import binascii
+import random
+import threading
+import unittest
+import zlib
+
+import pdfminer.pdftypes
+from pdfminer.psparser import LIT
+
+import minecart.content
+import minecart.streams
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import PIL.Image
+except ImportError:
+    PIL = None
+
+
+def paeth(left, above, upper_left):
+    "The Paeth predictor, as in the PNG spec."
+    estimate = left + above - upper_left
+    best = min(abs(estimate - left), abs(estimate - above),
+               abs(estimate - upper_left))
+    if best == abs(estimate - left):
+        return left
+    return above if best == abs(estimate - above) else upper_left
+
+
+def png_predict(data, row_size, step, kinds):
+    "Apply the PNG row filters in `kinds` to the rows of `data`."
+    out = bytearray()
+    previous = bytearray(row_size)
+    for start, kind in zip(range(0, len(data), row_size), kinds):
+        row = bytearray(data[start:start + row_size])
+        out.append(kind)
+        for index, value in enumerate(row):
+            left = row[index - step] if index >= step else 0
+            upper_left = previous[index - step] if index >= step else 0
+            above = previous[index]
+            predicted = [0, left, above, (left + above) // 2,
+                         paeth(left, above, upper_left)][kind]
+            out.append((value - predicted) & 0xFF)
+        previous = row
+    return bytes(out)
+
+
+class TestFilters(unittest.TestCase):
+
+    "Test the individual filters."
+
+    def test_flate(self):
+        "Test zlib data, including truncated and invalid data."
+        data = zlib.compress(b'abc' * 1000)
+        decode = minecart.streams.flate_decode
+        self.assertEqual(decode(data), b'abc' * 1000)
+        self.assertEqual(decode(data[:-4]), b'abc' * 1000)
+        self.assertEqual(decode(data[:-4] + b'garbage'), b'abc' * 1000)
+        self.assertEqual(decode(b'garbage'), b'')
+
+    def test_lzw(self):
+        "Test the example from the PDF spec and code width changes."
+        self.assertEqual(minecart.streams.lzw_decode(
+            binascii.unhexlify(b'800B6050220C0C8501')), b'-----A---B')
+        rng = random.Random(0)
+        data = bytes(bytearray(rng.randrange(4) for _ in range(20000)))
+        # Check against pdfminer's decoder, which is correct but slow
+        encoded = lzw_encode(data)
+        self.assertEqual(minecart.streams.lzw_decode(encoded), data)
+        self.assertEqual(minecart.streams.lzw_decode(
+            lzw_encode(data, early_change=0), early_change=0), data)
+
+    def test_run_length(self):
+        "Test literal and repeated runs, and the end of data marker."
+        self.assertEqual(minecart.streams.run_length_decode(
+            b'\x02abc\xfeZ\x00q\x80junk'), b'abcZZZq')
+
+    def test_ascii(self):
+        "Test the ASCII85 and ASCIIHex filters."
+        decode = minecart.streams.ascii85_decode
+        encoded = base64.a85encode(b'Hello World!\0\0\0\0')
+        self.assertEqual(decode(b'<~' + encoded[:5] + b' \n' + encoded[5:]
+                                + b'~>'), b'Hello World!\0\0\0\0')
+        self.assertEqual(decode(b'z~'), b'\0\0\0\0')
+        self.assertEqual(minecart.streams.ascii_hex_decode(b'41 42\n4>ff'),
+                         b'AB@')
+
+    def test_unsupported(self):
+        "Test that unknown filters and predictors are reported."
+        self.assertRaises(pdfminer.pdftypes.PDFNotImplementedError,
+                          minecart.streams.decode_filter, 'CCF', b'')
+        self.assertRaises(pdfminer.pdftypes.PDFNotImplementedError,
+                          minecart.streams.unpredict, b'', {'Predictor': 5})
+
+
+def run_with_timeout(function, timeout=10):
+    "Return the result of `function()`, or None if it takes too long."
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    return result[0] if result else None
+
+
+class TestIterDecoded(unittest.TestCase):
+
+    "Test decoding streams incrementally."
+
+    def test_long(self):
+        "Test data that spans many input and output chunks."
+        rng = random.Random(0)
+        data = b''.join(b'%d %d l\n' % (rng.randrange(1000), i)
+                        for i in range(20000))
+        compressed = zlib.compress(data)
+        self.assertGreater(len(compressed), 10 * 1000)
+        for rawdata in (compressed, compressed + b'\nendstream junk'):
+            stream = pdfminer.pdftypes.PDFStream(
+                {'Filter': LIT('FlateDecode')}, rawdata)
+            chunks = run_with_timeout(lambda: list(
+                minecart.streams.iter_decoded(stream, 1000)))
+            self.assertIsNotNone(chunks, "Timed out")
+            self.assertEqual(b''.join(chunks), data)
+
+    def test_flate(self):
+        "Test that the data is decompressed in chunks, and not stored."
+        data = bytes(bytearray(range(256))) * 100
+        stream = pdfminer.pdftypes.PDFStream(
+            {'Filter': [LIT('FlateDecode')]}, zlib.compress(data))
+        chunks = list(minecart.streams.iter_decoded(stream, 1000))
+        self.assertEqual(b''.join(chunks), data)
+        self.assertEqual(max(len(chunk) for chunk in chunks), 1000)
+        self.assertIsNone(stream.data)
+        # Bad checksums are ignored, and other errors keep the data read
+        # before them
+        stream.rawdata = zlib.compress(data)[:-4] + b'xxxx'
+        self.assertEqual(b''.join(
+            minecart.streams.iter_decoded(stream, 1000)), data)
+        stream.rawdata = zlib.compress(data)[:-20] + b'\xff' * 20
+        with self.assertLogs('minecart.streams', 'WARNING'):
+            self.assertTrue(data.startswith(b''.join(
+                minecart.streams.iter_decoded(stream, 1000))))
+
+    def test_other(self):
+        "Test that other streams are decoded whole, and not stored."
+        data = b'0 0 m 1 1 l S'
+        decoded = pdfminer.pdftypes.PDFStream(
+            {'Filter': LIT('Fl')}, zlib.compress(data))
+        decoded.get_data()
+        self.assertEqual(list(minecart.streams.iter_decoded(decoded)),
+                         [data])
+        streams = [pdfminer.pdftypes.PDFStream({}, data),
+                   pdfminer.pdftypes.PDFStream(
+                       {'Filter': [LIT('AHx'), LIT('Fl')]},
+                       binascii.hexlify(zlib.compress(data)) + b'>')]
+        if numpy is not None:
+            streams.append(pdfminer.pdftypes.PDFStream(
+                {'Filter': LIT('Fl'), 'DecodeParms': {
+                    'Predictor': 12, 'Columns': len(data)}},
+                zlib.compress(b'\x00' + data)))
+        for stream in streams:
+            self.assertEqual(list(minecart.streams.iter_decoded(stream)),
+                             [data])
+            self.assertIsNone(stream.data)
+
+
+def lzw_encode(data, early_change=1):
+    "Encode `data` with LZW, clearing the table when it is full."
+    codes = [256]
+    table = dict((bytes(bytearray([value])), value) for value in range(256))
+    current = b''
+    for value in bytearray(data):
+        extended = current + bytes(bytearray([value]))
+        if extended in table:
+            current = extended
+            continue
+        codes.append(table[current])
+        table[extended] = len(table) + 2
+        current = extended[-1:]
+        if len(table) + 2 == 4096 - early_change:
+            codes.append(256)
+            table = dict((bytes(bytearray([value])), value)
+                         for value in range(256))
+    codes.extend([table[current], 257])
+    bits = []
+    width = 9
+    size = 258
+    previous = None
+    for code in codes:
+        bits.append(format(code, '0%db' % width))
+        if code == 256:
+            width, size, previous = 9, 258, None
+            continue
+        if previous is not None:
+            size += 1
+        previous = code
+        if size + early_change >= 1 << width and width < 12:
+            width += 1
+    bits = ''.join(bits)
+    bits += '0' * (-len(bits) % 8)
+    return binascii.unhexlify('%0*x' % (len(bits) // 4, int(bits, 2)))
+
+
+@unittest.skipIf(numpy is None, "Requires numpy")
+class TestPredictors(unittest.TestCase):
+
+    "Test undoing the PNG and TIFF predictors."
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def random_bytes(self, size):
+        "Return `size` random bytes."
+        return bytes(bytearray(self.rng.randrange(256) for _ in range(size)))
+
+    def test_png(self):
+        "Test every row filter, for several sample layouts."
+        for colors, bits, columns in ((1, 8, 7), (3, 8, 5), (4, 8, 3),
+                                      (2, 8, 4), (1, 1, 13), (1, 4, 5),
+                                      (3, 16, 3), (3, 2, 5), (5, 8, 4),
+                                      (5, 16, 3), (1, 16, 1), (1, 8, 13),
+                                      (3, 4, 5)):
+            row_size = (colors * bits * columns + 7) // 8
+            step = (colors * bits + 7) // 8
+            data = self.random_bytes(row_size * 6)
+            for kinds in ([0, 1, 2, 1, 2, 0], [2, 2, 1, 2, 0, 2],
+                          [0, 1, 2, 3, 4, 4], [2, 2, 4, 1, 3, 2],
+                          [3] * 6, [4] * 6):
+                predicted = png_predict(data, row_size, step, kinds)
+                self.assertEqual(minecart.streams.png_unpredict(
+                    predicted + b'\x02', colors, bits, columns), data,
+                                 (colors, bits, columns, kinds))
+
+    def test_tiff(self):
+        "Test horizontal differencing, for several sample layouts."
+        for colors, bits, columns in ((1, 8, 7), (3, 8, 5), (2, 16, 3)):
+            dtype = numpy.dtype('>u2' if bits == 16 else 'u1')
+            samples = numpy.frombuffer(self.random_bytes(
+                4 * columns * colors * dtype.itemsize), dtype).reshape(
+                    4, columns, colors)
+            differences = samples.copy()
+            differences[:, 1:] = samples[:, 1:] - samples[:, :-1]
+            self.assertEqual(minecart.streams.tiff_unpredict(
+                differences.tobytes(), colors, bits, columns),
+                             samples.tobytes())
+        # 1-bit samples, with padding at the end of each row
+        self.assertEqual(minecart.streams.tiff_unpredict(
+            b'\xc0\x80\x40\x00', 1, 1, 3), b'\x80\xe0\x60\x00')
+
+
+@unittest.skipIf(PIL is None or numpy is None, "Requires pillow and numpy")
+class TestImages(unittest.TestCase):
+
+    "Test decoding image streams that pdfminer can't decode."
+
+    def test_chained_filters(self):
+        "Test per-filter decode parameters, with a PNG predictor."
+        pixels = bytes(bytearray(range(48)))
+        data = base64.a85encode(zlib.compress(
+            png_predict(pixels, 12, 3, [4, 3, 1, 2]))) + b'~>'
+        stream = pdfminer.pdftypes.PDFStream({
+            'Width': 4, 'Height': 4, 'BitsPerComponent': 8,
+            'ColorSpace': LIT('DeviceRGB'),
+            'Filter': [LIT('ASCII85Decode'), LIT('FlateDecode')],
+            'DecodeParms': [None, {'Predictor': 15, 'Colors': 3,
+                                   'Columns': 4}]}, data)
+        image = minecart.content.Image((4, 0, 0, 4, 0, 0), stream)
+        self.assertEqual(image.as_array().tobytes(), pixels)
+        self.assertIsNotNone(stream.rawdata)  # The stream is unchanged
+
+    def test_tiff_image(self):
+        "Test an LZW image with the TIFF predictor."
+        pixels = numpy.arange(30, dtype=numpy.uint8).reshape(2, 5, 3) * 7
+        differences = pixels.copy()
+        differences[:, 1:] -= pixels[:, :-1]
+        stream = pdfminer.pdftypes.PDFStream({
+            'Width': 5, 'Height': 2, 'BitsPerComponent': 8,
+            'ColorSpace': LIT('DeviceRGB'), 'Filter': LIT('LZWDecode'),
+            'DecodeParms': {'Predictor': 2, 'Colors': 3, 'Columns': 5}},
+                                             lzw_encode(differences.tobytes()))
+        image = minecart.content.Image((5, 0, 0, 2, 0, 0), stream)
+        self.assertTrue((image.as_array() == pixels).all())
+
+    def test_decoded(self):
+        "Test streams already decoded by pdfminer."
+        stream = pdfminer.pdftypes.PDFStream(
+            {'Filter': LIT('FlateDecode')}, zlib.compress(b'data'))
+        stream.get_data()
+        self.assertEqual(minecart.streams.decode_data(stream), b'data')
+        self.assertRaises(ValueError, minecart.streams.decode_data,
+                          pdfminer.pdftypes.PDFStream({}, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"Unit tests for the stress test document generator."
+
+import io
+import threading
+import unittest
+
+import minecart
+import minecart.streams
+
+import stress
+import writer
+
+
+def generate(kind, seed=0, **params):
+    "Return the bytes of a generated document."
+    out = io.BytesIO()
+    stress.generate(kind, out, seed, **params)
+    return out.getvalue()
+
+
+def extract(data):
+    "Return the pages extracted from the PDF `data`."
+    return list(minecart.Document(io.BytesIO(data)).iter_pages())
+
+
+class TestStreamingWriter(unittest.TestCase):
+
+    "Test writing documents one object at a time."
+
+    def test_objects(self):
+        "Test object streams, shared objects and compressed contents."
+        for per_stream in (0, 2):
+            out = io.BytesIO()
+            doc = stress.StreamingWriter(out, objects_per_stream=per_stream)
+            resources = doc.add({'Font': {'F1': doc.add({
+                'Type': '/Font', 'Subtype': '/Type1',
+                'BaseFont': '/Courier'})}})
+            for num in range(5):
+                page = writer.Page(mediabox=[0, 0, 100, 100 + num])
+                page['Resources'] = resources
+                page.add_content(b"0 0 m 10 %d l S\n"
+                                 b"BT /F1 9 Tf (abc) Tj ET\n" % num)
+                doc.add_page(page)
+            doc.close()
+            data = out.getvalue()
+            self.assertNotIn(b"Tj", data)
+            self.assertEqual(b"/ObjStm" in data, bool(per_stream))
+            pages = extract(data)
+            self.assertEqual([page.height for page in pages],
+                             [100, 101, 102, 103, 104])
+            self.assertEqual([page.letterings[0].font.fontname
+                              for page in pages], ['Courier'] * 5)
+            self.assertEqual(pages[4].shapes[0].path,
+                             [('m', 0, 0), ('l', 10, 4)])
+
+    def test_streams(self):
+        "Test that streams must be added before they are referenced."
+        doc = stress.StreamingWriter(io.BytesIO())
+        self.assertRaises(ValueError, doc.add,
+                          {'Contents': writer.Stream(b"")})
+
+
+class TestKinds(unittest.TestCase):
+
+    "Test generating each kind of document."
+
+    def test_kinds(self):
+        "Test small documents of each kind."
+        cad, glyphs, pages, images = [
+            extract(generate(kind, count=count, pages=2))
+            for kind, count in (('cad', 1000), ('glyphs', 30),
+                                ('pages', 3), ('images', 10))]
+        self.assertEqual([len(page.shapes[0].path) for page in cad],
+                         [1001, 1001])
+        self.assertEqual([len(page.letterings) for page in glyphs],
+                         [30, 30])
+        self.assertEqual(len(pages), 2)
+        self.assertEqual(images[1].images[0].as_pil().size, (10, 10))
+
+    def test_large_stream(self):
+        "Test a content stream decompressed in many chunks."
+        data = generate('cad', count=20000)
+        result = []
+        thread = threading.Thread(target=lambda: result.append(extract(data)))
+        thread.daemon = True
+        buffer_size = minecart.streams.BUFFER_SIZE
+        minecart.streams.BUFFER_SIZE = 4096
+        try:
+            thread.start()
+            thread.join(30)
+        finally:
+            minecart.streams.BUFFER_SIZE = buffer_size
+        self.assertTrue(result, "Timed out")
+        self.assertEqual(len(result[0][0].shapes[0].path), 20001)
+
+    def test_reproducible(self):
+        "Test that documents are determined by their seed."
+        data = generate('cad', count=100)
+        self.assertEqual(data, generate('cad', count=100))
+        self.assertNotEqual(data, generate('cad', seed=1, count=100))
+
+
+if __name__ == '__main__':
+    unittest.main()
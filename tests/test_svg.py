@@ -0,0 +1,143 @@
+"Unit tests for the svg module."
+
+import io
+import unittest
+import xml.etree.ElementTree as ET
+
+try:
+    import mock
+except ImportError:
+    import unittest.mock as mock
+
+import minecart.color
+import minecart.content
+import minecart.miner
+import minecart.svg
+
+import writer
+
+SVG = '{http://www.w3.org/2000/svg}'
+
+
+def make_page(objects, width=100, height=50):
+    "Make a stand-in for a page with the given graphics objects."
+    page = mock.MagicMock()
+    page.width, page.height = width, height
+    page.shapes, page.images, page.letterings = [], [], []
+    for z_index, obj in enumerate(objects):
+        obj.z_index = z_index
+        if isinstance(obj, minecart.content.Shape):
+            page.shapes.append(obj)
+        elif isinstance(obj, minecart.content.Image):
+            page.images.append(obj)
+        else:
+            page.letterings.append(obj)
+    return page
+
+
+def to_svg(page, **params):
+    "Export `page` and parse the result."
+    buf = io.StringIO()
+    minecart.svg.write_svg(page, buf, **params)
+    return ET.fromstring(buf.getvalue())
+
+
+class TestWriteSVG(unittest.TestCase):
+
+    "Test the SVG export of pages."
+
+    def setUp(self):
+        stroke = minecart.miner.StrokeState()
+        stroke.color = minecart.color.DEVICE_RGB.make_color((1, 0, 0))
+        stroke.linewidth = 1.5
+        stroke.linecap = 1
+        stroke.dash = ([3, 1], 2)
+        fill = minecart.miner.FillState()
+        fill.color = minecart.color.DEVICE_GRAY.make_color((.5,))
+        self.shape = minecart.content.Shape(
+            stroke, fill, True,
+            [('m', 0, 0), ('l', 10, 0), ('c', 10, 5, 5, 10, 0, 10),
+             ('v', 1, 1, 2, 2), ('y', 3, 3, 4, 4), ('h',)])
+        self.lettering = minecart.content.Lettering(
+            u'a<b & c', None, (10, 20, 40, 30))
+        self.image = minecart.content.Image((20, 0, 0, 10, 50, 5), None)
+
+    def test_document(self):
+        "The document has the page size and objects in drawing order."
+        root = to_svg(make_page([self.lettering, self.shape]))
+        self.assertEqual(root.get('width'), '100pt')
+        self.assertEqual(root.get('viewBox'), '0 0 100 50')
+        self.assertEqual([child.tag for child in root],
+                         [SVG + 'text', SVG + 'path'])
+
+    def test_shape(self):
+        "Paths are flipped and carry their paint parameters."
+        path = to_svg(make_page([self.shape]))[0]
+        self.assertEqual(path.get('d'),
+                         'M0 50L10 50C10 45 5 40 0 40C0 40 1 49 2 48'
+                         'C3 47 4 46 4 46Z')
+        self.assertEqual(path.get('fill'), '#808080')
+        self.assertEqual(path.get('fill-rule'), 'evenodd')
+        self.assertEqual(path.get('stroke'), '#ff0000')
+        self.assertEqual(path.get('stroke-width'), '1.5')
+        self.assertEqual(path.get('stroke-linecap'), 'round')
+        self.assertEqual(path.get('stroke-dasharray'), '3 1')
+        self.assertEqual(path.get('stroke-dashoffset'), '2')
+        self.shape.stroke = None
+        self.shape.fill = None
+        self.assertEqual(len(to_svg(make_page([self.shape]))), 0)
+
+    def test_default_stroke(self):
+        "Strokes without a miter limit or dash pattern use the defaults."
+        page = writer.Page()
+        page.add_content(b"0 0 1 RG 0 0 m 10 10 l S")
+        document = writer.Document()
+        document.add_page(page)
+        out = io.BytesIO()
+        document.write_to_file(out)
+        page = minecart.miner.Document(io.BytesIO(out.getvalue())).get_page(0)
+        buf = io.StringIO()
+        page.to_svg(buf)
+        path = ET.fromstring(buf.getvalue())[0]
+        self.assertEqual(path.get('stroke'), '#0000ff')
+        self.assertEqual(path.get('stroke-miterlimit'), '10')
+        self.assertIsNone(path.get('stroke-dasharray'))
+
+    def test_lettering(self):
+        "Text is escaped and stretched over its bounding box."
+        text = to_svg(make_page([self.lettering]))[0]
+        self.assertEqual(text.text, u'a<b & c')
+        self.assertEqual((text.get('x'), text.get('y')), ('10', '30'))
+        self.assertEqual(text.get('font-size'), '10')
+        self.assertEqual(text.get('textLength'), '30')
+
+    def test_image(self):
+        "Images are placed with their CTM and the given URL."
+        root = to_svg(make_page([self.image]),
+                      image_href=lambda image: 'image.png')
+        image = root[0]
+        self.assertEqual(image.get('transform'),
+                         'matrix(20 0 0 10 50 35)')
+        self.assertEqual(image.get('{http://www.w3.org/1999/xlink}href'),
+                         'image.png')
+        self.assertEqual(len(to_svg(make_page([self.image]),
+                                    image_href=None)), 0)
+
+    def test_clip(self):
+        "Clip boxes are defined once and referenced."
+        self.shape.clip_bbox = (0, 0, 10, 20)
+        self.lettering.clip_bbox = (0, 0, 10, 20)
+        root = to_svg(make_page([self.shape, self.lettering]))
+        self.assertEqual([child.tag for child in root],
+                         [SVG + 'clipPath', SVG + 'path', SVG + 'text'])
+        rect = root[0][0]
+        self.assertEqual((rect.get('y'), rect.get('height')), ('30', '20'))
+        self.assertEqual(root[1].get('clip-path'), 'url(#clip0)')
+        self.assertEqual(root[2].get('clip-path'), 'url(#clip0)')
+
+    def test_format_number(self):
+        "Numbers are written compactly."
+        self.assertEqual(minecart.svg.format_number(1.0), '1')
+        self.assertEqual(minecart.svg.format_number(-0.0001), '0')
+        self.assertEqual(minecart.svg.format_number(2.12345), '2.123')
+        self.assertEqual(minecart.svg.format_number(100), '100')
@@ -0,0 +1,146 @@
+"Unit tests for the tables module."
+
+import unittest
+
+import minecart.content
+import minecart.miner
+import minecart.tables
+
+
+def line(x0, y0, x1, y1):
+    "Make a stroked straight line."
+    return minecart.content.Shape(minecart.miner.StrokeState(), None, False,
+                                  [('m', x0, y0), ('l', x1, y1)])
+
+
+def filled_rect(left, bottom, right, top):
+    "Make a filled rectangle, as drawn by the `re` operator."
+    return minecart.content.Shape(
+        None, minecart.miner.FillState(), False,
+        [('m', left, bottom), ('l', right, bottom), ('l', right, top),
+         ('l', left, top), ('h',)])
+
+
+def lettering(data, bbox):
+    "Shortcut to create a Lettering without a font."
+    return minecart.content.Lettering(data, None, bbox)
+
+
+class TestRules(unittest.TestCase):
+
+    "Test the extraction and merging of rules."
+
+    def test_extract(self):
+        "Only straight, axis-aligned segments and thin fills are rules."
+        shapes = [
+            line(0, 10, 100, 10.2),
+            line(5, 0, 5, 50),
+            line(0, 0, 50, 50),
+            filled_rect(0, 20, 100, 21),
+            filled_rect(0, 20, 100, 60),
+            minecart.content.Shape(minecart.miner.StrokeState(), None, False,
+                                   [('m', 0, 0), ('c', 1, 1, 2, 2, 3, 0)]),
+        ]
+        rules = minecart.tables.extract_rules(shapes)
+        self.assertEqual([rule.get_bbox() for rule in rules], [
+            (0, 10.1, 100, 10.1),
+            (5, 0, 5, 50),
+            (0, 20.5, 100, 20.5),
+        ])
+
+    def test_closed_path(self):
+        "Closing a stroked path adds a rule back to its start."
+        box = minecart.content.Shape(
+            minecart.miner.StrokeState(), None, False,
+            [('m', 0, 0), ('l', 10, 0), ('l', 10, 10), ('l', 0, 10), ('h',)])
+        rules = minecart.tables.extract_rules([box])
+        self.assertEqual(len(rules), 4)
+        self.assertEqual(rules[-1].get_bbox(), (0, 0, 0, 10))
+
+    def test_merge(self):
+        "Collinear rules that touch or overlap are merged."
+        rules = minecart.tables.extract_rules([
+            line(0, 10, 30, 10), line(30.5, 10.5, 60, 10.5),
+            line(50, 10, 80, 10), line(90, 10, 100, 10), line(0, 40, 50, 40),
+        ])
+        merged = minecart.tables.merge_rules(rules)
+        self.assertEqual([rule.get_bbox() for rule in merged], [
+            (0, 10, 80, 10), (90, 10, 100, 10), (0, 40, 50, 40),
+        ])
+
+
+class TestFindTables(unittest.TestCase):
+
+    "Test the detection of tables."
+
+    def setUp(self):
+        # A 3x3 grid drawn one cell edge at a time, where the first two
+        # cells in the top row are merged
+        xs = [50, 150, 250, 350]
+        ys = [700, 680, 660, 640]
+        self.shapes = []
+        for y in ys:
+            for x0, x1 in zip(xs, xs[1:]):
+                self.shapes.append(line(x0, y, x1, y))
+        for x in xs:
+            for y0, y1 in zip(ys, ys[1:]):
+                if (x, y0) != (150, 700):
+                    self.shapes.append(line(x, y0, x, y1))
+        self.letterings = [
+            lettering(u'Header', (60, 685, 90, 695)),
+            lettering(u'b', (160, 665, 170, 675)),
+            lettering(u'c1', (260, 645, 270, 655)),
+            lettering(u'c2', (272, 645, 280, 655)),
+            lettering(u'Outside', (0, 0, 10, 10)),
+        ]
+
+    def test_grid(self):
+        "The grid and spanning cells are built from the rules."
+        tables = minecart.tables.find_tables(self.shapes)
+        self.assertEqual(len(tables), 1)
+        table = tables[0]
+        self.assertEqual(table.shape, (3, 3))
+        self.assertEqual(table.xs, [50, 150, 250, 350])
+        self.assertEqual(table.ys, [700, 680, 660, 640])
+        self.assertEqual(table.get_bbox(), (50, 640, 350, 700))
+        self.assertEqual(len(table.cells), 8)
+        header = table.cells[0]
+        self.assertEqual((header.row, header.col), (0, 0))
+        self.assertEqual((header.rowspan, header.colspan), (1, 2))
+        self.assertEqual(header.get_bbox(), (50, 680, 250, 700))
+
+    def test_letterings(self):
+        "Letterings are assigned to the cells containing their centers."
+        tables = minecart.tables.find_tables(self.shapes, self.letterings)
+        self.assertEqual(tables[0].as_lists(), [
+            [u'Header', None, u''],
+            [u'', u'b', u''],
+            [u'', u'', u'c1 c2'],
+        ])
+
+    def test_thin_rectangles(self):
+        "Tables drawn with filled rectangles are found."
+        shapes = [filled_rect(0, y - .25, 100, y + .25) for y in (0, 10, 20)]
+        shapes += [filled_rect(x - .25, 0, x + .25, 20) for x in (0, 100)]
+        tables = minecart.tables.find_tables(shapes)
+        self.assertEqual(len(tables), 1)
+        self.assertEqual(tables[0].shape, (2, 1))
+
+    def test_tolerance(self):
+        "The tolerance also applies to slightly skewed rules."
+        # The left edge of the grid, drawn as a single skewed line
+        shapes = self.shapes[:12] + self.shapes[15:] + [
+            line(50, 640, 50.8, 700)]
+        self.assertEqual(minecart.tables.find_tables(shapes)[0].shape,
+                         (3, 3))
+        self.assertEqual(minecart.tables.find_tables(
+            shapes, tolerance=.5)[0].shape, (3, 2))
+
+    def test_boxes_ignored(self):
+        "Single boxes and disconnected lines are not tables."
+        shapes = [line(0, 0, 100, 0), line(0, 10, 100, 10),
+                  line(0, 0, 0, 10), line(100, 0, 100, 10),
+                  line(200, 0, 300, 0), line(200, 10, 300, 10)]
+        self.assertEqual(minecart.tables.find_tables(shapes), [])
+        self.assertEqual(len(minecart.tables.find_tables(shapes,
+                                                         min_cells=1)), 1)
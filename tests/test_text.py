@@ -0,0 +1,157 @@
+"Unit tests for the text module."
+
+import re
+import unittest
+
+import minecart.content
+import minecart.text
+
+
+def lettering(data, bbox, horizontal=True):
+    "Shortcut to create a Lettering without a font."
+    return minecart.content.Lettering(data, None, bbox, horizontal)
+
+
+class TestGroupLines(unittest.TestCase):
+
+    "Test the assembly of letterings into lines."
+
+    def test_single_line(self):
+        "Letterings on a baseline are joined in order, with word spaces."
+        letterings = [
+            lettering(u'World', (35, 100, 65, 110)),
+            lettering(u'Hel', (0, 100, 18, 110)),
+            lettering(u'lo', (18, 100, 30, 110)),
+            lettering(u'!', (65.5, 101, 67, 109)),
+        ]
+        lines = minecart.text.group_lines(letterings)
+        self.assertEqual(lines, [u'Hello World!'])
+        line = lines[0]
+        self.assertEqual(line.get_bbox(), (0, 100, 67, 110))
+        self.assertEqual(line.offsets, [0, 3, 6, 11])
+        self.assertEqual(line.letterings, [letterings[1], letterings[2],
+                                           letterings[0], letterings[3]])
+        self.assertEqual(line.words, [u'Hello', u'World!'])
+        hello = line.words[0]
+        self.assertIsInstance(hello, minecart.text.Word)
+        self.assertEqual(hello.get_bbox(), (0, 100, 30, 110))
+        self.assertEqual(hello.letterings, letterings[1:3])
+
+    def test_line_order(self):
+        "Lines are returned top to bottom, and split at wide gaps."
+        letterings = [
+            lettering(u'second', (0, 80, 30, 90)),
+            lettering(u'right', (100, 101, 130, 111)),
+            lettering(u'left', (0, 100, 20, 110)),
+        ]
+        lines = minecart.text.group_lines(letterings)
+        self.assertEqual(lines, [u'left', u'right', u'second'])
+
+    def test_partial_words(self):
+        "Words inside a lettering get an interpolated bounding box."
+        line, = minecart.text.group_lines([
+            lettering(u'ab cd', (0, 0, 50, 10))])
+        first, second = line.words
+        self.assertEqual(first.get_bbox(), (0, 0, 20, 10))
+        self.assertEqual(second.get_bbox(), (30, 0, 50, 10))
+
+    def test_vertical(self):
+        "Vertical letterings make lines running top to bottom."
+        letterings = [
+            lettering(u'B', (0, 80, 10, 90), False),
+            lettering(u'A', (0, 90, 10, 100), False),
+            lettering(u'C', (20, 90, 30, 100), False),
+        ]
+        lines = minecart.text.group_lines(letterings)
+        self.assertEqual(lines, [u'C', u'AB'])
+        self.assertFalse(lines[1].horizontal)
+        self.assertEqual(lines[1].get_bbox(), (0, 80, 10, 100))
+
+    def test_empty(self):
+        "Empty letterings are ignored."
+        self.assertEqual(minecart.text.group_lines(
+            [lettering(u'', (float('inf'),) * 2 + (float('-inf'),) * 2)]),
+                         [])
+
+
+class TestReadingOrder(unittest.TestCase):
+
+    "Test the XY-cut ordering of lines."
+
+    def make_lines(self, specs):
+        "Make one line per (text, bbox) spec."
+        return minecart.text.group_lines(
+            [lettering(data, bbox) for data, bbox in specs])
+
+    def test_columns(self):
+        "Columns are read one after the other, below a spanning title."
+        specs = [(u'Title', (0, 200, 200, 210))]
+        for row in range(6):
+            top = 180 - 12 * row
+            if row == 3:
+                continue  # An aligned paragraph break in both columns
+            specs.append((u'L%d' % row, (0, top - 10, 90, top)))
+            specs.append((u'R%d' % row, (110, top - 10, 200, top)))
+        lines = self.make_lines(specs)
+        ordered = minecart.text.reading_order(lines)
+        self.assertEqual(ordered, [u'Title', u'L0', u'L1', u'L2', u'L4',
+                                   u'L5', u'R0', u'R1', u'R2', u'R4', u'R5'])
+
+    def test_blocks(self):
+        "Blocks separated by blank space are read top to bottom."
+        lines = self.make_lines([
+            (u'footer', (100, 0, 190, 10)),
+            (u'left', (0, 100, 40, 110)),
+            (u'right', (150, 100, 190, 110)),
+            (u'text', (0, 50, 190, 60)),
+        ])
+        self.assertEqual(minecart.text.reading_order(lines),
+                         [u'left', u'right', u'text', u'footer'])
+
+    def test_empty(self):
+        "No lines means no output."
+        self.assertEqual(minecart.text.reading_order([]), [])
+
+
+class TestTextBuffer(unittest.TestCase):
+
+    "Test regular expression searches over lines of text."
+
+    def setUp(self):
+        self.letterings = [
+            lettering(u'Due 2016-', (0, 100, 45, 110)),
+            lettering(u'04-01', (45, 100, 70, 110)),
+            lettering(u'IBAN GB82', (0, 80, 45, 90)),
+            lettering(u'WEST', (50, 80, 70, 90)),
+        ]
+        self.buffer = minecart.text.TextBuffer(
+            minecart.text.group_lines(self.letterings))
+
+    def test_text(self):
+        "Lines are joined by newlines."
+        self.assertEqual(self.buffer.text,
+                         u'Due 2016-04-01\nIBAN GB82 WEST')
+        self.assertEqual(self.buffer.starts, [0, 15])
+
+    def test_search(self):
+        "Matches are mapped back to letterings and bounding boxes."
+        dates = self.buffer.search(r'\d{4}-\d\d-\d\d')
+        self.assertEqual(dates, [u'2016-04-01'])
+        date = dates[0]
+        self.assertIsInstance(date, minecart.text.TextMatch)
+        self.assertEqual(date.letterings, self.letterings[:2])
+        self.assertEqual(date.get_bbox(), (20, 100, 70, 110))
+        self.assertEqual(date.match.span(), (4, 14))
+        iban = self.buffer.search(re.compile(r'gb\d\d \w+', re.I))[0]
+        self.assertEqual(iban.letterings, self.letterings[2:])
+        self.assertEqual(iban.get_bbox(), (25, 80, 70, 90))
+
+    def test_multiline(self):
+        "Matches can span several lines."
+        match = self.buffer.search(r'01\sIBAN')[0]
+        self.assertEqual(match.letterings,
+                         [self.letterings[1], self.letterings[2]])
+        self.assertEqual(match.get_bbox(), (0, 80, 70, 110))
+        self.assertEqual(self.buffer.search(r'\n'), [u'\n'])
+        self.assertIsNone(self.buffer.search(r'\n')[0].get_bbox())
+        self.assertEqual(self.buffer.search(r'x*'), [])
@@ -6,18 +6,23 @@ individually.
 
 ***DO NOT USE THIS MODULE FOR PRODUCTION CODE. IT IS ENTIRELY UNTESTED.***
 
+Names are written as strings (or bytes) starting with a slash, e.g.
+`'/Page'`; other `bytes` are written as PDF strings.
+
 """
 
+import binascii
+
+import six
 
 
 class Stream(object):
 
-    "A PDF stream."
+    "A PDF stream. `info` holds extra entries for the stream dictionary."
 
-    def __init__(self, data=b""):
-        self.info = {
-            'Length': len(data),
-        }
+    def __init__(self, data=b"", **info):
+        self.info = info
+        self.info['Length'] = len(data)
         self.data = data
 
     def append(self, new_data):
@@ -72,6 +77,7 @@ class Writer(object):
         finds that need converting.
 
         """
+        self.pdf_ids[id(obj)] = obj_id
         ret = [b"%d 0 obj\n" % obj_id]
         if isinstance(obj, Stream):
             ret.append(self.convert_literal(obj.info, force_inline=True))
@@ -81,7 +87,6 @@ class Writer(object):
         else:
             ret.append(self.convert_literal(obj, force_inline=True))
         ret.append(b"endobj\n")
-        self.pdf_ids[id(obj)] = obj_id
         return b"".join(ret)
 
     def convert_literal(self, val, force_inline=False):
@@ -94,50 +99,44 @@ class Writer(object):
         indirectly, and other objects are always rendered directly.
 
         """
+        if isinstance(val, six.text_type):
+            val = val.encode('latin-1')
         if isinstance(val, bytes):
             if val.startswith(b'/'):  # it's a name
                 return val
             elif val.startswith(b'\\'):  # ignore starting slashes [to escape
                                          # leading backslashes in a string]
                 val = val[1:]
-            ret = [b"<"]
-            for char in val:
-                hex_val = hex(ord(char))[2:]  # strip leading '0x'
-                if len(hex_val) == 1:
-                    ret.append(b'0')
-                ret.append(hex_val)
-            ret.append(b">")
-            return b"".join(ret)
+            return b"<" + binascii.hexlify(val) + b">"
         elif val is None:
             return b"null"
+        elif isinstance(val, bool):
+            return b"true" if val else b"false"
         elif isinstance(val, list):
-            return b"[%s]" % " ".join(map(self.convert_literal, val))
-        elif isinstance(val, (int, long, float)):
-            return str(val)
+            return b"[" + b" ".join(map(self.convert_literal, val)) + b"]"
+        elif isinstance(val, six.integer_types):
+            return b"%d" % val
+        elif isinstance(val, float):
+            return repr(val).encode('ascii')
         elif force_inline and isinstance(val, dict):
             ret = [b"<<"]
             for key, val2 in val.items():
                 if val2 is not None:
-                    ret.append(b"\n   /%s %s" % (key,
-                                                 self.convert_literal(val2)))
+                    if isinstance(key, six.text_type):
+                        key = key.encode('latin-1')
+                    ret.append(b"\n   /" + key + b" " +
+                               self.convert_literal(val2))
             ret.append(b"\n>>\n")
             return b"".join(ret)
         elif isinstance(val, (dict, Stream)):
             try:
                 sub_id = self.pdf_ids[id(val)]
             except KeyError:
-                sub_id = self.next_free_id
+                # Registered now, so that every reference shares the object
+                sub_id = self.pdf_ids[id(val)] = self.next_free_id
                 self.next_free_id += 1
                 self.obj_stack.append((sub_id, val))
             return b"%d 0 R" % sub_id
-        elif isinstance(val, Stream):
-            try:
-                sub_id = self.pdf_ids[id(val)]
-            except KeyError:
-                sub_id = self.next_free_id
-                self.next_free_id += 1
-                self.obj_stack.append((sub_id, val))
-
         else:
             raise ValueError("%s is not a valid PDF literal!" % val)
 
@@ -145,7 +144,7 @@ class Writer(object):
         "Make the xref table."
         num_objs = len(self.offsets) + 1
         ret = [b"xref\n0 %d\n0000000000 65535 f \n" % num_objs]
-        for obj_id in xrange(1, num_objs):
+        for obj_id in range(1, num_objs):
             ret.append(b"%010d 00000 n \n" % self.offsets[obj_id])
         return b"".join(ret)
 
@@ -154,7 +153,7 @@ class Writer(object):
         return (b"trailer\n" +
                 b"<< /Size %d\n" % self.next_free_id +
                 b"   /Root 1 0 R>>\n" +
-                b"startxref\n{}\n%%EOF".format(xref_offset))
+                b"startxref\n%d\n%%%%EOF\n" % xref_offset)
 
 
 class Document(dict):
@@ -192,7 +191,7 @@ class Page(dict):
         self['Type'] = '/Page'
         self['Parent'] = None
         self['Resources'] = {}
-        if mediabox is  None:
+        if mediabox is None:
             mediabox = [0, 0, 612, 792]
         self['MediaBox'] = mediabox
         self['Contents'] = None